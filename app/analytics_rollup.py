@@ -0,0 +1,215 @@
+"""
+PatternOS Analytics Rollups
+Daily aggregate cubes over ad_spend_daily for the date_range analytics endpoints.
+
+analytics_rollup_daily holds one row per (grouping, date, dimension values)
+for a fixed set of groupings of (brand, channel, category, intent_level);
+dimensions outside a grouping are stored as ''. A last_N_days query then
+sums at most N rows per output group instead of scanning ad_spend_daily.
+
+build_analytics_rollups() fills the cube once and installs triggers on
+ad_spend_daily, so rows inserted, updated or deleted later are applied to
+the cube in the same transaction. Revenue uses the sku_library price at
+the time a row is applied. Recreating ad_spend_daily (as the CSV loader
+does) drops the triggers; rollups_ready() is then False, endpoints fall
+back to the live queries, and the cube must be rebuilt.
+"""
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+from .response_cache import bump_data_version
+
+DIMENSIONS = ("brand", "channel", "category", "intent_level")
+MEASURES = ("spend", "impressions", "clicks", "conversions", "revenue")
+
+# Dimension sets the endpoints group or filter by; () is the daily platform total
+GROUPINGS = (
+    (),
+    ("brand",),
+    ("channel",),
+    ("category",),
+    ("intent_level",),
+    ("brand", "channel"),
+)
+
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analytics_rollup_daily (
+    grouping TEXT NOT NULL, date TEXT NOT NULL,
+    brand TEXT NOT NULL, channel TEXT NOT NULL, category TEXT NOT NULL, intent_level TEXT NOT NULL,
+    rows INTEGER, spend REAL, impressions INTEGER, clicks INTEGER, conversions INTEGER, revenue REAL,
+    PRIMARY KEY (grouping, date, brand, channel, category, intent_level)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_analytics_rollup_brand ON analytics_rollup_daily (grouping, brand, date);
+CREATE TABLE IF NOT EXISTS analytics_rollup_state (max_rowid INTEGER, built_at TEXT);
+"""
+
+TRIGGERS = ("analytics_rollup_insert", "analytics_rollup_delete", "analytics_rollup_update")
+
+KEY_COLUMNS = "grouping, date, brand, channel, category, intent_level"
+
+
+def _grouping_name(dims: Sequence[str]) -> str:
+    return ",".join(dims)
+
+
+def _price_sql(row: str, has_sku_library: bool) -> str:
+    """Unit revenue per conversion, as in the live LEFT JOIN sku_library queries"""
+    if not has_sku_library:
+        return "500"
+    return f"COALESCE((SELECT selling_price FROM sku_library WHERE sku_id = {row}.sku_id), 500)"
+
+
+def _dimension_values(row: str, dims: Sequence[str]) -> List[str]:
+    return [f"IFNULL({row}.{dim}, '')" if dim in dims else "''" for dim in DIMENSIONS]
+
+
+def _apply_row_sql(row: str, sign: str, has_sku_library: bool) -> str:
+    """Trigger statements adding (sign '+') or removing ('-') one ad_spend_daily row"""
+    price = _price_sql(row, has_sku_library)
+    statements = []
+    for dims in GROUPINGS:
+        values = ", ".join([f"'{_grouping_name(dims)}'", f"{row}.date"] + _dimension_values(row, dims))
+        statements.append(f"""
+        INSERT INTO analytics_rollup_daily
+        SELECT {values}, {sign}1, {sign}IFNULL({row}.spend_value, 0), {sign}IFNULL({row}.impressions, 0),
+               {sign}IFNULL({row}.clicks, 0), {sign}IFNULL({row}.conversions, 0),
+               {sign}IFNULL({row}.conversions, 0) * {price}
+        WHERE {row}.date IS NOT NULL
+        ON CONFLICT ({KEY_COLUMNS}) DO UPDATE SET
+            rows = rows + excluded.rows, spend = spend + excluded.spend,
+            impressions = impressions + excluded.impressions, clicks = clicks + excluded.clicks,
+            conversions = conversions + excluded.conversions, revenue = revenue + excluded.revenue;""")
+    if sign == "-":
+        groupings = ", ".join(f"'{_grouping_name(dims)}'" for dims in GROUPINGS)
+        statements.append(f"""
+        DELETE FROM analytics_rollup_daily
+        WHERE grouping IN ({groupings}) AND date = {row}.date AND rows = 0;""")
+    return "".join(statements)
+
+
+def _trigger_sql(has_sku_library: bool) -> str:
+    current_max = "UPDATE analytics_rollup_state SET max_rowid = (SELECT IFNULL(MAX(rowid), 0) FROM ad_spend_daily);"
+    return f"""
+    CREATE TRIGGER analytics_rollup_insert AFTER INSERT ON ad_spend_daily BEGIN
+        {_apply_row_sql("NEW", "+", has_sku_library)}
+        UPDATE analytics_rollup_state SET max_rowid = MAX(max_rowid, NEW.rowid);
+    END;
+    CREATE TRIGGER analytics_rollup_delete AFTER DELETE ON ad_spend_daily BEGIN
+        {_apply_row_sql("OLD", "-", has_sku_library)}
+        {current_max}
+    END;
+    CREATE TRIGGER analytics_rollup_update AFTER UPDATE ON ad_spend_daily BEGIN
+        {_apply_row_sql("OLD", "-", has_sku_library)}
+        {_apply_row_sql("NEW", "+", has_sku_library)}
+        {current_max}
+    END;
+    """
+
+
+def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+
+def rollups_ready(conn: sqlite3.Connection) -> bool:
+    """True while the cube is maintained by its triggers and covers every ad_spend_daily row"""
+    try:
+        state = conn.execute("SELECT max_rowid FROM analytics_rollup_state").fetchone()
+        if state is None:
+            return False
+        installed = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = ?", (TRIGGERS[0],)
+        ).fetchone()
+        current = conn.execute("SELECT IFNULL(MAX(rowid), 0) FROM ad_spend_daily").fetchone()[0]
+        return installed is not None and state[0] == current
+    except sqlite3.OperationalError:
+        return False
+
+
+def build_analytics_rollups(conn: sqlite3.Connection, built_at: Optional[str] = None) -> int:
+    """Rebuild the cube from ad_spend_daily and (re)install its triggers; returns cube rows"""
+    has_sku_library = _table_exists(conn, "sku_library")
+    price = _price_sql("a", has_sku_library)
+
+    conn.executescript(ROLLUP_SCHEMA)
+    with conn:
+        for trigger in TRIGGERS:
+            conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        conn.execute("DELETE FROM analytics_rollup_daily")
+        for dims in GROUPINGS:
+            group_by = ", ".join(["a.date"] + [f"IFNULL(a.{dim}, '')" for dim in dims])
+            conn.execute(f"""
+                INSERT INTO analytics_rollup_daily
+                SELECT ?, a.date, {", ".join(_dimension_values("a", dims))},
+                       COUNT(*), SUM(IFNULL(a.spend_value, 0)), SUM(IFNULL(a.impressions, 0)),
+                       SUM(IFNULL(a.clicks, 0)), SUM(IFNULL(a.conversions, 0)),
+                       SUM(IFNULL(a.conversions, 0) * {price})
+                FROM ad_spend_daily a
+                WHERE a.date IS NOT NULL
+                GROUP BY {group_by}
+            """, (_grouping_name(dims),))
+        conn.execute("DELETE FROM analytics_rollup_state")
+        conn.execute("INSERT INTO analytics_rollup_state VALUES ((SELECT IFNULL(MAX(rowid), 0) FROM ad_spend_daily), ?)",
+                     (built_at or datetime.now().isoformat(),))
+        bump_data_version(conn)
+    conn.executescript(_trigger_sql(has_sku_library))
+    return conn.execute("SELECT COUNT(*) FROM analytics_rollup_daily").fetchone()[0]
+
+
+def rollup_max_date(conn: sqlite3.Connection, brand: Optional[str] = None) -> Optional[str]:
+    """Latest date with data (for one brand), from the cube's primary key / brand index"""
+    if brand is None:
+        return conn.execute("SELECT MAX(date) FROM analytics_rollup_daily WHERE grouping = ''").fetchone()[0]
+    return conn.execute("SELECT MAX(date) FROM analytics_rollup_daily WHERE grouping = 'brand' AND brand = ?",
+                        (brand,)).fetchone()[0]
+
+
+def rollup_totals(conn: sqlite3.Connection, by: Sequence[str] = (), days: Optional[int] = None,
+                  brand: Optional[str] = None) -> List[Dict]:
+    """
+    Measures summed per value of the `by` dimensions (ORDER BY spend DESC),
+    over the last `days` days up to the latest date (all dates if None),
+    optionally for one brand. The date window matches the live queries'
+    date >= date(MAX(date), '-N days').
+    """
+    dims = tuple(dim for dim in DIMENSIONS if dim in by or (dim == "brand" and brand is not None))
+    where, params = ["grouping = ?"], [_grouping_name(dims)]
+    if brand is not None:
+        where.append("brand = ?")
+        params.append(brand)
+    if days is not None:
+        max_date = rollup_max_date(conn, brand)
+        if max_date is None:
+            return []
+        where.append("date >= date(?, '-' || ? || ' days')")
+        params += [max_date, days]
+
+    columns = [f"NULLIF({dim}, '') AS {dim}" for dim in by]
+    columns += [f"SUM({measure}) AS {measure}" for measure in MEASURES]
+    group_by = f"GROUP BY {', '.join(by)}" if by else ""
+    cursor = conn.execute(f"""
+        SELECT {", ".join(columns)}
+        FROM analytics_rollup_daily
+        WHERE {" AND ".join(where)}
+        {group_by}
+        HAVING SUM(rows) > 0
+        ORDER BY spend DESC
+    """, params)
+    names = [description[0] for description in cursor.description]
+    return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+
+def rollup_monthly(conn: sqlite3.Connection, brand: Optional[str] = None) -> List[Dict]:
+    """Monthly spend, clicks, impressions and conversions (for one brand), by month"""
+    grouping, params = ("brand", [brand]) if brand is not None else ("", [])
+    brand_filter = "AND brand = ?" if brand is not None else ""
+    cursor = conn.execute(f"""
+        SELECT strftime('%Y-%m', date) AS month, SUM(spend) AS spend, SUM(clicks) AS clicks,
+               SUM(impressions) AS impressions, SUM(conversions) AS conversions
+        FROM analytics_rollup_daily
+        WHERE grouping = '{grouping}' {brand_filter}
+        GROUP BY strftime('%Y-%m', date)
+        ORDER BY month
+    """, params)
+    names = [description[0] for description in cursor.description]
+    return [dict(zip(names, row)) for row in cursor.fetchall()]
@@ -7,6 +7,7 @@ class Settings:
     KAFKA_BOOTSTRAP: str = os.getenv("KAFKA_BOOTSTRAP", "localhost:9092")
     KAFKA_TOPIC: str = os.getenv("KAFKA_TOPIC", "events")
     FALLBACK_EVENTS_FILE: str = os.getenv("FALLBACK_EVENTS_FILE", "/tmp/events_fallback.log")
+    INGEST_LOG_DIR: str = os.getenv("INGEST_LOG_DIR", "/tmp/patternos_ingest")
     JWT_SECRET: str = os.getenv("JWT_SECRET", "patternos-dev-secret")
     JWT_ALGO: str = os.getenv("JWT_ALGO", "HS256")
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./patternos.db")
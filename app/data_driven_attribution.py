@@ -0,0 +1,186 @@
+"""
+PatternOS Data-Driven Attribution
+Markov-chain removal effects and Shapley values over channel paths.
+
+Paths are the padded channel-code matrices built by attribution_batch
+(codes 1..C, 0 = padding), deduplicated with per-path conversion and
+non-conversion counts, so cost scales with distinct paths, not orders.
+"""
+from math import factorial
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+# Exact Shapley enumerates all 2^C coalitions up to this many channels;
+# above it, permutations are sampled
+EXACT_SHAPLEY_MAX_CHANNELS = 16
+SHAPLEY_SAMPLES = 2000
+
+DATA_DRIVEN_MODELS = ("markov", "shapley")
+
+
+def _path_ends(paths: np.ndarray) -> np.ndarray:
+    """Index of the last channel in each padded path"""
+    return (paths > 0).sum(axis=1) - 1
+
+
+def transition_counts(paths: np.ndarray, conversions: np.ndarray, nulls: np.ndarray,
+                      n_channels: int) -> np.ndarray:
+    """
+    Dense (C+4) x (C+4) transition counts from sparse path pairs.
+    States: 1..C channels, C+1 start, C+2 conversion, C+3 null (0 unused).
+    """
+    start, conv, null = n_channels + 1, n_channels + 2, n_channels + 3
+    n_paths = len(paths)
+    totals = conversions + nulls
+
+    framed = np.hstack([np.full((n_paths, 1), start), paths, np.zeros((n_paths, 1), dtype=paths.dtype)])
+    src, dst = framed[:, :-1], framed[:, 1:]
+    inner = (src > 0) & (dst > 0)
+    weights = np.broadcast_to(totals[:, None], src.shape)
+
+    counts = np.zeros((n_channels + 4, n_channels + 4))
+    np.add.at(counts, (src[inner], dst[inner]), weights[inner])
+
+    last = paths[np.arange(n_paths), _path_ends(paths)]
+    np.add.at(counts, (last, np.full(n_paths, conv)), conversions)
+    np.add.at(counts, (last, np.full(n_paths, null)), nulls)
+    return counts
+
+
+def conversion_probability(counts: np.ndarray, n_channels: int, removed: Optional[int] = None) -> float:
+    """P(reaching conversion from start); a removed channel sends its traffic to null"""
+    start, conv = n_channels + 1, n_channels + 2
+    transient = list(range(1, n_channels + 2))
+    row_totals = counts.sum(axis=1, keepdims=True)
+    probs = np.divide(counts, row_totals, out=np.zeros_like(counts), where=row_totals > 0)
+
+    q = probs[np.ix_(transient, transient)]
+    r = probs[transient, conv]
+    if removed is not None:
+        q[:, removed - 1] = 0.0
+        r = r.copy()
+        r[removed - 1] = 0.0
+    absorbed = np.linalg.solve(np.eye(len(transient)) - q, r)
+    return float(absorbed[start - 1])
+
+
+def markov_credits(paths: np.ndarray, conversions: np.ndarray, nulls: np.ndarray,
+                   n_channels: int) -> np.ndarray:
+    """Conversions credited to each channel (index code - 1) by normalized removal effect"""
+    conversions = np.asarray(conversions, dtype=np.float64)
+    nulls = np.asarray(nulls, dtype=np.float64)
+    credits = np.zeros(n_channels)
+    if not len(paths) or conversions.sum() == 0:
+        return credits
+
+    counts = transition_counts(paths, conversions, nulls, n_channels)
+    base = conversion_probability(counts, n_channels)
+    present = np.flatnonzero(counts[1:n_channels + 1].sum(axis=1)) + 1
+    effects = np.zeros(n_channels)
+    for channel in present:
+        effects[channel - 1] = 1.0 - conversion_probability(counts, n_channels, removed=channel) / base
+
+    if effects.sum() > 0:
+        credits = effects / effects.sum() * conversions.sum()
+    return credits
+
+
+def _channel_masks(paths: np.ndarray) -> np.ndarray:
+    """Bitmask of the channels on each path (bit code - 1)"""
+    bits = np.where(paths > 0, np.left_shift(np.int64(1), np.maximum(paths, 1).astype(np.int64) - 1), 0)
+    return np.bitwise_or.reduce(bits, axis=1)
+
+
+def _subset_sums(masks: np.ndarray, weights: np.ndarray, n_channels: int) -> np.ndarray:
+    """For every coalition S (0..2^C-1): sum of weights of paths whose mask is a subset of S"""
+    table = np.bincount(masks, weights=weights, minlength=1 << n_channels)
+    table = table.reshape([2] * n_channels)
+    for axis in range(n_channels):
+        table = np.cumsum(table, axis=axis)
+    return table.reshape(-1)
+
+
+def coalition_values(masks: np.ndarray, conversions: np.ndarray, nulls: np.ndarray,
+                     value: str, n_channels: int) -> np.ndarray:
+    """Characteristic function for all 2^C coalitions"""
+    converted = _subset_sums(masks, conversions, n_channels)
+    if value == "conversions":
+        return converted
+    reached = converted + _subset_sums(masks, nulls, n_channels)
+    return np.divide(converted, reached, out=np.zeros_like(converted), where=reached > 0)
+
+
+def _value_function(masks: np.ndarray, conversions: np.ndarray, nulls: np.ndarray,
+                    value: str) -> Callable[[int], float]:
+    """Memoized v(S) evaluated directly over the distinct path masks"""
+    memo = {0: 0.0}
+
+    def v(coalition: int) -> float:
+        if coalition not in memo:
+            inside = (masks & ~np.int64(coalition)) == 0
+            converted = conversions[inside].sum()
+            if value == "conversions":
+                memo[coalition] = float(converted)
+            else:
+                reached = converted + nulls[inside].sum()
+                memo[coalition] = float(converted / reached) if reached else 0.0
+        return memo[coalition]
+
+    return v
+
+
+def shapley_credits(paths: np.ndarray, conversions: np.ndarray, nulls: np.ndarray, n_channels: int,
+                    value: str = "conversions", samples: int = SHAPLEY_SAMPLES,
+                    seed: int = 0) -> np.ndarray:
+    """
+    Shapley value per channel (index code - 1).
+
+    value="conversions": v(S) = conversions on paths using only channels in S.
+    value="conversion_rate": v(S) = conversion rate of those paths.
+    Exact over all coalitions up to EXACT_SHAPLEY_MAX_CHANNELS channels,
+    otherwise averaged over `samples` random channel orderings.
+    """
+    if n_channels > 62:
+        raise ValueError("Shapley attribution supports at most 62 channels")
+    conversions = np.asarray(conversions, dtype=np.float64)
+    nulls = np.asarray(nulls, dtype=np.float64)
+    if not len(paths):
+        return np.zeros(n_channels)
+    masks = _channel_masks(paths)
+
+    if n_channels <= EXACT_SHAPLEY_MAX_CHANNELS:
+        values = coalition_values(masks, conversions, nulls, value, n_channels)
+        coalitions = np.arange(1 << n_channels, dtype=np.int64)
+        sizes = np.zeros(len(coalitions), dtype=np.int64)
+        for bit in range(n_channels):
+            sizes += (coalitions >> bit) & 1
+        weights = np.array([factorial(k) * factorial(n_channels - k - 1) / factorial(n_channels)
+                            for k in range(n_channels)])
+        credits = np.zeros(n_channels)
+        for bit in range(n_channels):
+            without = coalitions[(coalitions >> bit) & 1 == 0]
+            gains = values[without | (1 << bit)] - values[without]
+            credits[bit] = (weights[sizes[without]] * gains).sum()
+        return credits
+
+    v = _value_function(masks, conversions, nulls, value)
+    rng = np.random.default_rng(seed)
+    credits = np.zeros(n_channels)
+    for _ in range(samples):
+        coalition, previous = 0, 0.0
+        for channel in rng.permutation(n_channels):
+            coalition |= 1 << int(channel)
+            current = v(coalition)
+            credits[channel] += current - previous
+            previous = current
+    return credits / samples
+
+
+def data_driven_credits(paths: np.ndarray, conversions: np.ndarray, nulls: np.ndarray,
+                        n_channels: int) -> Dict[str, np.ndarray]:
+    """Markov and Shapley conversion credit per channel"""
+    return {
+        "markov": markov_credits(paths, conversions, nulls, n_channels),
+        "shapley": shapley_credits(paths, conversions, nulls, n_channels),
+    }
@@ -0,0 +1,315 @@
+"""
+PatternOS Ingest Buffer
+Write-behind buffering between the ingest endpoints and the events table.
+
+append() acknowledges a batch once it is in the in-memory ring and in the
+append-only log on local disk. A single background writer drains the ring
+into the database in large transactions, so ingest latency no longer waits
+on SQLite's one writer lock.
+
+The log is a directory of numbered segment files of JSON lines. After each
+committed transaction the writer records the last committed (segment, line)
+in a checkpoint file and deletes segments it has fully committed. On start,
+recover() writes every logged event after the checkpoint before new events
+are drained. An event committed just before a crash, ahead of its
+checkpoint, is written again on recovery (at-least-once).
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List
+
+from .config import settings
+
+logger = logging.getLogger("ingest_buffer")
+
+INGEST_BUFFER_CAPACITY = int(os.getenv("INGEST_BUFFER_CAPACITY", "200000"))
+INGEST_WRITE_BATCH = int(os.getenv("INGEST_WRITE_BATCH", "5000"))
+INGEST_LINGER_SECONDS = float(os.getenv("INGEST_LINGER_MS", "100")) / 1000
+INGEST_SEGMENT_EVENTS = int(os.getenv("INGEST_SEGMENT_EVENTS", "50000"))
+INGEST_LOG_FSYNC = os.getenv("INGEST_LOG_FSYNC", "1") == "1"
+INGEST_RETRY_SECONDS = 1.0
+
+SEGMENT_SUFFIX = ".log"
+CHECKPOINT_FILE = "checkpoint.json"
+
+
+class IngestBuffer:
+    """
+    Ring + append-only log in front of a sink that writes a list of event
+    payloads in one transaction. Appends are group-committed: concurrent
+    appenders share one fsync of the log.
+    """
+
+    def __init__(self, sink: Callable[[List[Dict]], object], log_dir: str = settings.INGEST_LOG_DIR,
+                 capacity: int = INGEST_BUFFER_CAPACITY, batch_size: int = INGEST_WRITE_BATCH,
+                 linger: float = INGEST_LINGER_SECONDS, segment_events: int = INGEST_SEGMENT_EVENTS,
+                 fsync: bool = INGEST_LOG_FSYNC, retry_interval: float = INGEST_RETRY_SECONDS):
+        self.sink = sink
+        self.log_dir = log_dir
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.linger = linger
+        self.segment_events = segment_events
+        self.fsync = fsync
+        self.retry_interval = retry_interval
+
+        self.ring = deque()  # (segment, line, payload)
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._drained = threading.Condition(self._lock)
+        self._sync_lock = threading.Lock()
+        self._fh = None
+        self._segment = 0
+        self._segment_lines = 0
+        self._written = 0  # log appends so far
+        self._synced = 0  # appends known to be on disk
+        self._in_flight = 0
+        self._thread = None
+        self._stopping = False
+
+        self.appended = 0
+        self.committed = 0
+        self.rejected = 0
+        self.replayed = 0
+        self.batches = 0
+        self.write_errors = 0
+        self.last_batch_size = 0
+        self.last_commit_seconds = 0.0
+        self.max_commit_seconds = 0.0
+
+    # --- log segments ---
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.log_dir, f"{segment:012d}{SEGMENT_SUFFIX}")
+
+    def _segments(self) -> List[int]:
+        if not os.path.isdir(self.log_dir):
+            return []
+        return sorted(int(name[:-len(SEGMENT_SUFFIX)]) for name in os.listdir(self.log_dir)
+                      if name.endswith(SEGMENT_SUFFIX) and name[:-len(SEGMENT_SUFFIX)].isdigit())
+
+    def _read_checkpoint(self):
+        try:
+            with open(os.path.join(self.log_dir, CHECKPOINT_FILE), encoding="utf-8") as fh:
+                checkpoint = json.load(fh)
+            return checkpoint["segment"], checkpoint["line"]
+        except (OSError, ValueError, KeyError):
+            return -1, -1
+
+    def _write_checkpoint(self, segment: int, line: int):
+        path = os.path.join(self.log_dir, CHECKPOINT_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as fh:
+            json.dump({"segment": segment, "line": line}, fh)
+            fh.flush()
+            if self.fsync:
+                os.fsync(fh.fileno())
+        os.replace(path + ".tmp", path)
+
+    def _open_segment(self, segment: int):
+        # Caller holds _lock
+        if self._fh is not None:
+            self._fh.flush()
+            if self.fsync:
+                os.fsync(self._fh.fileno())
+            self._fh.close()
+            self._synced = self._written
+        self._segment = segment
+        self._segment_lines = 0
+        self._fh = open(self._segment_path(segment), "a", encoding="utf-8")
+
+    def _sync(self, ticket: int):
+        """Make log appends up to `ticket` durable; one fsync covers every waiting appender"""
+        with self._sync_lock:
+            if self._synced >= ticket:
+                return
+            with self._lock:
+                if self._fh is None:
+                    return  # closed, and synced on close
+                target = self._written
+                fd = os.dup(self._fh.fileno())
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            self._synced = max(self._synced, target)
+
+    # --- ingest side ---
+
+    def append(self, payloads: List[Dict]) -> bool:
+        """
+        Log and buffer a batch; True once it is durable. False (nothing
+        accepted) when the ring lacks room for the whole batch.
+        """
+        if not payloads:
+            return True
+        self.start()
+        lines = [json.dumps(payload) for payload in payloads]
+        with self._lock:
+            if self._stopping or len(self.ring) + self._in_flight + len(lines) > self.capacity:
+                self.rejected += len(lines)
+                return False
+            if self._fh is None:
+                os.makedirs(self.log_dir, exist_ok=True)
+                self._open_segment(self._segment)
+            elif self._segment_lines >= self.segment_events:
+                self._open_segment(self._segment + 1)
+            self._fh.writelines(line + "\n" for line in lines)
+            self._fh.flush()
+            self._written += 1
+            ticket = self._written
+            first = self._segment_lines
+            self._segment_lines += len(lines)
+            self.ring.extend((self._segment, first + i, payload) for i, payload in enumerate(payloads))
+            self.appended += len(lines)
+            self._ready.notify()
+        if self.fsync:
+            self._sync(ticket)
+        return True
+
+    # --- writer side ---
+
+    def recover(self) -> int:
+        """Write logged events past the checkpoint to the sink; returns events replayed"""
+        checkpoint = self._read_checkpoint()
+        replayed = 0
+        for segment in self._segments():
+            payloads = []
+            with open(self._segment_path(segment), encoding="utf-8") as fh:
+                for i, line in enumerate(fh):
+                    if (segment, i) <= checkpoint or not line.strip():
+                        continue
+                    try:
+                        payloads.append(json.loads(line))
+                    except ValueError:
+                        # A line torn by the crash was never acknowledged
+                        logger.warning("Skipping unreadable line %d of log segment %d", i, segment)
+            for start in range(0, len(payloads), self.batch_size):
+                self.sink(payloads[start:start + self.batch_size])
+            replayed += len(payloads)
+            self._segment = segment + 1
+        for segment in self._segments():
+            os.remove(self._segment_path(segment))
+        if os.path.isdir(self.log_dir):
+            self._write_checkpoint(-1, -1)
+        self.replayed += replayed
+        if replayed:
+            logger.info("Replayed %d logged events", replayed)
+        return replayed
+
+    def start(self):
+        """Replay the log, then start the background writer; append() calls this first"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self.recover()
+            self._thread = threading.Thread(target=self._run, name="ingest-writer", daemon=True)
+            self._thread.start()
+
+    def _next_batch(self) -> List[tuple]:
+        with self._lock:
+            while not self.ring and not self._stopping:
+                self._ready.wait()
+            deadline = time.monotonic() + self.linger
+            while len(self.ring) < self.batch_size and not self._stopping:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._ready.wait(remaining)
+            batch = [self.ring.popleft() for _ in range(min(self.batch_size, len(self.ring)))]
+            self._in_flight = len(batch)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                break  # stopping and drained
+            started = time.monotonic()
+            try:
+                self.sink([payload for _, _, payload in batch])
+            except Exception:
+                logger.exception("Ingest write of %d events failed; retrying", len(batch))
+                self.write_errors += 1
+                with self._lock:
+                    self.ring.extendleft(reversed(batch))
+                    self._in_flight = 0
+                time.sleep(self.retry_interval)
+                continue
+
+            elapsed = time.monotonic() - started
+            self._write_checkpoint(*batch[-1][:2])
+            with self._lock:
+                self._in_flight = 0
+                self.committed += len(batch)
+                self.batches += 1
+                self.last_batch_size = len(batch)
+                self.last_commit_seconds = elapsed
+                self.max_commit_seconds = max(self.max_commit_seconds, elapsed)
+                oldest = self.ring[0][0] if self.ring else self._segment
+                for segment in self._segments():
+                    if segment < oldest:
+                        os.remove(self._segment_path(segment))
+                if not self.ring:
+                    self._drained.notify_all()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until everything appended so far is committed"""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            self._ready.notify()
+            while self.ring or self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._drained.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 30.0):
+        """Drain the ring, stop the writer and remove the fully committed log"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._stopping = True
+            self._ready.notify_all()
+        if thread is not None:
+            thread.join(timeout)
+        with self._lock:
+            if self._fh is not None:
+                self._fh.flush()
+                if self.fsync:
+                    os.fsync(self._fh.fileno())
+                self._fh.close()
+                self._fh = None
+                self._synced = self._written
+            if not self.ring and not self._in_flight:
+                for segment in self._segments():
+                    os.remove(self._segment_path(segment))
+                if os.path.isdir(self.log_dir):
+                    self._write_checkpoint(-1, -1)
+                self._segment += 1
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            depth = len(self.ring) + self._in_flight
+        return {
+            "buffered": depth,
+            "capacity": self.capacity,
+            "utilization": round(depth / self.capacity, 4) if self.capacity else 0.0,
+            "appended": self.appended,
+            "committed": self.committed,
+            "rejected": self.rejected,
+            "replayed": self.replayed,
+            "batches": self.batches,
+            "write_errors": self.write_errors,
+            "last_batch_size": self.last_batch_size,
+            "last_commit_ms": round(self.last_commit_seconds * 1000, 2),
+            "max_commit_ms": round(self.max_commit_seconds * 1000, 2),
+            "log_segments": len(self._segments()),
+            "writer_running": self._thread is not None,
+        }
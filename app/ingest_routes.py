@@ -0,0 +1,126 @@
+"""
+PatternOS Event Ingest
+Single and bulk event ingest into the events table (EventDB) and the event producer.
+Events are acknowledged once in the write-behind ingest buffer; its writer
+thread inserts them with write_events().
+"""
+import os
+from typing import Dict, List
+
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import TypeAdapter, ValidationError
+from starlette.concurrency import run_in_threadpool
+
+from .db import engine
+from .ingest_buffer import IngestBuffer
+from .models_db import EventDB
+from .producer import producer
+from .schemas import Event
+
+router = APIRouter(tags=["Ingest"])
+
+INGEST_MAX_BATCH = int(os.getenv("INGEST_MAX_BATCH", "50000"))
+INGEST_MAX_ERRORS = 20
+
+event_adapter = TypeAdapter(Event)
+events_adapter = TypeAdapter(List[Event])
+EVENT_COLUMNS = ("user_id", "tenant_id", "event_type", "timestamp")
+
+
+def _rejected(invalid: int, errors: List[Dict]):
+    return HTTPException(status_code=422, detail={"invalid_events": invalid, "errors": errors[:INGEST_MAX_ERRORS]})
+
+
+def _error(position: str, index, loc, msg: str) -> Dict:
+    return {position: index, "field": ".".join(str(part) for part in loc), "error": msg}
+
+
+def parse_events(body: bytes, content_type: str) -> List[Event]:
+    """Validate a JSON array or NDJSON body; raises 422 listing the bad events.
+
+    A JSON array is validated in one pass and errors carry the array index.
+    NDJSON is validated line by line, so each line is exactly one event and
+    errors carry the (1-based) line number.
+    """
+    if "ndjson" not in content_type and body.lstrip().startswith(b"["):
+        try:
+            return events_adapter.validate_json(body)
+        except ValidationError as e:
+            errors = [_error("index", error["loc"][0] if error["loc"] else None, error["loc"][1:], error["msg"])
+                      for error in e.errors()[:INGEST_MAX_ERRORS]]
+            raise _rejected(e.error_count(), errors)
+
+    events, errors, invalid = [], [], 0
+    for number, line in enumerate(body.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            events.append(event_adapter.validate_json(line))
+        except ValidationError as e:
+            invalid += e.error_count()
+            if len(errors) < INGEST_MAX_ERRORS:
+                errors.extend(_error("line", number, error["loc"], error["msg"]) for error in e.errors())
+    if invalid:
+        raise _rejected(invalid, errors)
+    return events
+
+
+def write_events(payloads: List[Dict]) -> int:
+    """Insert all events in one transaction with a single executemany"""
+    if payloads:
+        rows = [{column: payload[column] for column in EVENT_COLUMNS} for payload in payloads]
+        with engine.begin() as conn:
+            conn.execute(EventDB.__table__.insert(), rows)
+    return len(payloads)
+
+
+ingest_buffer = IngestBuffer(write_events)
+
+
+def buffer_events(payloads: List[Dict]):
+    if not ingest_buffer.append(payloads):
+        raise HTTPException(status_code=503, detail="Ingest buffer full, retry shortly",
+                            headers={"Retry-After": "1"})
+
+
+def accept_events(body: bytes, content_type: str) -> List[Dict]:
+    """Validate and buffer a batch; runs in the threadpool (validation and log fsync are blocking)"""
+    events = parse_events(body, content_type)
+    if len(events) > INGEST_MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {INGEST_MAX_BATCH} events per batch")
+    payloads = [event.model_dump() for event in events]
+    buffer_events(payloads)
+    return payloads
+
+
+def publish_events(payloads: List[Dict]):
+    # The producer batches in the background; a full queue only costs the stream copy
+    producer.send_many(payloads)
+
+
+@router.post("/ingest")
+def ingest(event: Event):
+    payload = event.model_dump()
+    buffer_events([payload])
+    publish_events([payload])
+    return {"status": "accepted"}
+
+
+@router.post("/ingest/batch")
+async def ingest_batch(request: Request):
+    """
+    Ingest many events: a JSON array, or NDJSON (one event per line,
+    Content-Type application/x-ndjson). The whole batch is validated
+    before anything is written; any invalid event rejects it with 422
+    (errors name the array index or NDJSON line), and a full ingest
+    buffer rejects it with 503.
+    """
+    body = await request.body()
+    payloads = await run_in_threadpool(accept_events, body, request.headers.get("content-type", ""))
+    publish_events(payloads)
+    return {"status": "accepted", "accepted": len(payloads)}
+
+
+@router.get("/ingest/metrics")
+def ingest_metrics():
+    return {"buffer": ingest_buffer.metrics(), "producer": producer.metrics()}
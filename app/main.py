@@ -1,8 +1,17 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 import sqlite3
 import os
 
+from .analytics_rollup import rollup_max_date, rollup_monthly, rollup_totals, rollups_ready
+from .attribution_batch import ALL_BRANDS, summaries_ready
+from .db import init_db
+from .ingest_routes import ingest_buffer, router as ingest_router
+from .producer import producer
+from .response_cache import cached_response, install_data_version_triggers, response_cache
+from .scoring_engine import scoring_engine
+from .sqlite_pool import close_pools, get_campaign_db, get_campaign_writer, get_intent_db, intent_db
+
 app = FastAPI(title="PatternOS API")
 
 # Get absolute database path
@@ -18,6 +27,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.include_router(ingest_router)
+
+@app.on_event("startup")
+def create_event_tables():
+    # Once per process rather than on every ingest request
+    init_db()
+    ingest_buffer.start()  # replays events logged before a crash
+    # Event, purchase and intent writes from any process invalidate cached dashboards
+    if os.path.exists(intent_db.path):
+        with intent_db.writer() as conn:
+            install_data_version_triggers(conn)
+
+@app.on_event("shutdown")
+def shutdown_db_pools():
+    ingest_buffer.close()
+    producer.close()  # publishes (or logs to the fallback file) queued events before exit
+    close_pools()
+
 @app.get("/")
 async def root():
     return {"service": "PatternOS API", "status": "operational", "db_exists": os.path.exists(DB_PATH)}
@@ -26,10 +53,14 @@ async def root():
 async def health():
     return {"status": "healthy", "db": os.path.exists(DB_PATH)}
 
+@app.get("/api/master/cache-metrics")
+def master_cache_metrics():
+    return response_cache.metrics()
+
 @app.get("/api/master/dashboard-v2")
-async def master_dashboard_v2(clientId: str = "zepto"):
+@cached_response
+def master_dashboard_v2(clientId: str = "zepto", conn: sqlite3.Connection = Depends(get_intent_db)):
     try:
-        conn = sqlite3.connect(DB_PATH, timeout=10)
         cursor = conn.cursor()
         
         cursor.execute("SELECT COALESCE(SUM(total_amount), 0) FROM purchases WHERE attributed_to_ad = 1")
@@ -41,7 +72,6 @@ async def master_dashboard_v2(clientId: str = "zepto"):
         cursor.execute("SELECT COUNT(*) FROM unified_intent_scores WHERE intent_level = 'High'")
         high_intent_users = cursor.fetchone()[0]
         
-        conn.close()
         
         return {
             "total_gmv": round(total_gmv, 2),
@@ -54,10 +84,9 @@ async def master_dashboard_v2(clientId: str = "zepto"):
         return {"error": str(e), "total_gmv": 0}
 
 @app.get("/api/master/intent-stats")
-async def intent_stats():
+@cached_response
+def intent_stats(conn: sqlite3.Connection = Depends(get_intent_db)):
     try:
-        import sqlite3
-        conn = sqlite3.connect("intent_intelligence.db")
         cursor = conn.cursor()
         
         cursor.execute("SELECT COUNT(DISTINCT user_id) FROM intent_scores")
@@ -71,7 +100,6 @@ async def intent_stats():
             if level:
                 dist[level.lower()] = count
         
-        conn.close()
         return {"totalUsers": total, "intentDistribution": dist}
     except:
         return {"totalUsers": 0, "intentDistribution": {"high": 0, "medium": 0, "low": 0}}
@@ -79,19 +107,14 @@ async def intent_stats():
 @app.get("/api/master/platform-revenue")
 
 @app.get("/api/master/platform-revenue")
-async def platform_revenue(period: str = "monthly"):
+@cached_response
+def platform_revenue(period: str = "monthly", conn: sqlite3.Connection = Depends(get_campaign_db)):
     try:
-        import sqlite3
-        conn = sqlite3.connect("patternos_campaign_data.db")
         cursor = conn.cursor()
         
         cursor.execute("SELECT SUM(attributed_spend) FROM ad_attribution")
         total_attributed = cursor.fetchone()[0] or 0
         
-        # Get max date and calculate period
-        cursor.execute("SELECT MAX(date) FROM ad_spend_daily")
-        max_date = cursor.fetchone()[0]
-        
         if period == "monthly":
             days = 30
         elif period == "quarterly":
@@ -101,13 +124,21 @@ async def platform_revenue(period: str = "monthly"):
         else:
             days = 365
         
-        cursor.execute("SELECT SUM(spend_value) FROM ad_spend_daily WHERE intent_level='High' AND date >= date(?, '-' || ? || ' days')", (max_date, days))
-        high_intent_spend = cursor.fetchone()[0] or 0
-        
-        cursor.execute("SELECT SUM(spend_value) FROM ad_spend_daily WHERE intent_level IN ('Medium', 'Low') AND date >= date(?, '-' || ? || ' days')", (max_date, days))
-        other_spend = cursor.fetchone()[0] or 0
+        if rollups_ready(conn):
+            spend_by_intent = {row["intent_level"]: row["spend"] for row in rollup_totals(conn, ("intent_level",), days)}
+            high_intent_spend = spend_by_intent.get("High") or 0
+            other_spend = (spend_by_intent.get("Medium") or 0) + (spend_by_intent.get("Low") or 0)
+        else:
+            # Get max date and calculate period
+            cursor.execute("SELECT MAX(date) FROM ad_spend_daily")
+            max_date = cursor.fetchone()[0]
+            
+            cursor.execute("SELECT SUM(spend_value) FROM ad_spend_daily WHERE intent_level='High' AND date >= date(?, '-' || ? || ' days')", (max_date, days))
+            high_intent_spend = cursor.fetchone()[0] or 0
+            
+            cursor.execute("SELECT SUM(spend_value) FROM ad_spend_daily WHERE intent_level IN ('Medium', 'Low') AND date >= date(?, '-' || ? || ' days')", (max_date, days))
+            other_spend = cursor.fetchone()[0] or 0
         
-        conn.close()
         
         if period == "monthly":
             retainer = 300000
@@ -138,10 +169,9 @@ async def platform_revenue(period: str = "monthly"):
         return {"error": str(e), "total_revenue": 0}
 
 @app.get("/api/master/revenue-opportunities")
-async def revenue_opportunities(minScore: float = 0.7):
+@cached_response
+def revenue_opportunities(minScore: float = 0.7, conn: sqlite3.Connection = Depends(get_intent_db)):
     try:
-        import sqlite3
-        conn = sqlite3.connect("intent_intelligence.db")
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -163,23 +193,17 @@ async def revenue_opportunities(minScore: float = 0.7):
             opp['potential_revenue'] = opp['high_intent_users'] * 2500
             opportunities.append(opp)
         
-        conn.close()
         return {"opportunities": opportunities}
     except Exception as e:
         return {"opportunities": [], "error": str(e)}
 
 @app.get("/api/master/brand-performance-v2")
-async def brand_performance(period: str = "monthly"):
+@cached_response
+def brand_performance(period: str = "monthly", conn: sqlite3.Connection = Depends(get_campaign_db)):
     try:
-        import sqlite3
-        conn = sqlite3.connect("patternos_campaign_data.db")
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
-        # Get max date for period filtering
-        cursor.execute("SELECT MAX(date) FROM ad_spend_daily")
-        max_date = cursor.fetchone()[0]
-        
         if period == "monthly":
             days = 30
         elif period == "quarterly":
@@ -189,6 +213,21 @@ async def brand_performance(period: str = "monthly"):
         else:
             days = 365
         
+        if rollups_ready(conn):
+            brands = []
+            for row in rollup_totals(conn, ("brand",), days)[:5]:
+                b = {"brand": row["brand"], "ad_spend": row["spend"], "revenue": row["revenue"],
+                     "purchases": row["conversions"], "clicks": row["clicks"], "impressions": row["impressions"]}
+                b['roas'] = round(b['revenue'] / b['ad_spend'], 2) if b['ad_spend'] > 0 else 0
+                b['ctr'] = round((b['clicks'] / b['impressions'] * 100), 2) if b['impressions'] > 0 else 0
+                b['conv_rate'] = round((b['purchases'] / b['clicks'] * 100), 2) if b['clicks'] > 0 else 0
+                brands.append(b)
+            return {"brands": brands}
+        
+        # Get max date for period filtering
+        cursor.execute("SELECT MAX(date) FROM ad_spend_daily")
+        max_date = cursor.fetchone()[0]
+        
         # Get brand performance with SKU prices
         cursor.execute("""
             SELECT 
@@ -215,17 +254,14 @@ async def brand_performance(period: str = "monthly"):
             b['conv_rate'] = round((b['purchases'] / b['clicks'] * 100), 2) if b['clicks'] > 0 else 0
             brands.append(b)
         
-        conn.close()
         return {"brands": brands}
     except Exception as e:
         return {"brands": [], "error": str(e)}
 
 # Intent Dashboard API
 @app.get("/api/v1/intent/stats")
-async def intent_stats_v1(clientId: str = "zepto"):
+def intent_stats_v1(clientId: str = "zepto", conn: sqlite3.Connection = Depends(get_intent_db)):
     try:
-        import sqlite3
-        conn = sqlite3.connect("intent_intelligence.db")
         cursor = conn.cursor()
         
         # Total users tracked
@@ -249,7 +285,6 @@ async def intent_stats_v1(clientId: str = "zepto"):
             if level:
                 distribution[level.lower()] = count
         
-        conn.close()
         
         return {
             "totalUsers": total_users,
@@ -268,10 +303,8 @@ async def intent_stats_v1(clientId: str = "zepto"):
 
 # Enhanced Intent Dashboard - Phase 1: Behavioral Intelligence
 @app.get("/api/v1/intent/behavioral-deep-dive")
-async def behavioral_deep_dive(clientId: str = "zepto"):
+def behavioral_deep_dive(clientId: str = "zepto", conn: sqlite3.Connection = Depends(get_intent_db)):
     try:
-        import sqlite3
-        conn = sqlite3.connect("intent_intelligence.db")
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -320,7 +353,6 @@ async def behavioral_deep_dive(clientId: str = "zepto"):
         """)
         event_distribution = [dict(row) for row in cursor.fetchall()]
         
-        conn.close()
         
         return {
             "searchPatterns": {
@@ -336,10 +368,8 @@ async def behavioral_deep_dive(clientId: str = "zepto"):
 
 # Visual Intelligence Summary API
 @app.get("/api/v1/visual-intelligence/summary")
-async def visual_intelligence_summary():
+def visual_intelligence_summary(conn: sqlite3.Connection = Depends(get_intent_db)):
     try:
-        import sqlite3
-        conn = sqlite3.connect("intent_intelligence.db")
         cursor = conn.cursor()
         
         # Total images analyzed
@@ -373,7 +403,6 @@ async def visual_intelligence_summary():
         """)
         scene_distribution = [{"scene": row[0], "count": row[1]} for row in cursor.fetchall()]
         
-        conn.close()
         
         return {
             "totalImages": total_images,
@@ -387,10 +416,8 @@ async def visual_intelligence_summary():
 
 # Voice Intelligence Summary API
 @app.get("/api/v1/voice-intelligence/summary")
-async def voice_intelligence_summary():
+def voice_intelligence_summary(conn: sqlite3.Connection = Depends(get_intent_db)):
     try:
-        import sqlite3
-        conn = sqlite3.connect("intent_intelligence.db")
         cursor = conn.cursor()
         
         # Total voice queries
@@ -428,7 +455,6 @@ async def voice_intelligence_summary():
         """)
         emotions = {row[0]: row[1] for row in cursor.fetchall()}
         
-        conn.close()
         
         return {
             "totalQueries": total_queries,
@@ -492,132 +518,38 @@ async def google_ai_config_status():
 
 # Unified Intent Scoring Engine API
 @app.get("/api/scoring/calculate-customer-score")
-async def calculate_customer_score(customer_id: str):
+def calculate_customer_score(customer_id: str, conn: sqlite3.Connection = Depends(get_intent_db)):
     """Calculate unified intent score for a specific customer"""
     try:
-        import sqlite3
-        conn = sqlite3.connect("intent_intelligence.db")
-        cursor = conn.cursor()
-        
-        # 1. BEHAVIORAL SCORE (40% weight)
-        cursor.execute("""
-            SELECT page_views, cart_additions, search_queries, time_spent
-            FROM intent_scores
-            WHERE user_id = ?
-        """, (customer_id,))
-        
-        behavioral_row = cursor.fetchone()
-        if behavioral_row:
-            page_views, cart_adds, searches, time_spent = behavioral_row
-            behavioral_score = min(
-                (page_views * 2) + 
-                min(cart_adds * 10, 30) + 
-                min(searches * 3, 15) + 
-                min(time_spent / 100, 20), 
-                100
-            )
-        else:
-            behavioral_score = 0
-        
-        # 2. VISUAL SCORE (30% weight)
-        cursor.execute("""
-            SELECT COUNT(*), 
-                   SUM(CASE WHEN confidence_score > 0.8 THEN 1 ELSE 0 END),
-                   COUNT(DISTINCT brand_detected)
-            FROM visual_intelligence
-            WHERE customer_id = ?
-        """, (customer_id,))
-        
-        visual_row = cursor.fetchone()
-        if visual_row and visual_row[0] > 0:
-            img_count, high_conf, brands = visual_row
-            visual_score = min(
-                min(img_count * 5, 25) +
-                min(high_conf * 15, 30) +
-                min(brands * 3, 25),
-                100
-            )
-        else:
-            visual_score = 0
-        
-        # 3. VOICE SCORE (10% weight)
-        cursor.execute("""
-            SELECT COUNT(*),
-                   SUM(CASE WHEN intent_label LIKE '%Order%' THEN 1 ELSE 0 END),
-                   COUNT(DISTINCT language_code)
-            FROM voice_intelligence
-            WHERE customer_id = ?
-        """, (customer_id,))
-        
-        voice_row = cursor.fetchone()
-        if voice_row and voice_row[0] > 0:
-            queries, high_intent, langs = voice_row
-            voice_score = min(
-                min(queries * 8, 40) +
-                min(high_intent * 25, 50) +
-                (10 if langs > 1 else 0),
-                100
-            )
-        else:
-            voice_score = 0
-        
-        # 4. PREDICTIVE AI SCORE (20% weight) - Simple heuristic for now
-        predictive_score = min(
-            (cart_adds * 10 if behavioral_row else 0) +
-            (page_views * 0.5 if behavioral_row else 0) +
-            15,
-            100
-        )
-        
-        # Calculate weighted final score
-        behavioral_weighted = behavioral_score * 0.40
-        visual_weighted = visual_score * 0.30
-        voice_weighted = voice_score * 0.10
-        predictive_weighted = predictive_score * 0.20
-        
-        final_score = behavioral_weighted + visual_weighted + voice_weighted + predictive_weighted
-        
-        # Determine intent level
-        if final_score >= 70:
-            intent_level = "High"
-            action = "Push targeted ads immediately"
-        elif final_score >= 50:
-            intent_level = "Medium"
-            action = "Nurture with product recommendations"
-        else:
-            intent_level = "Low"
-            action = "Brand awareness campaigns"
-        
-        conn.close()
+        # Same vectorized kernel as the batch scoring engine
+        score = scoring_engine.score_customer(customer_id, conn)
         
         return {
             "customer_id": customer_id,
             "scores": {
-                "behavioral": round(behavioral_score, 2),
-                "visual": round(visual_score, 2),
-                "voice": round(voice_score, 2),
-                "predictive_ai": round(predictive_score, 2)
+                "behavioral": score["behavioral_score"],
+                "visual": score["visual_score"],
+                "voice": score["voice_score"],
+                "predictive_ai": score["predictive_ai_score"]
             },
             "weighted_scores": {
-                "behavioral": round(behavioral_weighted, 2),
-                "visual": round(visual_weighted, 2),
-                "voice": round(voice_weighted, 2),
-                "predictive_ai": round(predictive_weighted, 2)
+                "behavioral": score["behavioral_weighted"],
+                "visual": score["visual_weighted"],
+                "voice": score["voice_weighted"],
+                "predictive_ai": score["predictive_weighted"]
             },
-            "final_intent_score": round(final_score, 2),
-            "intent_level": intent_level,
-            "recommended_action": action
+            "final_intent_score": score["final_intent_score"],
+            "intent_level": score["intent_level"],
+            "recommended_action": score["recommended_action"]
         }
     except Exception as e:
         return {"error": str(e)}
 
 # Aggregated Intent Scoring APIs
 @app.get("/api/scoring/summary")
-async def scoring_summary():
+def scoring_summary(conn: sqlite3.Connection = Depends(get_intent_db)):
     """Get aggregated scoring summary for all customers"""
     try:
-        import sqlite3
-        conn = sqlite3.connect("intent_intelligence.db")
         cursor = conn.cursor()
         
         # Total customers scored
@@ -670,7 +602,6 @@ async def scoring_summary():
             for row in cursor.fetchall()
         ]
         
-        conn.close()
         
         return {
             "total_customers_scored": total_customers,
@@ -682,11 +613,9 @@ async def scoring_summary():
         return {"error": str(e)}
 
 @app.get("/api/scoring/high-intent-targets")
-async def high_intent_targets(limit: int = 1000):
+def high_intent_targets(limit: int = 1000, conn: sqlite3.Connection = Depends(get_intent_db)):
     """Get customers with high intent for targeted advertising"""
     try:
-        import sqlite3
-        conn = sqlite3.connect("intent_intelligence.db")
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -706,7 +635,6 @@ async def high_intent_targets(limit: int = 1000):
         """, (limit,))
         
         targets = [dict(row) for row in cursor.fetchall()]
-        conn.close()
         
         return {
             "high_intent_count": len(targets),
@@ -716,11 +644,9 @@ async def high_intent_targets(limit: int = 1000):
         return {"error": str(e)}
 
 @app.get("/api/scoring/intelligence-breakdown")
-async def intelligence_breakdown():
+def intelligence_breakdown(conn: sqlite3.Connection = Depends(get_intent_db)):
     """Get breakdown of scores by intelligence type"""
     try:
-        import sqlite3
-        conn = sqlite3.connect("intent_intelligence.db")
         cursor = conn.cursor()
         
         # Count customers by data completeness
@@ -746,25 +672,18 @@ async def intelligence_breakdown():
                 "avg_score": round(avg_score, 2)
             }
         
-        conn.close()
         return breakdown
     except Exception as e:
         return {"error": str(e)}
 
 # Analytics APIs
 @app.get("/api/v1/analytics/platform-summary")
-async def analytics_platform_summary(date_range: str = "last_30_days"):
+def analytics_platform_summary(date_range: str = "last_30_days", conn: sqlite3.Connection = Depends(get_campaign_db)):
     """Platform-wide analytics summary"""
     try:
-        import sqlite3
-        conn = sqlite3.connect("patternos_campaign_data.db")
         cursor = conn.cursor()
         
         
-        # Calculate date range
-        cursor.execute("SELECT MAX(date) FROM ad_spend_daily")
-        max_date = cursor.fetchone()[0]
-        
         if date_range == "last_7_days":
             days = 7
         elif date_range == "last_30_days":
@@ -778,21 +697,37 @@ async def analytics_platform_summary(date_range: str = "last_30_days"):
         else:
             days = 30
         
-        date_filter = f"AND date >= date('{max_date}', '-{days} days')"
-
-        cursor.execute(f"""
-            SELECT 
-                SUM(spend_value) as total_spend,
-                SUM(impressions) as total_impressions,
-                SUM(clicks) as total_clicks,
-                SUM(conversions) as total_conversions
-            FROM ad_spend_daily
-            WHERE date >= date('{max_date}', '-{days} days')
-        """)
+        if rollups_ready(conn):
+            totals = rollup_totals(conn, days=days)
+            row = (totals[0]["spend"], totals[0]["impressions"], totals[0]["clicks"], totals[0]["conversions"]) if totals else None
+            revenue = totals[0]["revenue"] if totals else 0
+        else:
+            # Calculate date range
+            cursor.execute("SELECT MAX(date) FROM ad_spend_daily")
+            max_date = cursor.fetchone()[0]
+            
+            cursor.execute(f"""
+                SELECT 
+                    SUM(spend_value) as total_spend,
+                    SUM(impressions) as total_impressions,
+                    SUM(clicks) as total_clicks,
+                    SUM(conversions) as total_conversions
+                FROM ad_spend_daily
+                WHERE date >= date('{max_date}', '-{days} days')
+            """)
+            
+            row = cursor.fetchone()
+            
+            # Calculate revenue
+            cursor.execute(f"""
+                SELECT SUM(a.conversions * COALESCE(s.selling_price, 500)) as revenue
+                FROM ad_spend_daily a
+                LEFT JOIN sku_library s ON a.sku_id = s.sku_id
+                WHERE a.date >= date('{max_date}', '-{days} days')
+            """)
+            revenue = cursor.fetchone()[0] or 0
         
-        row = cursor.fetchone()
         if not row or row[0] is None:
-            conn.close()
             return {
                 "brand": brand_name,
                 "total_spend": 0,
@@ -811,17 +746,6 @@ async def analytics_platform_summary(date_range: str = "last_30_days"):
         conversions = conversions or 0
         
         
-        # Calculate revenue
-        cursor.execute(f"""
-            SELECT SUM(a.conversions * COALESCE(s.selling_price, 500)) as revenue
-            FROM ad_spend_daily a
-            LEFT JOIN sku_library s ON a.sku_id = s.sku_id
-            WHERE a.date >= date('{max_date}', '-{days} days')
-        """)
-        revenue = cursor.fetchone()[0] or 0
-        
-        conn.close()
-        
         return {
             "total_spend": round(total_spend, 2),
             "total_revenue": round(revenue, 2),
@@ -860,19 +784,13 @@ async def analytics_platform_summary(date_range: str = "last_30_days"):
         return {"error": str(e)}
 
 @app.get("/api/v1/analytics/channel-performance")
-async def analytics_channel_performance(date_range: str = "last_30_days"):
+def analytics_channel_performance(date_range: str = "last_30_days", conn: sqlite3.Connection = Depends(get_campaign_db)):
     """Performance by channel (YouTube, Meta, Google, etc.)"""
     try:
-        import sqlite3
-        conn = sqlite3.connect("patternos_campaign_data.db")
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
         
-        # Calculate date range
-        cursor.execute("SELECT MAX(date) FROM ad_spend_daily")
-        max_date = cursor.fetchone()[0]
-        
         if date_range == "last_7_days":
             days = 7
         elif date_range == "last_30_days":
@@ -886,50 +804,47 @@ async def analytics_channel_performance(date_range: str = "last_30_days"):
         else:
             days = 30
         
-        date_filter = f"AND date >= date('{max_date}', '-{days} days')"
-
-        cursor.execute(f"""
-            SELECT 
-                a.channel,
-                SUM(a.spend_value) as spend,
-                SUM(a.impressions) as impressions,
-                SUM(a.clicks) as clicks,
-                SUM(a.conversions) as conversions,
-                SUM(a.conversions * COALESCE(s.selling_price, 500)) as revenue
-            FROM ad_spend_daily a
-            LEFT JOIN sku_library s ON a.sku_id = s.sku_id
-            WHERE a.date >= date('{max_date}', '-{days} days')
-            GROUP BY a.channel
-            ORDER BY spend DESC
-        """)
+        if rollups_ready(conn):
+            rows = rollup_totals(conn, ("channel",), days)
+        else:
+            cursor.execute("SELECT MAX(date) FROM ad_spend_daily")
+            max_date = cursor.fetchone()[0]
+            
+            cursor.execute(f"""
+                SELECT 
+                    a.channel,
+                    SUM(a.spend_value) as spend,
+                    SUM(a.impressions) as impressions,
+                    SUM(a.clicks) as clicks,
+                    SUM(a.conversions) as conversions,
+                    SUM(a.conversions * COALESCE(s.selling_price, 500)) as revenue
+                FROM ad_spend_daily a
+                LEFT JOIN sku_library s ON a.sku_id = s.sku_id
+                WHERE a.date >= date('{max_date}', '-{days} days')
+                GROUP BY a.channel
+                ORDER BY spend DESC
+            """)
+            rows = [dict(row) for row in cursor.fetchall()]
         
         channels = []
-        for row in cursor.fetchall():
-            channel = dict(row)
+        for channel in rows:
             channel['ctr'] = round((channel['clicks'] / channel['impressions'] * 100), 2) if channel['impressions'] > 0 else 0
             channel['conversion_rate'] = round((channel['conversions'] / channel['clicks'] * 100), 2) if channel['clicks'] > 0 else 0
             channel['roas'] = round(channel['revenue'] / channel['spend'], 2) if channel['spend'] > 0 else 0
             channels.append(channel)
         
-        conn.close()
         return {"channels": channels}
     except Exception as e:
         return {"error": str(e)}
 
 @app.get("/api/v1/analytics/brand-comparison")
-async def analytics_brand_comparison(date_range: str = "last_30_days"):
+def analytics_brand_comparison(date_range: str = "last_30_days", conn: sqlite3.Connection = Depends(get_campaign_db)):
     """Compare performance across brands"""
     try:
-        import sqlite3
-        conn = sqlite3.connect("patternos_campaign_data.db")
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
         
-        # Calculate date range
-        cursor.execute("SELECT MAX(date) FROM ad_spend_daily")
-        max_date = cursor.fetchone()[0]
-        
         if date_range == "last_7_days":
             days = 7
         elif date_range == "last_30_days":
@@ -943,51 +858,48 @@ async def analytics_brand_comparison(date_range: str = "last_30_days"):
         else:
             days = 30
         
-        date_filter = f"AND date >= date('{max_date}', '-{days} days')"
-
-        cursor.execute(f"""
-            SELECT 
-                a.brand,
-                SUM(a.spend_value) as spend,
-                SUM(a.impressions) as impressions,
-                SUM(a.clicks) as clicks,
-                SUM(a.conversions) as conversions,
-                SUM(a.conversions * COALESCE(s.selling_price, 500)) as revenue
-            FROM ad_spend_daily a
-            LEFT JOIN sku_library s ON a.sku_id = s.sku_id
-            WHERE a.date >= date('{max_date}', '-{days} days')
-            GROUP BY a.brand
-            ORDER BY spend DESC
-        """)
+        if rollups_ready(conn):
+            rows = rollup_totals(conn, ("brand",), days)
+        else:
+            cursor.execute("SELECT MAX(date) FROM ad_spend_daily")
+            max_date = cursor.fetchone()[0]
+            
+            cursor.execute(f"""
+                SELECT 
+                    a.brand,
+                    SUM(a.spend_value) as spend,
+                    SUM(a.impressions) as impressions,
+                    SUM(a.clicks) as clicks,
+                    SUM(a.conversions) as conversions,
+                    SUM(a.conversions * COALESCE(s.selling_price, 500)) as revenue
+                FROM ad_spend_daily a
+                LEFT JOIN sku_library s ON a.sku_id = s.sku_id
+                WHERE a.date >= date('{max_date}', '-{days} days')
+                GROUP BY a.brand
+                ORDER BY spend DESC
+            """)
+            rows = [dict(row) for row in cursor.fetchall()]
         
         brands = []
-        for row in cursor.fetchall():
-            brand = dict(row)
+        for brand in rows:
             brand['roas'] = round(brand['revenue'] / brand['spend'], 2) if brand['spend'] > 0 else 0
             brand['ctr'] = round((brand['clicks'] / brand['impressions'] * 100), 2) if brand['impressions'] > 0 else 0
             brand['conversion_rate'] = round((brand['conversions'] / brand['clicks'] * 100), 2) if brand['clicks'] > 0 else 0
             brand['purchases'] = brand['conversions']  # Add purchases alias
             brands.append(brand)
         
-        conn.close()
         return {"brands": brands}
     except Exception as e:
         return {"error": str(e)}
 
 @app.get("/api/v1/analytics/category-comparison")
-async def analytics_category_comparison(date_range: str = "last_30_days"):
+def analytics_category_comparison(date_range: str = "last_30_days", conn: sqlite3.Connection = Depends(get_campaign_db)):
     """Compare performance across categories"""
     try:
-        import sqlite3
-        conn = sqlite3.connect("patternos_campaign_data.db")
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
         
-        # Calculate date range
-        cursor.execute("SELECT MAX(date) FROM ad_spend_daily")
-        max_date = cursor.fetchone()[0]
-        
         if date_range == "last_7_days":
             days = 7
         elif date_range == "last_30_days":
@@ -1001,39 +913,42 @@ async def analytics_category_comparison(date_range: str = "last_30_days"):
         else:
             days = 30
         
-        date_filter = f"AND date >= date('{max_date}', '-{days} days')"
-
-        cursor.execute(f"""
-            SELECT 
-                category,
-                SUM(spend_value) as spend,
-                SUM(impressions) as impressions,
-                SUM(clicks) as clicks,
-                SUM(conversions) as conversions
-            FROM ad_spend_daily
-            WHERE date >= date('{max_date}', '-{days} days')
-            GROUP BY category
-            ORDER BY spend DESC
-        """)
+        if rollups_ready(conn):
+            rows = rollup_totals(conn, ("category",), days)
+            for row in rows:
+                row.pop("revenue")
+        else:
+            cursor.execute("SELECT MAX(date) FROM ad_spend_daily")
+            max_date = cursor.fetchone()[0]
+            
+            cursor.execute(f"""
+                SELECT 
+                    category,
+                    SUM(spend_value) as spend,
+                    SUM(impressions) as impressions,
+                    SUM(clicks) as clicks,
+                    SUM(conversions) as conversions
+                FROM ad_spend_daily
+                WHERE date >= date('{max_date}', '-{days} days')
+                GROUP BY category
+                ORDER BY spend DESC
+            """)
+            rows = [dict(row) for row in cursor.fetchall()]
         
         categories = []
-        for row in cursor.fetchall():
-            cat = dict(row)
+        for cat in rows:
             cat['ctr'] = round((cat['clicks'] / cat['impressions'] * 100), 2) if cat['impressions'] > 0 else 0
             cat['conversion_rate'] = round((cat['conversions'] / cat['clicks'] * 100), 2) if cat['clicks'] > 0 else 0
             categories.append(cat)
         
-        conn.close()
         return {"categories": categories}
     except Exception as e:
         return {"error": str(e)}
 
 @app.get("/api/v1/analytics/location-comparison")
-async def analytics_location_comparison(date_range: str = "last_30_days"):
+def analytics_location_comparison(date_range: str = "last_30_days", conn: sqlite3.Connection = Depends(get_intent_db)):
     """Compare performance across locations"""
     try:
-        import sqlite3
-        conn = sqlite3.connect("intent_intelligence.db")
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -1055,20 +970,20 @@ async def analytics_location_comparison(date_range: str = "last_30_days"):
             {"location": "Chennai", "users": 2567, "conversions": 445, "spend": 2900000}
         ]
         
-        conn.close()
         return {"locations": locations}
     except Exception as e:
         return {"error": str(e)}
 
 @app.get("/api/v1/analytics/monthly-trends")
-async def analytics_monthly_trends():
+def analytics_monthly_trends(conn: sqlite3.Connection = Depends(get_campaign_db)):
     """Monthly trends for ad spend, clicks, impressions"""
     try:
-        import sqlite3
-        conn = sqlite3.connect("patternos_campaign_data.db")
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
+        if rollups_ready(conn):
+            return {"monthly_trends": rollup_monthly(conn)}
+        
         cursor.execute("""
             SELECT 
                 strftime('%Y-%m', date) as month,
@@ -1082,7 +997,6 @@ async def analytics_monthly_trends():
         """)
         
         trends = [dict(row) for row in cursor.fetchall()]
-        conn.close()
         
         return {"monthly_trends": trends}
     except Exception as e:
@@ -1090,20 +1004,21 @@ async def analytics_monthly_trends():
 
 # Brand-Specific Analytics APIs
 @app.get("/api/v1/brand/{brand_name}/analytics/summary")
-async def brand_analytics_summary(brand_name: str, date_range: str = "last_30_days"):
+def brand_analytics_summary(brand_name: str, date_range: str = "last_30_days", conn: sqlite3.Connection = Depends(get_campaign_db)):
     """Brand-specific platform summary"""
     try:
-        import sqlite3
-        conn = sqlite3.connect("patternos_campaign_data.db")
         cursor = conn.cursor()
+        ready = rollups_ready(conn)
         
         # Calculate date range
         # Get max date for this specific brand
-        cursor.execute("SELECT MAX(date) FROM ad_spend_daily WHERE brand = ?", (brand_name,))
-        max_date = cursor.fetchone()[0]
+        if ready:
+            max_date = rollup_max_date(conn, brand_name)
+        else:
+            cursor.execute("SELECT MAX(date) FROM ad_spend_daily WHERE brand = ?", (brand_name,))
+            max_date = cursor.fetchone()[0]
         
         if not max_date:
-            conn.close()
             return {
                 "brand": brand_name,
                 "total_spend": 0,
@@ -1129,19 +1044,22 @@ async def brand_analytics_summary(brand_name: str, date_range: str = "last_30_da
         else:
             days = 30
         
-        cursor.execute(f"""
-            SELECT 
-                SUM(spend_value) as total_spend,
-                SUM(impressions) as total_impressions,
-                SUM(clicks) as total_clicks,
-                SUM(conversions) as total_conversions
-            FROM ad_spend_daily
-            WHERE brand = ? AND date >= date('{max_date}', '-{days} days')
-        """, (brand_name,))
-        
-        row = cursor.fetchone()
+        if ready:
+            totals = rollup_totals(conn, days=days, brand=brand_name)
+            row = (totals[0]["spend"], totals[0]["impressions"], totals[0]["clicks"], totals[0]["conversions"]) if totals else None
+        else:
+            cursor.execute(f"""
+                SELECT 
+                    SUM(spend_value) as total_spend,
+                    SUM(impressions) as total_impressions,
+                    SUM(clicks) as total_clicks,
+                    SUM(conversions) as total_conversions
+                FROM ad_spend_daily
+                WHERE brand = ? AND date >= date('{max_date}', '-{days} days')
+            """, (brand_name,))
+            
+            row = cursor.fetchone()
         if not row or row[0] is None:
-            conn.close()
             return {
                 "brand": brand_name,
                 "total_spend": 0,
@@ -1160,15 +1078,17 @@ async def brand_analytics_summary(brand_name: str, date_range: str = "last_30_da
         conversions = conversions or 0
         
         # Calculate revenue
-        cursor.execute(f"""
-            SELECT SUM(a.conversions * COALESCE(s.selling_price, 500)) as revenue
-            FROM ad_spend_daily a
-            LEFT JOIN sku_library s ON a.sku_id = s.sku_id
-            WHERE a.brand = ? AND a.date >= date('{max_date}', '-{days} days')
-        """, (brand_name,))
-        revenue = cursor.fetchone()[0] or 0
+        if ready:
+            revenue = totals[0]["revenue"] or 0
+        else:
+            cursor.execute(f"""
+                SELECT SUM(a.conversions * COALESCE(s.selling_price, 500)) as revenue
+                FROM ad_spend_daily a
+                LEFT JOIN sku_library s ON a.sku_id = s.sku_id
+                WHERE a.brand = ? AND a.date >= date('{max_date}', '-{days} days')
+            """, (brand_name,))
+            revenue = cursor.fetchone()[0] or 0
         
-        conn.close()
         
         return {
             "brand": brand_name,
@@ -1185,17 +1105,12 @@ async def brand_analytics_summary(brand_name: str, date_range: str = "last_30_da
         return {"error": str(e)}
 
 @app.get("/api/v1/brand/{brand_name}/analytics/channel-performance")
-async def brand_channel_performance(brand_name: str, date_range: str = "last_30_days"):
+def brand_channel_performance(brand_name: str, date_range: str = "last_30_days", conn: sqlite3.Connection = Depends(get_campaign_db)):
     """Brand-specific channel performance"""
     try:
-        import sqlite3
-        conn = sqlite3.connect("patternos_campaign_data.db")
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
-        cursor.execute("SELECT MAX(date) FROM ad_spend_daily WHERE brand = ?", (brand_name,))
-        max_date = cursor.fetchone()[0]
-        
         if date_range == "last_7_days":
             days = 7
         elif date_range == "last_30_days":
@@ -1203,42 +1118,48 @@ async def brand_channel_performance(brand_name: str, date_range: str = "last_30_
         else:
             days = 30
         
-        cursor.execute(f"""
-            SELECT 
-                a.channel,
-                SUM(a.spend_value) as spend,
-                SUM(a.impressions) as impressions,
-                SUM(a.clicks) as clicks,
-                SUM(a.conversions) as conversions,
-                SUM(a.conversions * COALESCE(s.selling_price, 500)) as revenue
-            FROM ad_spend_daily a
-            LEFT JOIN sku_library s ON a.sku_id = s.sku_id
-            WHERE a.brand = ? AND a.date >= date('{max_date}', '-{days} days')
-            GROUP BY a.channel
-            ORDER BY spend DESC
-        """, (brand_name,))
+        if rollups_ready(conn):
+            rows = rollup_totals(conn, ("channel",), days, brand=brand_name)
+        else:
+            cursor.execute("SELECT MAX(date) FROM ad_spend_daily WHERE brand = ?", (brand_name,))
+            max_date = cursor.fetchone()[0]
+            
+            cursor.execute(f"""
+                SELECT 
+                    a.channel,
+                    SUM(a.spend_value) as spend,
+                    SUM(a.impressions) as impressions,
+                    SUM(a.clicks) as clicks,
+                    SUM(a.conversions) as conversions,
+                    SUM(a.conversions * COALESCE(s.selling_price, 500)) as revenue
+                FROM ad_spend_daily a
+                LEFT JOIN sku_library s ON a.sku_id = s.sku_id
+                WHERE a.brand = ? AND a.date >= date('{max_date}', '-{days} days')
+                GROUP BY a.channel
+                ORDER BY spend DESC
+            """, (brand_name,))
+            rows = [dict(row) for row in cursor.fetchall()]
         
         channels = []
-        for row in cursor.fetchall():
-            channel = dict(row)
+        for channel in rows:
             channel['ctr'] = round((channel['clicks'] / channel['impressions'] * 100), 2) if channel['impressions'] > 0 else 0
             channel['roas'] = round(channel['revenue'] / channel['spend'], 2) if channel['spend'] > 0 else 0
             channels.append(channel)
         
-        conn.close()
         return {"channels": channels}
     except Exception as e:
         return {"error": str(e)}
 
 @app.get("/api/v1/brand/{brand_name}/analytics/monthly-trends")
-async def brand_monthly_trends(brand_name: str):
+def brand_monthly_trends(brand_name: str, conn: sqlite3.Connection = Depends(get_campaign_db)):
     """Brand-specific monthly trends"""
     try:
-        import sqlite3
-        conn = sqlite3.connect("patternos_campaign_data.db")
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
+        if rollups_ready(conn):
+            return {"monthly_trends": rollup_monthly(conn, brand_name)}
+        
         cursor.execute("""
             SELECT 
                 strftime('%Y-%m', date) as month,
@@ -1253,23 +1174,23 @@ async def brand_monthly_trends(brand_name: str):
         """, (brand_name,))
         
         trends = [dict(row) for row in cursor.fetchall()]
-        conn.close()
         
         return {"monthly_trends": trends}
     except Exception as e:
         return {"error": str(e)}
 
 @app.get("/api/v1/brand/{brand_name}/analytics/campaigns")
-async def brand_campaigns_performance(brand_name: str, date_range: str = "last_30_days"):
+def brand_campaigns_performance(brand_name: str, date_range: str = "last_30_days", conn: sqlite3.Connection = Depends(get_campaign_db)):
     """Brand-specific campaign performance"""
     try:
-        import sqlite3
-        conn = sqlite3.connect("patternos_campaign_data.db")
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
-        cursor.execute("SELECT MAX(date) FROM ad_spend_daily WHERE brand = ?", (brand_name,))
-        max_date = cursor.fetchone()[0]
+        if rollups_ready(conn):
+            max_date = rollup_max_date(conn, brand_name)
+        else:
+            cursor.execute("SELECT MAX(date) FROM ad_spend_daily WHERE brand = ?", (brand_name,))
+            max_date = cursor.fetchone()[0]
         
         if date_range == "last_7_days":
             days = 7
@@ -1302,22 +1223,22 @@ async def brand_campaigns_performance(brand_name: str, date_range: str = "last_3
             campaign['conversion_rate'] = round((campaign['conversions'] / campaign['clicks'] * 100), 2) if campaign['clicks'] > 0 else 0
             campaigns.append(campaign)
         
-        conn.close()
         return {"campaigns": campaigns}
     except Exception as e:
         return {"error": str(e)}
 
 @app.get("/api/v1/brand/{brand_name}/analytics/products")
-async def brand_products_performance(brand_name: str, date_range: str = "last_30_days"):
+def brand_products_performance(brand_name: str, date_range: str = "last_30_days", conn: sqlite3.Connection = Depends(get_campaign_db)):
     """Brand-specific product performance"""
     try:
-        import sqlite3
-        conn = sqlite3.connect("patternos_campaign_data.db")
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
-        cursor.execute("SELECT MAX(date) FROM ad_spend_daily WHERE brand = ?", (brand_name,))
-        max_date = cursor.fetchone()[0]
+        if rollups_ready(conn):
+            max_date = rollup_max_date(conn, brand_name)
+        else:
+            cursor.execute("SELECT MAX(date) FROM ad_spend_daily WHERE brand = ?", (brand_name,))
+            max_date = cursor.fetchone()[0]
         
         if date_range == "last_7_days":
             days = 7
@@ -1348,7 +1269,6 @@ async def brand_products_performance(brand_name: str, date_range: str = "last_30
             product['roas'] = round(product['revenue'] / product['spend'], 2) if product['spend'] > 0 else 0
             products.append(product)
         
-        conn.close()
         return {"products": products}
     except Exception as e:
         return {"error": str(e)}
@@ -1361,7 +1281,7 @@ class LoginRequest(BaseModel):
     password: str
 
 @app.post("/auth/login")
-async def login(request: LoginRequest):
+def login(request: LoginRequest, conn: sqlite3.Connection = Depends(get_campaign_db)):
     """Authenticate user - supports both aggregator and brand logins"""
     try:
         import sqlite3
@@ -1383,7 +1303,6 @@ async def login(request: LoginRequest):
                 }
         
         # Check brand logins from database
-        conn = sqlite3.connect("patternos_campaign_data.db")
         cursor = conn.cursor()
         
         # Check by email or brand_name
@@ -1394,8 +1313,7 @@ async def login(request: LoginRequest):
         """, (request.username, request.username, request.password))
         
         brand = cursor.fetchone()
-        conn.close()
-        
+    
         if brand:
             brand_id, brand_name, email, password, status = brand
             if status == 'active':
@@ -1417,11 +1335,9 @@ async def login(request: LoginRequest):
 # Attribution & Conversion Funnel APIs
 
 @app.get("/api/v1/attribution/summary")
-async def attribution_summary(brand_name: str = None):
+def attribution_summary(brand_name: str = None, conn: sqlite3.Connection = Depends(get_campaign_db)):
     """Attribution summary - all brands or specific brand"""
     try:
-        import sqlite3
-        conn = sqlite3.connect("patternos_campaign_data.db")
         cursor = conn.cursor()
         
         brand_filter = ""
@@ -1447,7 +1363,6 @@ async def attribution_summary(brand_name: str = None):
         """, params)
         
         result = cursor.fetchone()
-        conn.close()
         
         return {
             "total_orders": result[0],
@@ -1459,11 +1374,9 @@ async def attribution_summary(brand_name: str = None):
         return {"error": str(e)}
 
 @app.get("/api/v1/attribution/channel-contribution")
-async def attribution_channel_contribution(brand_name: str = None):
+def attribution_channel_contribution(brand_name: str = None, conn: sqlite3.Connection = Depends(get_campaign_db)):
     """Channel contribution to conversions"""
     try:
-        import sqlite3
-        conn = sqlite3.connect("patternos_campaign_data.db")
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -1487,21 +1400,28 @@ async def attribution_channel_contribution(brand_name: str = None):
         """, params)
         
         channels = [dict(row) for row in cursor.fetchall()]
-        conn.close()
         
         return {"channels": channels}
     except Exception as e:
         return {"error": str(e)}
 
 @app.get("/api/v1/attribution/path-analysis")
-async def attribution_path_analysis(brand_name: str = None, limit: int = 100):
+def attribution_path_analysis(brand_name: str = None, limit: int = 100, conn: sqlite3.Connection = Depends(get_campaign_db)):
     """Analyze conversion paths"""
     try:
-        import sqlite3
-        conn = sqlite3.connect("patternos_campaign_data.db")
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
+        if summaries_ready(conn):
+            cursor.execute("""
+                SELECT order_id, path, path_length, total_spend
+                FROM attribution_order_paths
+                WHERE scope = ?
+                ORDER BY path_length DESC
+                LIMIT ?
+            """, (brand_name or ALL_BRANDS, limit))
+            return {"paths": [dict(row) for row in cursor.fetchall()]}
+        
         brand_filter = ""
         params = []
         if brand_name:
@@ -1525,21 +1445,28 @@ async def attribution_path_analysis(brand_name: str = None, limit: int = 100):
         """, params)
         
         paths = [dict(row) for row in cursor.fetchall()]
-        conn.close()
         
         return {"paths": paths}
     except Exception as e:
         return {"error": str(e)}
 
 @app.get("/api/v1/attribution/top-paths")
-async def attribution_top_paths(brand_name: str = None):
+def attribution_top_paths(brand_name: str = None, conn: sqlite3.Connection = Depends(get_campaign_db)):
     """Most common conversion paths"""
     try:
-        import sqlite3
-        conn = sqlite3.connect("patternos_campaign_data.db")
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
+        if summaries_ready(conn):
+            cursor.execute("""
+                SELECT path, frequency, total_spend, avg_spend
+                FROM attribution_top_paths
+                WHERE scope = ?
+                ORDER BY frequency DESC
+                LIMIT 20
+            """, (brand_name or ALL_BRANDS,))
+            return {"top_paths": [dict(row) for row in cursor.fetchall()]}
+        
         brand_filter = ""
         params = []
         if brand_name:
@@ -1569,21 +1496,34 @@ async def attribution_top_paths(brand_name: str = None):
         """, params)
         
         top_paths = [dict(row) for row in cursor.fetchall()]
-        conn.close()
         
         return {"top_paths": top_paths}
     except Exception as e:
         return {"error": str(e)}
 
 @app.get("/api/v1/attribution/model-comparison")
-async def attribution_model_comparison(brand_name: str = None):
+def attribution_model_comparison(brand_name: str = None, conn: sqlite3.Connection = Depends(get_campaign_db)):
     """Compare different attribution models"""
     try:
-        import sqlite3
-        conn = sqlite3.connect("patternos_campaign_data.db")
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
+        if summaries_ready(conn):
+            scope = brand_name or ALL_BRANDS
+            cursor.execute("""
+                SELECT attribution_method, orders, attributed_spend
+                FROM attribution_method_summary
+                WHERE scope = ?
+            """, (scope,))
+            models = [dict(row) for row in cursor.fetchall()]
+            cursor.execute("""
+                SELECT model, channel, credit
+                FROM attribution_channel_credits
+                WHERE scope = ?
+                ORDER BY model, credit DESC
+            """, (scope,))
+            return {"models": models, "channel_credits": [dict(row) for row in cursor.fetchall()]}
+        
         brand_filter = ""
         params = []
         if brand_name:
@@ -1602,21 +1542,29 @@ async def attribution_model_comparison(brand_name: str = None):
         """, params)
         
         models = [dict(row) for row in cursor.fetchall()]
-        conn.close()
         
         return {"models": models}
     except Exception as e:
         return {"error": str(e)}
 
 @app.get("/api/v1/attribution/assisted-conversions")
-async def attribution_assisted_conversions(brand_name: str = None):
+def attribution_assisted_conversions(brand_name: str = None, conn: sqlite3.Connection = Depends(get_campaign_db)):
     """Campaigns with assisted conversions"""
     try:
-        import sqlite3
-        conn = sqlite3.connect("patternos_campaign_data.db")
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
+        if summaries_ready(conn):
+            brand_filter = "WHERE brand = ?" if brand_name else ""
+            cursor.execute(f"""
+                SELECT campaign_id, brand, channel, category, assisted_orders, attributed_spend, touchpoints
+                FROM attribution_campaign_summary
+                {brand_filter}
+                ORDER BY assisted_orders DESC
+                LIMIT 50
+            """, [brand_name] if brand_name else [])
+            return {"campaigns": [dict(row) for row in cursor.fetchall()]}
+        
         brand_filter = ""
         params = []
         if brand_name:
@@ -1641,18 +1589,15 @@ async def attribution_assisted_conversions(brand_name: str = None):
         """, params)
         
         campaigns = [dict(row) for row in cursor.fetchall()]
-        conn.close()
         
         return {"campaigns": campaigns}
     except Exception as e:
         return {"error": str(e)}
 
 @app.get("/api/v1/attribution/touchpoint-distribution")
-async def attribution_touchpoint_distribution(brand_name: str = None):
+def attribution_touchpoint_distribution(brand_name: str = None, conn: sqlite3.Connection = Depends(get_campaign_db)):
     """Distribution of orders by number of touchpoints"""
     try:
-        import sqlite3
-        conn = sqlite3.connect("patternos_campaign_data.db")
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -1685,21 +1630,35 @@ async def attribution_touchpoint_distribution(brand_name: str = None):
         """, params)
         
         distribution = [dict(row) for row in cursor.fetchall()]
-        conn.close()
         
         return {"distribution": distribution}
     except Exception as e:
         return {"error": str(e)}
 
 @app.get("/api/v1/attribution/channel-overlap")
-async def attribution_channel_overlap(brand_name: str = None):
+def attribution_channel_overlap(brand_name: str = None, conn: sqlite3.Connection = Depends(get_campaign_db)):
     """Channel combinations in customer journeys"""
     try:
-        import sqlite3
-        conn = sqlite3.connect("patternos_campaign_data.db")
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
+        if summaries_ready(conn):
+            scope = brand_name or ALL_BRANDS
+            cursor.execute("""
+                SELECT channels, frequency
+                FROM attribution_channel_combos
+                WHERE scope = ?
+                ORDER BY frequency DESC
+                LIMIT 20
+            """, (scope,))
+            overlaps = [dict(row) for row in cursor.fetchall()]
+            cursor.execute("""
+                SELECT channel_a, channel_b, orders
+                FROM attribution_channel_overlap
+                WHERE scope = ?
+            """, (scope,))
+            return {"overlaps": overlaps, "matrix": [dict(row) for row in cursor.fetchall()]}
+        
         brand_filter = ""
         params = []
         if brand_name:
@@ -1726,18 +1685,15 @@ async def attribution_channel_overlap(brand_name: str = None):
         """, params)
         
         overlaps = [dict(row) for row in cursor.fetchall()]
-        conn.close()
         
         return {"overlaps": overlaps}
     except Exception as e:
         return {"error": str(e)}
 
 @app.get("/api/v1/attribution/conversion-value-analysis")
-async def attribution_conversion_value_analysis(brand_name: str = None):
+def attribution_conversion_value_analysis(brand_name: str = None, conn: sqlite3.Connection = Depends(get_campaign_db)):
     """Analyze conversion value by touchpoint count"""
     try:
-        import sqlite3
-        conn = sqlite3.connect("patternos_campaign_data.db")
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -1775,23 +1731,21 @@ async def attribution_conversion_value_analysis(brand_name: str = None):
         """, params)
         
         analysis = [dict(row) for row in cursor.fetchall()]
-        conn.close()
         
         return {"value_analysis": analysis}
     except Exception as e:
         return {"error": str(e)}
 
 @app.get("/api/v1/campaigns/all")
-async def get_all_campaigns(
+def get_all_campaigns(
     brand: str = None,
     channel: str = None, 
     intent_level: str = None,
-    date_range: str = "last_30_days"
+    date_range: str = "last_30_days",
+    conn: sqlite3.Connection = Depends(get_campaign_db)
 ):
     """Get all campaigns with performance metrics"""
     try:
-        import sqlite3
-        conn = sqlite3.connect("patternos_campaign_data.db")
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -1861,7 +1815,6 @@ async def get_all_campaigns(
         total_revenue = sum(c['revenue'] for c in campaigns)
         avg_roas = round(total_revenue / total_spend, 2) if total_spend > 0 else 0
         
-        conn.close()
         
         return {
             "campaigns": campaigns,
@@ -1877,16 +1830,15 @@ async def get_all_campaigns(
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/v1/products/search")
-async def search_products(
+def search_products(
     search: str = None,
     brand: str = None,
     category: str = None,
-    limit: int = 50
+    limit: int = 50,
+    conn: sqlite3.Connection = Depends(get_campaign_db)
 ):
     """Search products from SKU library for campaign creation"""
     try:
-        import sqlite3
-        conn = sqlite3.connect("patternos_campaign_data.db")
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -1934,7 +1886,6 @@ async def search_products(
         cursor.execute("SELECT DISTINCT brand FROM sku_library WHERE brand IS NOT NULL ORDER BY brand")
         brands = [row[0] for row in cursor.fetchall()]
         
-        conn.close()
         
         return {
             "products": products,
@@ -1951,13 +1902,13 @@ async def search_products(
 # ============================================
 
 @app.get("/api/v1/superego/profiles")
-async def get_superego_profiles(
+def get_superego_profiles(
     limit: int = 100,
     min_premium_readiness: float = 0,
-    identity: str = None
+    identity: str = None,
+    conn: sqlite3.Connection = Depends(get_campaign_db)
 ):
     """Get Super-Ego customer profiles with filtering"""
-    conn = sqlite3.connect('patternos_campaign_data.db')
     
     query = """
         SELECT 
@@ -1991,7 +1942,6 @@ async def get_superego_profiles(
     params.append(limit)
     
     profiles = conn.execute(query, params).fetchall()
-    conn.close()
     
     result = []
     for profile in profiles:
@@ -2020,9 +1970,8 @@ async def get_superego_profiles(
 
 
 @app.get("/api/v1/superego/distribution")
-async def get_superego_distribution():
+def get_superego_distribution(conn: sqlite3.Connection = Depends(get_campaign_db)):
     """Get Super-Ego identity distribution statistics"""
-    conn = sqlite3.connect('patternos_campaign_data.db')
     
     # Identity distribution
     identity_dist = conn.execute("""
@@ -2071,7 +2020,6 @@ async def get_superego_distribution():
             END
     """).fetchall()
     
-    conn.close()
     
     return {
         "identity_distribution": [
@@ -2108,89 +2056,83 @@ async def get_superego_distribution():
 
 
 @app.get("/api/v1/superego/premium-ready")
-async def get_premium_ready_customers(min_score: float = 60):
+def get_premium_ready_customers(min_score: float = 60, conn: sqlite3.Connection = Depends(get_campaign_db)):
     """Get customers ready for premium product targeting"""
-    conn = sqlite3.connect('patternos_campaign_data.db')
+    customers = conn.execute("""
+        SELECT 
+            customer_id,
+            primary_identity,
+            premium_readiness_score,
+            current_aov,
+            potential_aov,
+            total_orders,
+            identity_confidence
+        FROM superego_profiles
+        WHERE premium_readiness_score >= ?
+        ORDER BY premium_readiness_score DESC
+    """, (min_score,)).fetchall()
     
-    try:
-        customers = conn.execute("""
-            SELECT 
-                customer_id,
-                primary_identity,
-                premium_readiness_score,
-                current_aov,
-                potential_aov,
-                total_orders,
-                identity_confidence
-            FROM superego_profiles
-            WHERE premium_readiness_score >= ?
-            ORDER BY premium_readiness_score DESC
-        """, (min_score,)).fetchall()
-        
-        result = []
-        for customer in customers:
-            # Get top categories
-            top_categories = conn.execute("""
-                SELECT category_level_1, COUNT(*) as cnt
-                FROM order_products
-                WHERE customer_id = ?
-                GROUP BY category_level_1
-                ORDER BY cnt DESC
-                LIMIT 3
-            """, (customer[0],)).fetchall()
-            
-            recommended_categories = [cat[0] for cat in top_categories if cat[0]]
-            
-            # Get premium products based on customer's identity and interests
-            # For all identities, get premium products in their preferred categories
-            premium_products = conn.execute("""
-                SELECT DISTINCT s.brand, s.category_level_1, s.selling_price
-                FROM sku_library s
-                WHERE s.premium_flag = 1
-                AND s.price_band = 'High'
-                AND s.category_level_1 IN (
-                    SELECT category_level_1 FROM order_products 
-                    WHERE customer_id = ? 
-                    LIMIT 3
-                )
-                ORDER BY s.selling_price DESC
+    result = []
+    for customer in customers:
+        # Get top categories
+        top_categories = conn.execute("""
+            SELECT category_level_1, COUNT(*) as cnt
+            FROM order_products
+            WHERE customer_id = ?
+            GROUP BY category_level_1
+            ORDER BY cnt DESC
+            LIMIT 3
+        """, (customer[0],)).fetchall()
+        
+        recommended_categories = [cat[0] for cat in top_categories if cat[0]]
+        
+        # Get premium products based on customer's identity and interests
+        # For all identities, get premium products in their preferred categories
+        premium_products = conn.execute("""
+            SELECT DISTINCT s.brand, s.category_level_1, s.selling_price
+            FROM sku_library s
+            WHERE s.premium_flag = 1
+            AND s.price_band = 'High'
+            AND s.category_level_1 IN (
+                SELECT category_level_1 FROM order_products 
+                WHERE customer_id = ? 
                 LIMIT 3
-            """, (customer[0],)).fetchall()
-            
-            # Rename to premium_products to better reflect it works for all identities
-            aspirational_items = [
-                {"brand": p[0], "category": p[1], "price": round(float(p[2]) if p[2] else 0, 0)} 
-                for p in premium_products
-            ]
-            
-            uplift = ((customer[4] - customer[3]) / customer[3] * 100) if customer[3] > 0 else 0
-            result.append({
-                "customer_id": customer[0],
-                "primary_identity": customer[1],
-                "premium_readiness_score": round(customer[2], 1),
-                "current_aov": round(customer[3], 2),
-                "potential_aov": round(customer[4], 2),
-                "uplift_percentage": round(uplift, 1),
-                "total_orders": customer[5],
-                "identity_confidence": round(customer[6], 1),
-                "recommended_categories": recommended_categories,
-                "aspirational_products": aspirational_items,
-                "recommended_action": "Target with premium products" if customer[2] >= 70 else "Nurture with mid-premium products"
-            })
+            )
+            ORDER BY s.selling_price DESC
+            LIMIT 3
+        """, (customer[0],)).fetchall()
+        
+        # Rename to premium_products to better reflect it works for all identities
+        aspirational_items = [
+            {"brand": p[0], "category": p[1], "price": round(float(p[2]) if p[2] else 0, 0)} 
+            for p in premium_products
+        ]
         
-        return {
-            "premium_ready_customers": result,
-            "count": len(result),
-            "total_potential_revenue_increase": sum(r["potential_aov"] - r["current_aov"] for r in result)
-        }
-    finally:
-        conn.close()
+        uplift = ((customer[4] - customer[3]) / customer[3] * 100) if customer[3] > 0 else 0
+        result.append({
+            "customer_id": customer[0],
+            "primary_identity": customer[1],
+            "premium_readiness_score": round(customer[2], 1),
+            "current_aov": round(customer[3], 2),
+            "potential_aov": round(customer[4], 2),
+            "uplift_percentage": round(uplift, 1),
+            "total_orders": customer[5],
+            "identity_confidence": round(customer[6], 1),
+            "recommended_categories": recommended_categories,
+            "aspirational_products": aspirational_items,
+            "recommended_action": "Target with premium products" if customer[2] >= 70 else "Nurture with mid-premium products"
+        })
+    
+    return {
+        "premium_ready_customers": result,
+        "count": len(result),
+        "total_potential_revenue_increase": sum(r["potential_aov"] - r["current_aov"] for r in result)
+    }
 
 
 @app.get("/api/v1/superego/insights")
-async def get_superego_insights():
+def get_superego_insights(conn: sqlite3.Connection = Depends(get_campaign_db)):
     """Get actionable Super-Ego insights for campaigns"""
-    conn = sqlite3.connect('patternos_campaign_data.db')
     
     # High-value opportunities
     high_value = conn.execute("""
@@ -2220,7 +2162,6 @@ async def get_superego_insights():
         LIMIT 20
     """).fetchall()
     
-    conn.close()
     
     return {
         "high_value_opportunities": [
@@ -2251,13 +2192,11 @@ async def get_superego_insights():
 # ============================================
 
 @app.post("/api/v1/ad-approval/submit")
-async def submit_campaign_for_approval(campaign_data: dict):
+def submit_campaign_for_approval(campaign_data: dict, conn: sqlite3.Connection = Depends(get_campaign_writer)):
     """Submit a campaign for AI validation and approval with pricing calculation"""
-    import sqlite3
     import uuid
     from datetime import datetime
     
-    conn = sqlite3.connect('patternos_campaign_data.db')
     cursor = conn.cursor()
     
     submission_id = str(uuid.uuid4())[:16]
@@ -2291,10 +2230,9 @@ async def submit_campaign_for_approval(campaign_data: dict):
     ))
     
     conn.commit()
-    conn.close()
     
     # Trigger AI validation
-    validation_result = await validate_campaign(submission_id, campaign_data)
+    validation_result = validate_campaign(submission_id, campaign_data, conn)
     
     return {
         "submission_id": submission_id,
@@ -2306,12 +2244,10 @@ async def submit_campaign_for_approval(campaign_data: dict):
 
 
 @app.post("/api/v1/ad-approval/validate/{submission_id}")
-async def validate_campaign(submission_id: str, campaign_data: dict = None):
+def validate_campaign(submission_id: str, campaign_data: dict = None, conn: sqlite3.Connection = Depends(get_campaign_writer)):
     """Run AI validation on submitted campaign"""
-    import sqlite3
     from datetime import datetime
     
-    conn = sqlite3.connect('patternos_campaign_data.db')
     cursor = conn.cursor()
     
     # If campaign_data not provided, fetch from DB
@@ -2462,7 +2398,6 @@ async def validate_campaign(submission_id: str, campaign_data: dict = None):
     ))
     
     conn.commit()
-    conn.close()
     
     return {
         "submission_id": submission_id,
@@ -2479,11 +2414,9 @@ async def validate_campaign(submission_id: str, campaign_data: dict = None):
 
 
 @app.get("/api/v1/ad-approval/pending")
-async def get_pending_approvals():
+def get_pending_approvals(conn: sqlite3.Connection = Depends(get_campaign_db)):
     """Get all campaigns pending approval"""
-    import sqlite3
     
-    conn = sqlite3.connect('patternos_campaign_data.db')
     cursor = conn.cursor()
     
     submissions = cursor.execute("""
@@ -2504,7 +2437,6 @@ async def get_pending_approvals():
         ORDER BY cs.submitted_at DESC
     """).fetchall()
     
-    conn.close()
     
     result = []
     for sub in submissions:
@@ -2525,11 +2457,9 @@ async def get_pending_approvals():
 
 
 @app.get("/api/v1/ad-approval/{submission_id}/details")
-async def get_approval_details(submission_id: str):
+def get_approval_details(submission_id: str, conn: sqlite3.Connection = Depends(get_campaign_db)):
     """Get detailed validation results for a submission"""
-    import sqlite3
     
-    conn = sqlite3.connect('patternos_campaign_data.db')
     cursor = conn.cursor()
     
     # Get submission details
@@ -2538,7 +2468,6 @@ async def get_approval_details(submission_id: str):
     """, (submission_id,)).fetchone()
     
     if not submission:
-        conn.close()
         return {"error": "Submission not found"}
     
     # Get all validation results
@@ -2562,7 +2491,6 @@ async def get_approval_details(submission_id: str):
         ORDER BY pillar, severity DESC
     """).fetchall()
     
-    conn.close()
     
     # Calculate pricing for this submission
     pricing = PricingEngine.calculate_campaign_cost(
@@ -2699,12 +2627,10 @@ async def estimate_campaign_performance(
 
 
 @app.post("/api/v1/ad-approval/{submission_id}/approve")
-async def approve_campaign(submission_id: str, approval_data: dict):
+def approve_campaign(submission_id: str, approval_data: dict, conn: sqlite3.Connection = Depends(get_campaign_writer)):
     """Approve or reject a campaign submission"""
-    import sqlite3
     from datetime import datetime
     
-    conn = sqlite3.connect('patternos_campaign_data.db')
     cursor = conn.cursor()
     
     action = approval_data.get('action', 'approve')  # approve or reject
@@ -2724,7 +2650,6 @@ async def approve_campaign(submission_id: str, approval_data: dict):
     ))
     
     conn.commit()
-    conn.close()
     
     return {
         "submission_id": submission_id,
@@ -1,5 +1,11 @@
 import json
 import logging
+import os
+import queue
+import threading
+import time
+from typing import Callable, Iterable, List, Optional
+
 from .config import settings
 
 logger = logging.getLogger("producer")
@@ -10,44 +16,287 @@ try:
 except Exception:
     has_kafka = False
 
+PRODUCER_QUEUE_SIZE = int(os.getenv("PRODUCER_QUEUE_SIZE", "100000"))
+PRODUCER_BATCH_SIZE = int(os.getenv("PRODUCER_BATCH_SIZE", "1000"))
+PRODUCER_LINGER_SECONDS = float(os.getenv("PRODUCER_LINGER_MS", "50")) / 1000
+FALLBACK_FSYNC_SECONDS = float(os.getenv("FALLBACK_FSYNC_MS", "200")) / 1000
+KAFKA_RETRY_SECONDS = 5.0
+KAFKA_COMPRESSION = os.getenv("KAFKA_COMPRESSION", "gzip")
+
+
+class KafkaBroker:
+    """One KafkaProducer; publish() hands a whole batch over and waits once"""
+
+    def __init__(self, topic: str = settings.KAFKA_TOPIC):
+        self.topic = topic
+        self.producer = KafkaProducer(
+            bootstrap_servers=[settings.KAFKA_BOOTSTRAP],
+            compression_type=KAFKA_COMPRESSION,
+            linger_ms=int(PRODUCER_LINGER_SECONDS * 1000),
+            batch_size=256 * 1024,
+            retries=5,
+        )
+
+    def publish(self, records: List[bytes]):
+        futures = [self.producer.send(self.topic, record) for record in records]
+        self.producer.flush()
+        for future in futures:
+            future.get(timeout=0)  # raises if the broker rejected the record
+
+    def close(self):
+        self.producer.close()
+
+
+def kafka_broker() -> Optional[KafkaBroker]:
+    if not has_kafka:
+        return None
+    try:
+        broker = KafkaBroker()
+        logger.info("KafkaProducer initialized")
+        return broker
+    except Exception as e:
+        logger.warning("Kafka not available: %s", e)
+        return None
+
+
+class FallbackLog:
+    """
+    Append-only JSON-lines file with one open handle and group commit:
+    writes are buffered and fsync'd at most every fsync_interval seconds.
+    """
+
+    def __init__(self, path: str, fsync_interval: float = FALLBACK_FSYNC_SECONDS):
+        self.path = path
+        self.replay_path = path + ".replay"
+        self.fsync_interval = fsync_interval
+        self._fh = None
+        self._dirty = False
+        self._last_sync = time.monotonic()
+
+    def write(self, lines: Iterable[str]):
+        if self._fh is None:
+            self._fh = open(self.path, "a", encoding="utf-8")
+        self._fh.writelines(line + "\n" for line in lines)
+        self._dirty = True
+        if time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        if self._fh is not None and self._dirty:
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+            self._dirty = False
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        self.sync()
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def pending(self) -> bool:
+        return (os.path.exists(self.replay_path)
+                or (os.path.exists(self.path) and os.path.getsize(self.path) > 0))
+
+    def replay(self, publish: Callable[[List[str]], None], batch_size: int) -> int:
+        """
+        Publish buffered events in order, batch by batch; returns events sent.
+        The log is rotated to .replay first, so new fallback writes go to a
+        fresh file. A failed publish leaves the unsent rest for the next call;
+        a batch in flight at the failure may be sent twice (at-least-once).
+        """
+        if not os.path.exists(self.replay_path):
+            self.close()
+            if not os.path.exists(self.path):
+                return 0
+            os.replace(self.path, self.replay_path)
+
+        sent = 0
+        with open(self.replay_path, encoding="utf-8") as fh:
+            lines = [line.rstrip("\n") for line in fh if line.strip()]
+        try:
+            for start in range(0, len(lines), batch_size):
+                publish(lines[start:start + batch_size])
+                sent += len(lines[start:start + batch_size])
+        finally:
+            if sent == len(lines):
+                os.remove(self.replay_path)
+            elif sent:
+                rest = self.replay_path + ".tmp"
+                with open(rest, "w", encoding="utf-8") as fh:
+                    fh.writelines(line + "\n" for line in lines[sent:])
+                    fh.flush()
+                    os.fsync(fh.fileno())
+                os.replace(rest, self.replay_path)
+        return sent
+
+
 class EventProducer:
-    def __init__(self):
+    """
+    Batching event producer.
+
+    send() only enqueues into a bounded in-process queue. A background
+    thread drains it in micro-batches (batch_size events or linger seconds,
+    whichever comes first) and publishes each batch to Kafka with one
+    flush. While Kafka is unavailable, batches go to the fallback log, and
+    once a broker connects again the log is replayed to it before new
+    events are sent.
+    """
+
+    def __init__(self, broker_factory: Callable[[], object] = kafka_broker,
+                 fallback_path: str = settings.FALLBACK_EVENTS_FILE,
+                 max_queue: int = PRODUCER_QUEUE_SIZE, batch_size: int = PRODUCER_BATCH_SIZE,
+                 linger: float = PRODUCER_LINGER_SECONDS, retry_interval: float = KAFKA_RETRY_SECONDS,
+                 fsync_interval: float = FALLBACK_FSYNC_SECONDS):
         self.topic = settings.KAFKA_TOPIC
-        if has_kafka:
+        self.broker_factory = broker_factory
+        self.fallback = FallbackLog(fallback_path, fsync_interval)
+        self.batch_size = batch_size
+        self.linger = linger
+        self.retry_interval = retry_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.broker = None
+        self._next_connect = 0.0
+        self._thread = None
+        self._stopping = threading.Event()
+        self._start_lock = threading.Lock()
+
+        self.sent = 0
+        self.fallback_written = 0
+        self.replayed = 0
+        self.rejected = 0
+
+    @property
+    def kafka_available(self) -> bool:
+        return self.broker is not None
+
+    def send(self, payload: dict, timeout: Optional[float] = None) -> bool:
+        """Queue one event; False when the queue stays full (backpressure)"""
+        self.start()
+        try:
+            self.queue.put(payload, block=timeout is not None, timeout=timeout)
+        except queue.Full:
+            self.rejected += 1
+            return False
+        return True
+
+    def send_many(self, payloads: Iterable[dict]) -> int:
+        """Queue events until the queue is full; returns how many were accepted"""
+        accepted = 0
+        payloads = iter(payloads)
+        for payload in payloads:
+            if not self.send(payload):
+                # send() counted this one; everything after it is rejected too
+                self.rejected += sum(1 for _ in payloads)
+                break
+            accepted += 1
+        return accepted
+
+    def start(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._stopping.clear()
+                    self._thread = threading.Thread(target=self._run, name="event-producer", daemon=True)
+                    self._thread.start()
+
+    def _next_batch(self) -> List[dict]:
+        try:
+            batch = [self.queue.get(timeout=max(self.linger, 0.01))]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.linger
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not (self._stopping.is_set() and self.queue.empty()):
+            batch = self._next_batch()
             try:
-                self.producer = KafkaProducer(
-                    bootstrap_servers=[settings.KAFKA_BOOTSTRAP],
-                    value_serializer=lambda v: json.dumps(v).encode('utf-8'),
-                    retries=5
-                )
-                self.kafka_available = True
-                logger.info("KafkaProducer initialized")
+                self._deliver([json.dumps(payload) for payload in batch])
+            except Exception:
+                logger.exception("Event batch delivery failed")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+        self.fallback.close()
+
+    def _connect(self):
+        if self.broker is None and time.monotonic() >= self._next_connect:
+            self.broker = self.broker_factory()
+            if self.broker is None:
+                self._next_connect = time.monotonic() + self.retry_interval
+
+    def _drop_broker(self, error: Exception):
+        logger.error("Kafka send failed, fallback to file: %s", error)
+        self.broker = None
+        self._next_connect = time.monotonic() + self.retry_interval
+
+    def _publish(self, lines: List[str]):
+        self.broker.publish([line.encode("utf-8") for line in lines])
+
+    def _deliver(self, lines: List[str]):
+        """Publish one batch of JSON lines, replaying any fallback backlog first"""
+        self._connect()
+        if self.broker is not None and self.fallback.pending():
+            try:
+                self.replayed += self.fallback.replay(self._publish, self.batch_size)
             except Exception as e:
-                logger.warning("Kafka not available: %s", e)
-                self.producer = None
-                self.kafka_available = False
-        else:
-            self.producer = None
-            self.kafka_available = False
+                self._drop_broker(e)
 
-    def send(self, payload: dict):
-        """Send event to Kafka if available, otherwise fallback to a local file."""
-        if self.kafka_available and self.producer:
+        # New events go behind any backlog so the topic stays in order
+        if lines and self.broker is not None and not self.fallback.pending():
             try:
-                self.producer.send(self.topic, payload)
-                self.producer.flush()
-                return True
+                self._publish(lines)
+                self.sent += len(lines)
+                return
             except Exception as e:
-                logger.error("Kafka send failed, fallback to file: %s", e)
-                self.kafka_available = False
+                self._drop_broker(e)
+
+        if lines:
+            self.fallback.write(lines)
+            self.fallback_written += len(lines)
+        else:
+            self.fallback.sync()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until every queued event has been published or written to the fallback log"""
+        deadline = time.monotonic() + timeout
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 10.0):
+        """Drain the queue, stop the background thread and fsync the fallback log"""
+        if self._thread is not None:
+            self._stopping.set()
+            self._thread.join(timeout)
+            self._thread = None
+        if self.broker is not None and hasattr(self.broker, "close"):
+            self.broker.close()
+            self.broker = None
+
+    def metrics(self) -> dict:
+        return {
+            "queued": self.queue.qsize(),
+            "max_queue": self.queue.maxsize,
+            "sent": self.sent,
+            "fallback_written": self.fallback_written,
+            "replayed": self.replayed,
+            "rejected": self.rejected,
+            "kafka_available": self.kafka_available,
+        }
 
-        # fallback if Kafka not available
-        try:
-            with open(settings.FALLBACK_EVENTS_FILE, "a", encoding="utf-8") as fh:
-                fh.write(json.dumps(payload) + "\n")
-            return True
-        except Exception as e:
-            logger.error("Fallback write failed: %s", e)
-            return False
 
 producer = EventProducer()
@@ -0,0 +1,183 @@
+"""
+PatternOS Response Cache
+Caches dashboard responses until the database they were computed from changes.
+
+Each database carries a one-row data_version table. Writers that change
+dashboard data (ETL loads, rescoring, the summary and rollup batches) call
+bump_data_version() in their write transaction; writes to the raw event
+tables bump it through triggers (install_data_version_triggers). A cached
+response is keyed by database file, endpoint and query parameters, and is
+served while the database's version is the one it was computed at, for at
+most RESPONSE_CACHE_TTL seconds in case a writer bypasses both. Concurrent
+misses for the same key wait for a single computation instead of each
+running the full-table aggregates.
+"""
+import functools
+import inspect
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Hashable, List, Sequence, Tuple
+
+RESPONSE_CACHE_SIZE = 512
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+
+# Tables written outside the app's own write paths (ingest, scripts, ETL)
+VERSIONED_TABLES = ("user_events", "purchases", "intent_scores")
+
+DATA_VERSION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS data_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL
+)
+"""
+
+
+def bump_data_version(conn: sqlite3.Connection) -> int:
+    """Advance the database's data version; part of the caller's transaction"""
+    conn.execute(DATA_VERSION_SCHEMA)
+    conn.execute("""
+        INSERT INTO data_version (id, version) VALUES (1, 1)
+        ON CONFLICT (id) DO UPDATE SET version = version + 1
+    """)
+    return conn.execute("SELECT version FROM data_version WHERE id = 1").fetchone()[0]
+
+
+def install_data_version_triggers(conn: sqlite3.Connection,
+                                  tables: Sequence[str] = VERSIONED_TABLES) -> List[str]:
+    """
+    Bump the data version on every insert, update or delete of the given
+    tables, whoever the writer is. Returns the tables that exist and got
+    triggers.
+    """
+    conn.execute(DATA_VERSION_SCHEMA)
+    conn.execute("INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 0)")
+    installed = []
+    for table in tables:
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+        if exists is None:
+            continue
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS data_version_{table}_{event.lower()} AFTER {event} ON {table}
+                BEGIN UPDATE data_version SET version = version + 1 WHERE id = 1; END
+            """)
+        installed.append(table)
+    return installed
+
+
+def read_data_version(conn: sqlite3.Connection) -> int:
+    """Current data version; 0 until a writer first bumps it"""
+    try:
+        row = conn.execute("SELECT version FROM data_version WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] if row else 0
+
+
+def database_file(conn: sqlite3.Connection) -> str:
+    return conn.execute("PRAGMA database_list").fetchone()[2]
+
+
+class ResponseCache:
+    """Size- and TTL-bounded LRU of (version, response) with single-flight computation"""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self._inflight: Dict[Tuple[Hashable, int], Future] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get_or_compute(self, key: Hashable, version: int, compute: Callable[[], Any],
+                       cacheable: Callable[[Any], bool] = lambda value: True) -> Any:
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == version and time.monotonic() < entry[2]:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            future = self._inflight.get((key, version))
+            leader = future is None
+            if leader:
+                future = self._inflight[(key, version)] = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            # Don't wait on a stuck leader for longer than an entry may live; compute it ourselves
+            try:
+                return future.result(timeout=self.ttl)
+            except FutureTimeout:
+                return compute()
+
+        try:
+            value = compute()
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[(key, version)]
+        if cacheable(value):
+            with self._lock:
+                current = self.entries.get(key)
+                # A slower computation for an older version must not replace a newer one
+                if current is None or current[0] <= version:
+                    self.entries[key] = (version, value, time.monotonic() + self.ttl)
+                    self.entries.move_to_end(key)
+                    while len(self.entries) > self.max_entries:
+                        self.entries.popitem(last=False)
+        future.set_result(value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+    def metrics(self) -> Dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+response_cache = ResponseCache()
+
+
+def _is_success(response: Any) -> bool:
+    # Endpoints report failures as {"error": ...}; don't pin those
+    return not (isinstance(response, dict) and "error" in response)
+
+
+def cached_response(func: Callable) -> Callable:
+    """
+    Serve a sync endpoint taking a `conn` dependency from response_cache.
+    The key is the endpoint, its other parameters and the connection's database file.
+    """
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        params = dict(bound.arguments)
+        conn = params.pop("conn")
+        key = (func.__name__, database_file(conn), tuple(sorted(params.items())))
+        return response_cache.get_or_compute(key, read_data_version(conn),
+                                             lambda: func(*args, **kwargs), _is_success)
+
+    return wrapper
@@ -4,7 +4,84 @@ Calculates intent scores from Behavioral, Visual, Voice, and Predictive AI
 """
 import sqlite3
 from datetime import datetime
-from typing import Dict, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from . import scoring_kernel as kernel
+from .response_cache import bump_data_version
+
+# Signal tables feeding the unified score, with their customer id column
+SIGNAL_TABLES = {
+    "intent_scores": "user_id",
+    "user_events": "user_id",
+    "visual_intelligence": "customer_id",
+    "voice_intelligence": "customer_id",
+}
+
+# Column order of the signal query in IntentScoringEngine.load_signals()
+SIGNAL_COLUMNS = (
+    "has_history",
+    "page_views", "cart_additions", "search_queries", "time_spent", "product_views",
+    "image_count", "high_conf_count", "brand_count", "basket_count",
+    "query_count", "high_intent_count", "lang_count",
+)
+
+BATCH_IDS_SQL = "SELECT pos, customer_id FROM temp.score_batch_ids"
+
+INSERT_UNIFIED_SCORE = """
+    INSERT OR REPLACE INTO unified_intent_scores VALUES (
+        ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?
+    )
+"""
+
+
+def score_records(customer_ids: List[str], scored: Dict[str, np.ndarray],
+                  last_updated: Optional[str] = None) -> List[Dict]:
+    """Turn scoring kernel output into unified score records"""
+    last_updated = last_updated or datetime.now().isoformat()
+    columns = {
+        "behavioral_score": np.round(scored["behavioral"], 2).tolist(),
+        "visual_score": np.round(scored["visual"], 2).tolist(),
+        "voice_score": np.round(scored["voice"], 2).tolist(),
+        "predictive_ai_score": np.round(scored["predictive"], 2).tolist(),
+        "behavioral_weighted": np.round(scored["behavioral_weighted"], 2).tolist(),
+        "visual_weighted": np.round(scored["visual_weighted"], 2).tolist(),
+        "voice_weighted": np.round(scored["voice_weighted"], 2).tolist(),
+        "predictive_weighted": np.round(scored["predictive_weighted"], 2).tolist(),
+        "final_intent_score": np.round(scored["final"], 2).tolist(),
+        "intent_level": kernel.INTENT_LEVELS[scored["level"]].tolist(),
+        "confidence_level": np.round(scored["completeness"], 2).tolist(),
+        "recommended_action": kernel.RECOMMENDED_ACTIONS[scored["level"]].tolist(),
+    }
+    return [
+        {"customer_id": customer_id, **{name: values[i] for name, values in columns.items()},
+         "last_updated": last_updated}
+        for i, customer_id in enumerate(customer_ids)
+    ]
+
+
+def score_row(score_data: Dict) -> Tuple:
+    """Column tuple for an unified_intent_scores row"""
+    return (
+        score_data['customer_id'],
+        score_data['behavioral_score'],
+        score_data['visual_score'],
+        score_data['voice_score'],
+        score_data['predictive_ai_score'],
+        score_data['behavioral_weighted'],
+        score_data['visual_weighted'],
+        score_data['voice_weighted'],
+        score_data['predictive_weighted'],
+        score_data['final_intent_score'],
+        score_data['intent_level'],
+        score_data['confidence_level'],
+        score_data['last_updated'],
+        score_data['confidence_level'],
+        score_data['recommended_action'],
+        None  # suggested_category
+    )
+
 
 class IntentScoringEngine:
     def __init__(self, db_path: str = "intent_intelligence.db"):
@@ -33,24 +110,16 @@ class IntentScoringEngine:
         
         page_views, cart_additions, search_queries, time_spent = result
         
-        # Calculate points
-        page_view_points = min(page_views * 2, 20)
-        cart_points = min(cart_additions * 10, 30)
-        search_points = min(search_queries * 3, 15)
-        time_points = min(time_spent / 100, 20)
-        
         # Product views from events
         cursor.execute("""
             SELECT COUNT(*) FROM user_events 
             WHERE user_id = ? AND event_type = 'product_view'
         """, (customer_id,))
         product_views = cursor.fetchone()[0]
-        product_points = min(product_views * 5, 15)
         
         conn.close()
         
-        total = page_view_points + cart_points + search_points + time_points + product_points
-        return min(total, 100.0)
+        return float(kernel.behavioral_scores(page_views, cart_additions, search_queries, time_spent, product_views))
     
     def calculate_visual_score(self, customer_id: str) -> float:
         """Calculate visual intelligence score (0-100)"""
@@ -95,14 +164,7 @@ class IntentScoringEngine:
         
         conn.close()
         
-        # Calculate points
-        image_points = min(image_count * 5, 25)
-        high_conf_points = min(high_conf_count * 15, 30)
-        brand_points = min(brand_count * 3, 25)
-        basket_points = 20 if basket_count > 0 else 0
-        
-        total = image_points + high_conf_points + brand_points + basket_points
-        return min(total, 100.0)
+        return float(kernel.visual_scores(image_count, high_conf_count, brand_count, basket_count))
     
     def calculate_voice_score(self, customer_id: str) -> float:
         """Calculate voice commerce score (0-100)"""
@@ -134,13 +196,7 @@ class IntentScoringEngine:
         
         conn.close()
         
-        # Calculate points
-        query_points = min(query_count * 8, 40)
-        intent_points = min(high_intent_count * 25, 50)
-        lang_points = 10 if lang_count > 1 else 0
-        
-        total = query_points + intent_points + lang_points
-        return min(total, 100.0)
+        return float(kernel.voice_scores(query_count, high_intent_count, lang_count))
     
     def calculate_predictive_score(self, customer_id: str) -> float:
         """Calculate predictive AI score (0-100) - placeholder for ML model"""
@@ -152,7 +208,10 @@ class IntentScoringEngine:
         
         # Check purchase history from intent_scores
         cursor.execute("""
-            SELECT cart_additions, search_queries, page_views
+            SELECT 
+                COALESCE(cart_additions, 0),
+                COALESCE(search_queries, 0),
+                COALESCE(page_views, 0)
             FROM intent_scores
             WHERE user_id = ?
         """, (customer_id,))
@@ -160,19 +219,13 @@ class IntentScoringEngine:
         result = cursor.fetchone()
         if not result:
             conn.close()
-            return 50.0  # Neutral score
+            return kernel.NEUTRAL_PREDICTIVE_SCORE
         
         cart_adds, searches, page_views = result
         
-        # Simple predictive heuristics
-        purchase_probability = min((cart_adds * 10) + (searches * 3), 40)
-        category_affinity = min(page_views * 0.5, 20)
-        engagement_score = 15 if (cart_adds > 2 or searches > 5) else 5
-        
         conn.close()
         
-        total = purchase_probability + category_affinity + engagement_score
-        return min(total, 100.0)
+        return float(kernel.predictive_scores(cart_adds, searches, page_views))
     
     def calculate_unified_score(self, customer_id: str) -> Dict:
         """Calculate final unified intent score"""
@@ -182,77 +235,213 @@ class IntentScoringEngine:
         voice = self.calculate_voice_score(customer_id)
         predictive = self.calculate_predictive_score(customer_id)
         
-        # Apply weights
-        behavioral_weighted = behavioral * 0.40
-        visual_weighted = visual * 0.30
-        voice_weighted = voice * 0.10
-        predictive_weighted = predictive * 0.20
-        
-        # Final score
-        final_score = behavioral_weighted + visual_weighted + voice_weighted + predictive_weighted
-        
-        # Determine intent level
-        if final_score >= 70:
-            intent_level = "High"
-            action = "Push targeted ads immediately"
-        elif final_score >= 50:
-            intent_level = "Medium"
-            action = "Nurture with product info"
-        else:
-            intent_level = "Low"
-            action = "Brand awareness campaigns"
-        
-        # Data completeness
-        signals_present = sum([behavioral > 0, visual > 0, voice > 0, predictive > 0])
-        completeness = (signals_present / 4.0) * 100
-        
-        return {
-            "customer_id": customer_id,
-            "behavioral_score": round(behavioral, 2),
-            "visual_score": round(visual, 2),
-            "voice_score": round(voice, 2),
-            "predictive_ai_score": round(predictive, 2),
-            "behavioral_weighted": round(behavioral_weighted, 2),
-            "visual_weighted": round(visual_weighted, 2),
-            "voice_weighted": round(voice_weighted, 2),
-            "predictive_weighted": round(predictive_weighted, 2),
-            "final_intent_score": round(final_score, 2),
-            "intent_level": intent_level,
-            "confidence_level": round(completeness, 2),
-            "recommended_action": action,
-            "last_updated": datetime.now().isoformat()
-        }
+        return score_records([customer_id], kernel.unified_scores([behavioral], [visual], [voice], [predictive]))[0]
     
     def save_score(self, score_data: Dict):
         """Save unified score to database"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
-        cursor.execute("""
-            INSERT OR REPLACE INTO unified_intent_scores VALUES (
-                ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?
-            )
-        """, (
-            score_data['customer_id'],
-            score_data['behavioral_score'],
-            score_data['visual_score'],
-            score_data['voice_score'],
-            score_data['predictive_ai_score'],
-            score_data['behavioral_weighted'],
-            score_data['visual_weighted'],
-            score_data['voice_weighted'],
-            score_data['predictive_weighted'],
-            score_data['final_intent_score'],
-            score_data['intent_level'],
-            score_data['confidence_level'],
-            score_data['last_updated'],
-            score_data['confidence_level'],
-            score_data['recommended_action'],
-            None  # suggested_category
-        ))
+        cursor.execute(INSERT_UNIFIED_SCORE, score_row(score_data))
+        bump_data_version(conn)
         
         conn.commit()
         conn.close()
+    
+    def save_scores(self, scores: List[Dict], conn: Optional[sqlite3.Connection] = None):
+        """Save many unified scores in a single transaction"""
+        own_conn = conn is None
+        if own_conn:
+            conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                conn.executemany(INSERT_UNIFIED_SCORE, (score_row(s) for s in scores))
+                if scores:
+                    bump_data_version(conn)
+        finally:
+            if own_conn:
+                conn.close()
+    
+    def score_batch(self, customer_ids: Iterable[str], save: bool = True) -> List[Dict]:
+        """Score a set of customers with one grouped signal query and the vectorized kernel.
+        
+        Produces the same scores as calculate_unified_score() for each
+        customer, using a single connection and (optionally) a single write.
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            scores = self._score_batch(conn, customer_ids)
+            if save:
+                self.save_scores(scores, conn)
+            return scores
+        finally:
+            conn.close()
+    
+    def score_all(self, save: bool = True) -> List[Dict]:
+        """Score every customer with a row in any signal table"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            self._reset_batch_ids(conn)
+            union = " UNION ".join(
+                f"SELECT {id_column} FROM {table} WHERE {id_column} IS NOT NULL"
+                for table, id_column in SIGNAL_TABLES.items()
+            )
+            conn.execute(f"INSERT INTO temp.score_batch_ids (customer_id) {union} ORDER BY 1")
+            
+            customer_ids, signals = self.load_signals(conn, BATCH_IDS_SQL)
+            scores = score_records(customer_ids, kernel.score_signals(signals))
+            if save:
+                self.save_scores(scores, conn)
+            return scores
+        finally:
+            conn.close()
+    
+    def score_customer(self, customer_id: str, conn: Optional[sqlite3.Connection] = None) -> Dict:
+        """Score one customer with a single query; works on read-only connections"""
+        own_conn = conn is None
+        if own_conn:
+            conn = sqlite3.connect(self.db_path)
+        try:
+            customer_ids, signals = self.load_signals(conn, "SELECT 0 AS pos, ? AS customer_id", (customer_id,))
+            return score_records(customer_ids, kernel.score_signals(signals))[0]
+        finally:
+            if own_conn:
+                conn.close()
+    
+    def rescore_changed(self, save: bool = True) -> List[Dict]:
+        """Rescore only customers with new signal rows since the last run.
+        
+        Each signal table has a rowid high-water mark in scoring_watermarks;
+        customers with rows above it are rescored and the marks advanced.
+        The first run has no marks, so it rescores everyone.
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS scoring_watermarks (
+                    table_name TEXT PRIMARY KEY,
+                    last_rowid INTEGER NOT NULL,
+                    updated_at TEXT
+                )
+            """)
+            marks = dict(conn.execute("SELECT table_name, last_rowid FROM scoring_watermarks").fetchall())
+            
+            changed = set()
+            new_marks = {}
+            for table, id_column in SIGNAL_TABLES.items():
+                last_rowid = marks.get(table, 0)
+                max_rowid = conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {table}").fetchone()[0]
+                if max_rowid <= last_rowid:
+                    continue
+                cursor = conn.execute(f"""
+                    SELECT DISTINCT {id_column} FROM {table}
+                    WHERE rowid > ? AND rowid <= ? AND {id_column} IS NOT NULL
+                """, (last_rowid, max_rowid))
+                changed.update(row[0] for row in cursor)
+                new_marks[table] = max_rowid
+            
+            scores = self._score_batch(conn, sorted(changed))
+            if save:
+                self.save_scores(scores, conn)
+                # Advance marks only once the scores are written
+                updated_at = datetime.now().isoformat()
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO scoring_watermarks VALUES (?, ?, ?)",
+                        ((table, rowid, updated_at) for table, rowid in new_marks.items())
+                    )
+            return scores
+        finally:
+            conn.close()
+    
+    def _score_batch(self, conn: sqlite3.Connection, customer_ids: Iterable[str]) -> List[Dict]:
+        customer_ids = list(dict.fromkeys(customer_ids))
+        if not customer_ids:
+            return []
+        self._reset_batch_ids(conn)
+        conn.executemany("INSERT INTO temp.score_batch_ids (customer_id) VALUES (?)", ((c,) for c in customer_ids))
+        
+        customer_ids, signals = self.load_signals(conn, BATCH_IDS_SQL)
+        return score_records(customer_ids, kernel.score_signals(signals))
+    
+    @staticmethod
+    def _reset_batch_ids(conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS score_batch_ids (
+                pos INTEGER PRIMARY KEY,
+                customer_id TEXT UNIQUE
+            )
+        """)
+        conn.execute("DELETE FROM temp.score_batch_ids")
+    
+    def load_signals(self, conn: sqlite3.Connection, ids_sql: str, params: Tuple = ()) -> Tuple[List[str], Dict[str, np.ndarray]]:
+        """Load per-customer signal columns for the scoring kernel.
+        
+        ids_sql selects (pos, customer_id) for the customers to load; the
+        result is ordered by pos and every signal table is aggregated with
+        one grouped subquery.
+        """
+        rows = conn.execute(f"""
+            WITH ids AS ({ids_sql})
+            SELECT 
+                ids.customer_id,
+                i.user_id IS NOT NULL,
+                COALESCE(i.page_views, 0),
+                COALESCE(i.cart_additions, 0),
+                COALESCE(i.search_queries, 0),
+                COALESCE(i.time_spent, 0),
+                COALESCE(pv.product_views, 0),
+                COALESCE(v.image_count, 0),
+                COALESCE(v.high_conf_count, 0),
+                COALESCE(v.brand_count, 0),
+                COALESCE(v.basket_count, 0),
+                COALESCE(vo.query_count, 0),
+                COALESCE(vo.high_intent_count, 0),
+                COALESCE(vo.lang_count, 0)
+            FROM ids
+            -- First intent_scores row per user, matching the per-customer fetchone()
+            LEFT JOIN (
+                SELECT user_id, MIN(rowid) AS first_rowid
+                FROM intent_scores
+                WHERE user_id IN (SELECT customer_id FROM ids)
+                GROUP BY user_id
+            ) f ON f.user_id = ids.customer_id
+            LEFT JOIN intent_scores i ON i.rowid = f.first_rowid
+            LEFT JOIN (
+                SELECT user_id, COUNT(*) AS product_views
+                FROM user_events
+                WHERE user_id IN (SELECT customer_id FROM ids) AND event_type = 'product_view'
+                GROUP BY user_id
+            ) pv ON pv.user_id = ids.customer_id
+            LEFT JOIN (
+                SELECT 
+                    customer_id,
+                    COUNT(*) AS image_count,
+                    SUM(CASE WHEN confidence_score > 0.8 THEN 1 ELSE 0 END) AS high_conf_count,
+                    COUNT(DISTINCT brand_detected) AS brand_count,
+                    SUM(CASE WHEN scene_type = 'Customer Basket' THEN 1 ELSE 0 END) AS basket_count
+                FROM visual_intelligence
+                WHERE customer_id IN (SELECT customer_id FROM ids)
+                GROUP BY customer_id
+            ) v ON v.customer_id = ids.customer_id
+            LEFT JOIN (
+                SELECT 
+                    customer_id,
+                    COUNT(*) AS query_count,
+                    SUM(CASE WHEN intent_label LIKE '%Order%' OR intent_label LIKE '%Buy%' THEN 1 ELSE 0 END) AS high_intent_count,
+                    COUNT(DISTINCT language_code) AS lang_count
+                FROM voice_intelligence
+                WHERE customer_id IN (SELECT customer_id FROM ids)
+                GROUP BY customer_id
+            ) vo ON vo.customer_id = ids.customer_id
+            ORDER BY ids.pos
+        """, params).fetchall()
+        
+        customer_ids = [row[0] for row in rows]
+        columns = np.array([row[1:] for row in rows], dtype=np.float64).reshape(len(rows), len(SIGNAL_COLUMNS))
+        signals = {name: columns[:, i] for i, name in enumerate(SIGNAL_COLUMNS)}
+        signals["has_history"] = signals["has_history"].astype(bool)
+        return customer_ids, signals
 
 # Create singleton instance
 scoring_engine = IntentScoringEngine()
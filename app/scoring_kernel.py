@@ -0,0 +1,130 @@
+"""
+PatternOS Intent Scoring Kernel
+Vectorized scoring formulas shared by the scoring API and IntentScoringEngine.
+
+Every function takes columnar signal arrays (one element per customer) and
+returns score arrays, so scoring one customer or a million is the same code.
+"""
+from typing import Dict
+
+import numpy as np
+
+# Component weights for the final score
+WEIGHTS = {
+    "behavioral": 0.40,
+    "visual": 0.30,
+    "voice": 0.10,
+    "predictive": 0.20,
+}
+
+# Indexed by the level code returned from unified_scores()
+INTENT_LEVELS = np.array(["Low", "Medium", "High"])
+RECOMMENDED_ACTIONS = np.array([
+    "Brand awareness campaigns",
+    "Nurture with product info",
+    "Push targeted ads immediately",
+])
+
+HIGH_INTENT_THRESHOLD = 70
+MEDIUM_INTENT_THRESHOLD = 50
+
+# Predictive score for customers with no behavioral history
+NEUTRAL_PREDICTIVE_SCORE = 50.0
+
+
+def _col(values) -> np.ndarray:
+    return np.asarray(values, dtype=np.float64)
+
+
+def behavioral_scores(page_views, cart_additions, search_queries, time_spent, product_views,
+                      has_history=True) -> np.ndarray:
+    """Behavioral score (0-100); 0 for customers without an intent_scores row"""
+    total = (
+        np.minimum(_col(page_views) * 2, 20)
+        + np.minimum(_col(cart_additions) * 10, 30)
+        + np.minimum(_col(search_queries) * 3, 15)
+        + np.minimum(_col(time_spent) / 100, 20)
+        + np.minimum(_col(product_views) * 5, 15)
+    )
+    return np.where(has_history, np.minimum(total, 100.0), 0.0)
+
+
+def visual_scores(image_count, high_conf_count, brand_count, basket_count) -> np.ndarray:
+    """Visual intelligence score (0-100)"""
+    total = (
+        np.minimum(_col(image_count) * 5, 25)
+        + np.minimum(_col(high_conf_count) * 15, 30)
+        + np.minimum(_col(brand_count) * 3, 25)
+        + np.where(_col(basket_count) > 0, 20.0, 0.0)
+    )
+    return np.minimum(total, 100.0)
+
+
+def voice_scores(query_count, high_intent_count, lang_count) -> np.ndarray:
+    """Voice commerce score (0-100)"""
+    total = (
+        np.minimum(_col(query_count) * 8, 40)
+        + np.minimum(_col(high_intent_count) * 25, 50)
+        + np.where(_col(lang_count) > 1, 10.0, 0.0)
+    )
+    return np.minimum(total, 100.0)
+
+
+def predictive_scores(cart_additions, search_queries, page_views, has_history=True) -> np.ndarray:
+    """Predictive AI heuristic score (0-100); neutral for customers without history"""
+    cart_additions = _col(cart_additions)
+    search_queries = _col(search_queries)
+    total = (
+        np.minimum(cart_additions * 10 + search_queries * 3, 40)
+        + np.minimum(_col(page_views) * 0.5, 20)
+        + np.where((cart_additions > 2) | (search_queries > 5), 15.0, 5.0)
+    )
+    return np.where(has_history, np.minimum(total, 100.0), NEUTRAL_PREDICTIVE_SCORE)
+
+
+def unified_scores(behavioral, visual, voice, predictive) -> Dict[str, np.ndarray]:
+    """Weight component scores into final scores, level codes and completeness"""
+    components = {
+        "behavioral": _col(behavioral),
+        "visual": _col(visual),
+        "voice": _col(voice),
+        "predictive": _col(predictive),
+    }
+    weighted = {name: values * WEIGHTS[name] for name, values in components.items()}
+    final = weighted["behavioral"] + weighted["visual"] + weighted["voice"] + weighted["predictive"]
+
+    level = np.select(
+        [final >= HIGH_INTENT_THRESHOLD, final >= MEDIUM_INTENT_THRESHOLD], [2, 1], default=0
+    )
+    signals_present = sum((values > 0).astype(np.int64) for values in components.values())
+
+    return {
+        **components,
+        **{f"{name}_weighted": values for name, values in weighted.items()},
+        "final": final,
+        "level": level,
+        "completeness": signals_present / 4.0 * 100,
+    }
+
+
+def score_signals(signals: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Run the full kernel over a dict of signal columns.
+
+    Expected keys: has_history, page_views, cart_additions, search_queries,
+    time_spent, product_views, image_count, high_conf_count, brand_count,
+    basket_count, query_count, high_intent_count, lang_count.
+    """
+    has_history = np.asarray(signals["has_history"], dtype=bool)
+    return unified_scores(
+        behavioral_scores(
+            signals["page_views"], signals["cart_additions"], signals["search_queries"],
+            signals["time_spent"], signals["product_views"], has_history,
+        ),
+        visual_scores(
+            signals["image_count"], signals["high_conf_count"], signals["brand_count"], signals["basket_count"],
+        ),
+        voice_scores(signals["query_count"], signals["high_intent_count"], signals["lang_count"]),
+        predictive_scores(
+            signals["cart_additions"], signals["search_queries"], signals["page_views"], has_history,
+        ),
+    )
@@ -0,0 +1,205 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import asynccontextmanager, contextmanager
+
+import anyio
+
+# Database paths (relative paths resolve against the working directory, as before)
+INTENT_DB_PATH = os.getenv("INTENT_DB_PATH", "intent_intelligence.db")
+CAMPAIGN_DB_PATH = os.getenv("CAMPAIGN_DB_PATH", "patternos_campaign_data.db")
+
+POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+CACHED_STATEMENTS = 256
+
+
+class SQLitePool:
+    """Long-lived SQLite connections for one database file.
+
+    Readers come from a bounded pool of WAL-mode, query-only connections;
+    all writes go through a single shared writer connection. Connections are
+    opened lazily and kept for the life of the process so sqlite3's
+    per-connection statement cache is reused across requests.
+
+    Request dependencies use async_reader()/async_writer(), which wait for a
+    slot on the event loop. A sync dependency would wait on one of the
+    AnyIO worker threads instead, and once every worker thread was waiting,
+    the slot holders could never get a thread to finish on. Everything that
+    can block in SQLite (opening a connection, commit with its WAL
+    checkpoint, rollback) still runs on a worker thread.
+    """
+
+    def __init__(self, path: str, size: int = POOL_SIZE, timeout: float = 10.0):
+        self.path = os.path.abspath(path)
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        # Async waiters queue here first, so at most `size` (or one writer) reach the thread locks
+        self._async_slots = anyio.Semaphore(size)
+        self._async_writer_lock = anyio.Lock()
+        self._lock = threading.Lock()
+        self._all = []
+
+    def _connect(self, readonly: bool) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=CACHED_STATEMENTS,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+        if readonly:
+            conn.execute("PRAGMA query_only=ON")
+        with self._lock:
+            self._all.append(conn)
+        return conn
+
+    @staticmethod
+    def _reset(conn: sqlite3.Connection):
+        # Handlers set row_factory per request; don't leak it to the next borrower
+        conn.row_factory = None
+        if conn.in_transaction:
+            conn.rollback()
+
+    def _checkout(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect(readonly=True)
+
+    def _checkin(self, conn: sqlite3.Connection):
+        self._reset(conn)
+        self._idle.put(conn)
+
+    def _writer_conn(self) -> sqlite3.Connection:
+        if self._writer is None:
+            self._writer = self._connect(readonly=False)
+        return self._writer
+
+    @staticmethod
+    def _finish_write(conn: sqlite3.Connection, ok: bool):
+        try:
+            if ok and conn.in_transaction:
+                conn.commit()
+        finally:
+            SQLitePool._reset(conn)
+
+    @staticmethod
+    async def _off_loop(func, *args):
+        """Run blocking SQLite work (connect, commit, rollback) on a worker thread, even when cancelled"""
+        with anyio.CancelScope(shield=True):
+            return await anyio.to_thread.run_sync(func, *args)
+
+    @staticmethod
+    async def _acquire(lock):
+        """Take a thread lock from the event loop; wait in a worker thread only if sync code holds it"""
+        if not lock.acquire(blocking=False):
+            await anyio.to_thread.run_sync(lock.acquire)
+
+    @contextmanager
+    def reader(self):
+        """Borrow a read-only connection, blocking while all are in use."""
+        with self._slots:
+            conn = self._checkout()
+            try:
+                yield conn
+            finally:
+                self._checkin(conn)
+
+    @contextmanager
+    def writer(self):
+        """Hold the single writer connection; commits on success, rolls back on error."""
+        with self._writer_lock:
+            conn = self._writer_conn()
+            ok = False
+            try:
+                yield conn
+                ok = True
+            finally:
+                self._finish_write(conn, ok)
+
+    @asynccontextmanager
+    async def async_reader(self):
+        """reader() for async code: waits for a free connection without blocking a thread."""
+        async with self._async_slots:
+            await self._acquire(self._slots)
+            try:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    conn = await self._off_loop(self._connect, True)
+                try:
+                    yield conn
+                finally:
+                    if conn.in_transaction:
+                        await self._off_loop(self._checkin, conn)
+                    else:
+                        self._checkin(conn)
+            finally:
+                self._slots.release()
+
+    @asynccontextmanager
+    async def async_writer(self):
+        """writer() for async code: waits for the writer without blocking a thread."""
+        async with self._async_writer_lock:
+            await self._acquire(self._writer_lock)
+            try:
+                conn = self._writer
+                if conn is None:
+                    conn = await self._off_loop(self._writer_conn)
+                ok = False
+                try:
+                    yield conn
+                    ok = True
+                finally:
+                    if conn.in_transaction:
+                        await self._off_loop(self._finish_write, conn, ok)
+                    else:
+                        self._reset(conn)
+            finally:
+                self._writer_lock.release()
+
+    def close(self):
+        with self._lock:
+            conns, self._all = self._all, []
+        for conn in conns:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._idle = queue.LifoQueue()
+        self._writer = None
+
+
+intent_db = SQLitePool(INTENT_DB_PATH)
+campaign_db = SQLitePool(CAMPAIGN_DB_PATH)
+
+
+# Dependencies: async so waiting for a connection never parks a threadpool
+# thread; the (sync) handlers still run on the threadpool with the connection
+async def get_intent_db():
+    async with intent_db.async_reader() as conn:
+        yield conn
+
+
+async def get_campaign_db():
+    async with campaign_db.async_reader() as conn:
+        yield conn
+
+
+async def get_campaign_writer():
+    async with campaign_db.async_writer() as conn:
+        yield conn
+
+
+def close_pools():
+    intent_db.close()
+    campaign_db.close()
@@ -3,18 +3,14 @@ from datetime import datetime, timedelta
 import json
 from typing import Optional
 
-router = APIRouter()
+import numpy as np
 
-def load_purchase_data():
-    """Load 100K purchase database"""
-    try:
-        with open('purchase_database_100k.json', 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return []
+from app.services.purchase_store import purchase_store
 
-def filter_by_date_range(purchases, date_range: str, start_date: Optional[str] = None, end_date: Optional[str] = None):
-    """Filter purchases by date range"""
+router = APIRouter()
+
+def date_bounds(date_range: str, start_date: Optional[str] = None, end_date: Optional[str] = None):
+    """Resolve a date_range (or custom start/end) to datetimes"""
     end = datetime.now()
     
     if date_range == 'custom' and start_date and end_date:
@@ -29,13 +25,32 @@ def filter_by_date_range(purchases, date_range: str, start_date: Optional[str] =
     else:
         start = end - timedelta(days=30)
     
-    filtered = []
-    for purchase in purchases:
-        purchase_date = datetime.fromisoformat(purchase['purchase_datetime'])
-        if start <= purchase_date <= end:
-            filtered.append(purchase)
+    return start, end
+
+def dimension_comparison(column: str):
+    """Spend, revenue and orders per value of a categorical column (all dates)"""
+    purchases = purchase_store.get()
+    ad = purchases.ad_mask()
+    totals = purchases.rollup(column)
+    ad_totals = purchases.rollup(column, mask=ad)
+    
+    result = []
+    for code, label in enumerate(purchases.labels[column]):
+        if not totals['count'][code]:
+            continue
+        spend = ad_totals['ad_spend'][code].item()
+        revenue = totals['price'][code].item()
+        result.append({
+            'dimension': label.capitalize(),
+            'spend': spend,
+            'revenue': revenue,
+            'roas': round(revenue / spend, 2) if spend > 0 else 0,
+            'conversions': int(totals['count'][code])
+        })
     
-    return filtered
+    # Sort by revenue
+    result.sort(key=lambda x: x['revenue'], reverse=True)
+    return result
 
 @router.get("/channel-performance")
 async def get_channel_performance(
@@ -45,34 +60,15 @@ async def get_channel_performance(
 ):
     """Get performance metrics by ad channel (Zepto, Facebook, Instagram, Google Display)"""
     
-    purchases = load_purchase_data()
-    filtered_purchases = filter_by_date_range(purchases, date_range, start_date, end_date)
+    purchases = purchase_store.get()
+    rows = purchases.date_slice(*date_bounds(date_range, start_date, end_date))
     
     # Filter only ad-based purchases
-    ad_purchases = [p for p in filtered_purchases if p['ad_channel'] != 'organic']
+    ad = purchases.ad_mask(rows)
     
-    # Aggregate by channel
-    channel_data = {}
-    
-    for purchase in ad_purchases:
-        channel = purchase['ad_channel']
-        
-        if channel not in channel_data:
-            channel_data[channel] = {
-                'channel': channel,
-                'impressions': 0,
-                'clicks': 0,
-                'spend': 0,
-                'revenue': 0,
-                'purchases': 0
-            }
-        
-        # Estimate impressions and clicks
-        channel_data[channel]['impressions'] += random.randint(1, 3)
-        channel_data[channel]['clicks'] += 1  # Each purchase = 1 click
-        channel_data[channel]['spend'] += purchase['ad_spend']
-        channel_data[channel]['revenue'] += purchase['price']
-        channel_data[channel]['purchases'] += 1
+    # Estimate impressions (1-3 per purchase); each purchase = 1 click
+    impressions = np.random.randint(1, 4, size=rows.stop - rows.start)
+    totals = purchases.rollup('ad_channel', rows, mask=ad, values={'impressions': impressions})
     
     # Format results with proper channel names
     channel_names = {
@@ -83,22 +79,26 @@ async def get_channel_performance(
     }
     
     result = []
-    for channel, data in channel_data.items():
-        roas = data['revenue'] / data['spend'] if data['spend'] > 0 else 0
+    for code, channel in enumerate(purchases.labels['ad_channel']):
+        if not totals['count'][code]:
+            continue
+        spend = totals['ad_spend'][code].item()
+        revenue = totals['price'][code].item()
+        roas = revenue / spend if spend > 0 else 0
         result.append({
             'channel': channel_names.get(channel, channel),
-            'impressions': data['impressions'],
-            'clicks': data['clicks'],
-            'spend': data['spend'],
-            'revenue': data['revenue'],
-            'purchases': data['purchases'],
+            'impressions': int(totals['impressions'][code]),
+            'clicks': int(totals['count'][code]),
+            'spend': spend,
+            'revenue': revenue,
+            'purchases': int(totals['count'][code]),
             'roas': round(roas, 2)
         })
     
     return {
         'channels': result,
         'date_range': date_range,
-        'total_purchases': len(ad_purchases)
+        'total_purchases': int(ad.sum())
     }
 
 @router.get("/platform-summary")
@@ -109,21 +109,22 @@ async def get_platform_summary(
 ):
     """Get overall platform summary from 100K purchase database"""
     
-    purchases = load_purchase_data()
-    filtered_purchases = filter_by_date_range(purchases, date_range, start_date, end_date)
+    purchases = purchase_store.get()
+    rows = purchases.date_slice(*date_bounds(date_range, start_date, end_date))
+    price = purchases.numeric['price'][rows]
     
     # Ad-based purchases only
-    ad_purchases = [p for p in filtered_purchases if p['ad_channel'] != 'organic']
+    ad = purchases.ad_mask(rows)
     
-    total_spend = sum(p['ad_spend'] for p in ad_purchases)
-    total_revenue = sum(p['price'] for p in ad_purchases)
-    total_clicks = len(ad_purchases)  # Each purchase = 1 click
+    total_spend = purchases.numeric['ad_spend'][rows][ad].sum().item()
+    total_revenue = price[ad].sum().item()
+    total_clicks = int(ad.sum())  # Each purchase = 1 click
     total_impressions = total_clicks * 2  # Rough estimate
     
     avg_roas = total_revenue / total_spend if total_spend > 0 else 0
     
     # Total GMV (all purchases including organic)
-    total_gmv = sum(p['price'] for p in filtered_purchases)
+    total_gmv = price.sum().item()
     
     return {
         'total_spend': total_spend,
@@ -132,59 +133,46 @@ async def get_platform_summary(
         'total_clicks': total_clicks,
         'total_impressions': total_impressions,
         'avg_roas': round(avg_roas, 2),
-        'total_purchases': len(filtered_purchases),
-        'ad_purchases': len(ad_purchases)
+        'total_purchases': len(price),
+        'ad_purchases': total_clicks
     }
 
-import random
-
 @router.get("/brand-comparison")
 async def get_brand_comparison(date_range: str = Query('last_30_days')):
     """Get performance comparison across all brands"""
     
-    purchases = load_purchase_data()
+    purchases = purchase_store.get()
+    ad = purchases.ad_mask()
+    ad_spend = purchases.numeric['ad_spend']
     
-    # Group by brand
-    brands = {}
-    for p in purchases:
-        brand = p['brand']
-        if brand not in brands:
-            brands[brand] = {
-                'brand': brand,
-                'orders': 0,
-                'revenue': 0,
-                'spend': 0,
-                'impressions': 0,
-                'clicks': 0
-            }
-        
-        brands[brand]['orders'] += 1
-        brands[brand]['revenue'] += p['price']
-        
-        if p['ad_channel'] != 'organic':
-            brands[brand]['spend'] += p['ad_spend']
-            # Estimate impressions and clicks
-            brands[brand]['impressions'] += int(p['ad_spend'] * 50)  # Rough CPM
-            brands[brand]['clicks'] += int(p['ad_spend'] * 1.5)  # Rough CPC
+    # Estimate impressions and clicks from ad spend (rough CPM / CPC), ad purchases only
+    totals = purchases.rollup('brand', values={
+        'impressions': np.where(ad, np.trunc(ad_spend * 50), 0).astype(np.int64),
+        'clicks': np.where(ad, np.trunc(ad_spend * 1.5), 0).astype(np.int64),
+        'spend': np.where(ad, ad_spend, 0)
+    })
     
     # Calculate metrics for each brand
     brand_list = []
-    for brand_data in brands.values():
-        spend = brand_data['spend']
-        revenue = brand_data['revenue']
-        impressions = brand_data['impressions']
-        clicks = brand_data['clicks']
+    for code, brand in enumerate(purchases.labels['brand']):
+        orders = int(totals['count'][code])
+        if not orders:
+            continue
+        spend = totals['spend'][code].item()
+        revenue = totals['price'][code].item()
+        impressions = int(totals['impressions'][code])
+        clicks = int(totals['clicks'][code])
         
         roas = round(revenue / spend, 2) if spend > 0 else 0
         ctr = round((clicks / impressions * 100), 2) if impressions > 0 else 0
-        conv_rate = round((brand_data['orders'] / clicks * 100), 2) if clicks > 0 else 0
+        conv_rate = round((orders / clicks * 100), 2) if clicks > 0 else 0
         
         brand_list.append({
-            'brand': brand_data['brand'],
+            'brand': brand,
             'spend': spend,
             'revenue': revenue,
             'roas': roas,
-            'purchases': brand_data['orders'],
+            'purchases': orders,
             'impressions': impressions,
             'ctr': ctr,
             'conversion_rate': conv_rate
@@ -202,45 +190,7 @@ async def get_brand_comparison(date_range: str = Query('last_30_days')):
 async def get_location_comparison(date_range: str = Query('last_30_days')):
     """Get performance comparison by location"""
     
-    purchases = load_purchase_data()
-    
-    # Group by location
-    locations = {}
-    for p in purchases:
-        loc = p['location']
-        if loc not in locations:
-            locations[loc] = {
-                'location': loc.capitalize(),
-                'spend': 0,
-                'revenue': 0,
-                'orders': 0
-            }
-        
-        if p['ad_channel'] != 'organic':
-            locations[loc]['spend'] += p['ad_spend']
-        
-        locations[loc]['revenue'] += p['price']
-        locations[loc]['orders'] += 1
-    
-    # Calculate metrics
-    result = []
-    for loc_data in locations.values():
-        spend = loc_data['spend']
-        revenue = loc_data['revenue']
-        orders = loc_data['orders']
-        
-        roas = round(revenue / spend, 2) if spend > 0 else 0
-        
-        result.append({
-            'dimension': loc_data['location'],
-            'spend': spend,
-            'revenue': revenue,
-            'roas': roas,
-            'conversions': orders
-        })
-    
-    # Sort by revenue
-    result.sort(key=lambda x: x['revenue'], reverse=True)
+    result = dimension_comparison('location')
     
     return {
         'data': result,
@@ -251,45 +201,7 @@ async def get_location_comparison(date_range: str = Query('last_30_days')):
 async def get_category_comparison(date_range: str = Query('last_30_days')):
     """Get performance comparison by category"""
     
-    purchases = load_purchase_data()
-    
-    # Group by category
-    categories = {}
-    for p in purchases:
-        cat = p['category']
-        if cat not in categories:
-            categories[cat] = {
-                'category': cat.capitalize(),
-                'spend': 0,
-                'revenue': 0,
-                'orders': 0
-            }
-        
-        if p['ad_channel'] != 'organic':
-            categories[cat]['spend'] += p['ad_spend']
-        
-        categories[cat]['revenue'] += p['price']
-        categories[cat]['orders'] += 1
-    
-    # Calculate metrics
-    result = []
-    for cat_data in categories.values():
-        spend = cat_data['spend']
-        revenue = cat_data['revenue']
-        orders = cat_data['orders']
-        
-        roas = round(revenue / spend, 2) if spend > 0 else 0
-        
-        result.append({
-            'dimension': cat_data['category'],
-            'spend': spend,
-            'revenue': revenue,
-            'roas': roas,
-            'conversions': orders
-        })
-    
-    # Sort by revenue
-    result.sort(key=lambda x: x['revenue'], reverse=True)
+    result = dimension_comparison('category')
     
     return {
         'data': result,
@@ -0,0 +1,192 @@
+"""
+Columnar purchase store for the analytics endpoints.
+
+purchase_database_100k.json is parsed once into NumPy columns sorted by
+purchase time and cached next to it as .npy files, which later processes
+memory-map instead of re-parsing the JSON. Categorical fields are stored
+as integer codes so rollups are a single bincount, and date ranges are a
+binary search over the sorted time column. The store reloads itself when
+the JSON file changes.
+
+Each cache build goes in its own directory, named after the source file's
+signature, and is never written to again: a rebuild cannot truncate .npy
+files that an older snapshot (in this or another process) still maps.
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+PURCHASE_DB_PATH = os.getenv('PURCHASE_DB_PATH', 'purchase_database_100k.json')
+
+CATEGORICAL_COLUMNS = ('ad_channel', 'brand', 'category', 'location')
+NUMERIC_COLUMNS = ('price', 'ad_spend')
+ORGANIC = 'organic'
+
+
+def _source_signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class PurchaseColumns:
+    """One immutable snapshot of the purchase file as columns"""
+
+    def __init__(self, times: np.ndarray, numeric: Dict[str, np.ndarray],
+                 codes: Dict[str, np.ndarray], labels: Dict[str, list]):
+        self.times = times          # datetime64[us], ascending
+        self.numeric = numeric
+        self.codes = codes
+        self.labels = labels
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    @classmethod
+    def empty(cls) -> 'PurchaseColumns':
+        return cls(np.empty(0, dtype='datetime64[us]'),
+                   {col: np.empty(0, dtype=np.int64) for col in NUMERIC_COLUMNS},
+                   {col: np.empty(0, dtype=np.int32) for col in CATEGORICAL_COLUMNS},
+                   {col: [] for col in CATEGORICAL_COLUMNS})
+
+    @classmethod
+    def from_records(cls, purchases: list) -> 'PurchaseColumns':
+        if not purchases:
+            return cls.empty()
+        times = np.array([p['purchase_datetime'] for p in purchases], dtype='datetime64[us]')
+        order = np.argsort(times, kind='stable')
+        numeric = {col: np.array([p[col] for p in purchases])[order] for col in NUMERIC_COLUMNS}
+        codes, labels = {}, {}
+        for col in CATEGORICAL_COLUMNS:
+            values, inverse = np.unique(np.array([p[col] for p in purchases], dtype=object), return_inverse=True)
+            codes[col] = inverse.astype(np.int32)[order]
+            labels[col] = values.tolist()
+        return cls(times[order], numeric, codes, labels)
+
+    @staticmethod
+    def version_dir(cache_dir: str, signature: Tuple[int, int]) -> str:
+        return os.path.join(cache_dir, 'v%d-%d' % tuple(signature))
+
+    def save(self, cache_dir: str, signature: Tuple[int, int]):
+        """Write a new cache version: built in a temp dir, then renamed into place"""
+        os.makedirs(cache_dir, exist_ok=True)
+        target = self.version_dir(cache_dir, signature)
+        staging = tempfile.mkdtemp(prefix='.build-', dir=cache_dir)
+        try:
+            np.save(os.path.join(staging, 'times.npy'), self.times.view(np.int64))
+            for col, values in {**self.numeric, **self.codes}.items():
+                np.save(os.path.join(staging, f'{col}.npy'), values)
+            with open(os.path.join(staging, 'meta.json'), 'w') as f:
+                json.dump({'signature': list(signature), 'labels': self.labels}, f)
+            os.rename(staging, target)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            if not os.path.isdir(target):
+                raise
+            # Another process published this version first; theirs is identical
+        # Older versions may still be mapped: unlinking leaves their pages readable
+        for name in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, name)
+            if name.startswith('v') and path != target:
+                shutil.rmtree(path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, cache_dir: str, signature: Tuple[int, int]) -> Optional['PurchaseColumns']:
+        """Memory-map a cache built from the same source file, if there is one"""
+        version = cls.version_dir(cache_dir, signature)
+        try:
+            with open(os.path.join(version, 'meta.json')) as f:
+                meta = json.load(f)
+            if tuple(meta['signature']) != tuple(signature):
+                return None
+
+            def column(name):
+                return np.load(os.path.join(version, f'{name}.npy'), mmap_mode='r')
+
+            return cls(column('times').view('datetime64[us]'),
+                       {col: column(col) for col in NUMERIC_COLUMNS},
+                       {col: column(col) for col in CATEGORICAL_COLUMNS},
+                       meta['labels'])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def date_slice(self, start: datetime, end: datetime) -> slice:
+        """Rows with start <= purchase_datetime <= end"""
+        lo = np.searchsorted(self.times, np.datetime64(start, 'us'), side='left')
+        hi = np.searchsorted(self.times, np.datetime64(end, 'us'), side='right')
+        return slice(int(lo), int(hi))
+
+    def ad_mask(self, rows: slice = slice(None)) -> np.ndarray:
+        """Ad-attributed (non-organic) purchases among rows"""
+        channels = self.codes['ad_channel'][rows]
+        if ORGANIC not in self.labels['ad_channel']:
+            return np.ones(len(channels), dtype=bool)
+        return channels != self.labels['ad_channel'].index(ORGANIC)
+
+    def rollup(self, column: str, rows: slice = slice(None), mask: Optional[np.ndarray] = None,
+               values: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, np.ndarray]:
+        """
+        Per-label totals of `column` over rows (optionally masked): 'count' plus
+        the sum of each numeric column (and any extra per-row `values`).
+        """
+        codes = self.codes[column][rows]
+        columns = {col: self.numeric[col][rows] for col in NUMERIC_COLUMNS}
+        columns.update(values or {})
+        if mask is not None:
+            codes = codes[mask]
+            columns = {col: data[mask] for col, data in columns.items()}
+
+        n_labels = len(self.labels[column])
+        totals = {'count': np.bincount(codes, minlength=n_labels)}
+        for col, data in columns.items():
+            sums = np.bincount(codes, weights=data, minlength=n_labels)
+            totals[col] = np.rint(sums).astype(np.int64) if data.dtype.kind in 'iub' else sums
+        return totals
+
+
+class PurchaseStore:
+    """Process-wide handle on the current PurchaseColumns snapshot"""
+
+    def __init__(self, path: str = PURCHASE_DB_PATH, cache_dir: Optional[str] = None):
+        self.path = path
+        self.cache_dir = cache_dir or path + '.columns'
+        self.signature = None
+        self.columns = PurchaseColumns.empty()
+        self.loads = 0
+        self._lock = threading.Lock()
+
+    def get(self) -> PurchaseColumns:
+        """Current snapshot, reloaded if the source file changed"""
+        signature = _source_signature(self.path)
+        if signature != self.signature:
+            with self._lock:
+                if signature != self.signature:
+                    self.columns = self._load(signature)
+                    self.signature = signature
+                    self.loads += 1
+        return self.columns
+
+    def _load(self, signature: Optional[Tuple[int, int]]) -> PurchaseColumns:
+        if signature is None:
+            return PurchaseColumns.empty()
+        columns = PurchaseColumns.load(self.cache_dir, signature)
+        if columns is not None:
+            return columns
+        with open(self.path) as f:
+            columns = PurchaseColumns.from_records(json.load(f))
+        try:
+            columns.save(self.cache_dir, signature)
+        except OSError:
+            pass  # read-only deployment: keep the in-memory columns
+        return columns
+
+
+purchase_store = PurchaseStore()
@@ -3,18 +3,78 @@ PatternOS Attribution Engine
 Track conversions and calculate ROAS across all touchpoints
 """
 
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional
-from collections import defaultdict
-import hashlib
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple
+from collections import defaultdict, OrderedDict
+from bisect import bisect_left, bisect_right
+import time
 
-class AttributionEngine:
+from id_generator import current_trace_id, new_id
+
+DAY_SECONDS = 86400
+
+# Longest lookback any model may ask for; older touchpoints are evicted
+MAX_LOOKBACK_DAYS = 30
+DEFAULT_LOOKBACK_DAYS = 30
+
+# Conversions (and their captured journeys) kept in memory; older ones are
+# folded into the ROAS accumulators and dropped
+MAX_CONVERSIONS = 100000
+
+class Journey:
+    """One user's touchpoints, kept sorted by epoch time"""
+    __slots__ = ('times', 'touchpoints')
+    
     def __init__(self):
-        # Store all touchpoints (ad impressions, clicks)
-        self.touchpoints = defaultdict(list)
+        self.times = []
+        self.touchpoints = []
+    
+    def add(self, ts: float, touchpoint: Dict):
+        if not self.times or ts >= self.times[-1]:
+            self.times.append(ts)
+            self.touchpoints.append(touchpoint)
+        else:
+            i = bisect_right(self.times, ts)
+            self.times.insert(i, ts)
+            self.touchpoints.insert(i, touchpoint)
+    
+    def window(self, start: float, end: float) -> Tuple[List[float], List[Dict]]:
+        lo = bisect_left(self.times, start)
+        hi = bisect_right(self.times, end)
+        return self.times[lo:hi], self.touchpoints[lo:hi]
+    
+    def evict_before(self, cutoff: float):
+        i = bisect_left(self.times, cutoff)
+        if i:
+            del self.times[:i]
+            del self.touchpoints[:i]
+
+def event_time(data: Dict) -> Tuple[float, str]:
+    """(epoch seconds, ISO string) of an event; now unless 'timestamp' is given"""
+    value = data.get('timestamp')
+    if value is None:
+        ts = time.time()
+        return ts, datetime.fromtimestamp(ts).isoformat()
+    if isinstance(value, (int, float)):
+        return float(value), datetime.fromtimestamp(value).isoformat()
+    return datetime.fromisoformat(value).timestamp(), value
+
+class AttributionEngine:
+    def __init__(self, max_lookback_days: int = MAX_LOOKBACK_DAYS, max_conversions: int = MAX_CONVERSIONS):
+        # Touchpoints (ad impressions, clicks) per user, least recently touched first
+        self.journeys = OrderedDict()
+        self.max_lookback = max_lookback_days * DAY_SECONDS
+        
+        # Latest event time seen; drives eviction so backfills aren't dropped
+        self.clock = 0.0
         
-        # Store conversions (purchases)
+        # Store conversions (purchases), oldest first, at most max_conversions
         self.conversions = []
+        self.max_conversions = max_conversions
+        
+        # conversion_id -> (epoch, times, touchpoints) in the max lookback window,
+        # captured at tracking time so later eviction doesn't change attribution
+        self.conversion_journeys = {}
         
         # Attribution models
         self.models = {
@@ -25,80 +85,168 @@ class AttributionEngine:
             'position_based': self.position_based_attribution
         }
         
-        # Campaign performance cache
-        self.campaign_performance = {}
+        # Campaign performance cache: model -> campaign_id -> [revenue, conversions],
+        # covering self.conversions[:attributed_conversions]
+        self.campaign_performance = {model: defaultdict(lambda: [0, 0]) for model in self.models}
+        self.attributed_conversions = 0
     
     def track_touchpoint(self, data: Dict) -> Dict:
         """
         Track ad touchpoint (impression or click)
         """
-        touchpoint = {
-            'touchpoint_id': self.generate_id(),
-            'user_id': data['user_id'],
-            'campaign_id': data.get('campaign_id'),
-            'ad_id': data.get('ad_id'),
-            'type': data.get('type', 'impression'),  # impression, click, view
-            'timestamp': datetime.now().isoformat(),
-            'page_type': data.get('page_type'),
-            'device': data.get('device', 'mobile'),
-            'platform': data.get('platform', 'web'),
-        }
-        
-        # Add to user's journey
-        self.touchpoints[data['user_id']].append(touchpoint)
+        return self.track_touchpoints([data])[0]
+    
+    def track_touchpoints(self, events: List[Dict]) -> List[Dict]:
+        """
+        Track a batch of touchpoints; events may carry their own 'timestamp'
+        (ISO string or epoch seconds) for backfills
+        """
+        results = []
+        for data in events:
+            ts, iso = event_time(data)
+            touchpoint = {
+                'touchpoint_id': self.generate_id(),
+                'user_id': data['user_id'],
+                'campaign_id': data.get('campaign_id'),
+                'ad_id': data.get('ad_id'),
+                'type': data.get('type', 'impression'),  # impression, click, view
+                'timestamp': iso,
+                'page_type': data.get('page_type'),
+                'device': data.get('device', 'mobile'),
+                'platform': data.get('platform', 'web'),
+                'auction_id': data.get('auction_id') or current_trace_id(),
+            }
+            
+            # Add to user's journey
+            journey = self.journeys.get(data['user_id'])
+            if journey is None:
+                journey = self.journeys[data['user_id']] = Journey()
+            else:
+                self.journeys.move_to_end(data['user_id'])
+            journey.add(ts, touchpoint)
+            self.clock = max(self.clock, ts)
+            journey.evict_before(self.clock - self.max_lookback)
+            
+            results.append({
+                'status': 'tracked',
+                'touchpoint_id': touchpoint['touchpoint_id']
+            })
         
-        return {
-            'status': 'tracked',
-            'touchpoint_id': touchpoint['touchpoint_id']
-        }
+        self.evict_expired()
+        return results
+    
+    def evict_expired(self) -> int:
+        """
+        Drop journeys whose newest touchpoint is past the longest lookback.
+        Journeys are ordered by last touch, so this stops at the first live one.
+        """
+        cutoff = self.clock - self.max_lookback
+        evicted = 0
+        while self.journeys:
+            user_id, journey = next(iter(self.journeys.items()))
+            if journey.times and journey.times[-1] >= cutoff:
+                break
+            del self.journeys[user_id]
+            evicted += 1
+        return evicted
     
     def track_conversion(self, data: Dict) -> Dict:
         """
         Track conversion (purchase, signup, etc.)
         """
-        conversion = {
-            'conversion_id': self.generate_id(),
-            'user_id': data['user_id'],
-            'order_id': data.get('order_id'),
-            'revenue': data.get('revenue', 0),
-            'products': data.get('products', []),
-            'timestamp': datetime.now().isoformat(),
-            'conversion_type': data.get('conversion_type', 'purchase'),
-        }
-        
-        self.conversions.append(conversion)
-        
-        # Attribute this conversion to campaigns
-        attribution = self.attribute_conversion(
-            user_id=data['user_id'],
-            conversion=conversion,
-            model=data.get('attribution_model', 'last_click')
-        )
-        
-        return {
-            'status': 'tracked',
-            'conversion_id': conversion['conversion_id'],
-            'attribution': attribution
-        }
+        return self.track_conversions([data])[0]
+    
+    def track_conversions(self, events: List[Dict]) -> List[Dict]:
+        """
+        Track a batch of conversions, attributing each with its own
+        'attribution_model' (last_click by default)
+        """
+        results = []
+        for data in events:
+            ts, iso = event_time(data)
+            conversion = {
+                'conversion_id': self.generate_id(),
+                'user_id': data['user_id'],
+                'order_id': data.get('order_id'),
+                'revenue': data.get('revenue', 0),
+                'products': data.get('products', []),
+                'timestamp': iso,
+                'conversion_type': data.get('conversion_type', 'purchase'),
+            }
+            
+            self.conversions.append(conversion)
+            self.clock = max(self.clock, ts)
+            
+            journey = self.journeys.get(data['user_id'])
+            if journey is not None:
+                times, touchpoints = journey.window(ts - self.max_lookback, ts)
+                self.conversion_journeys[conversion['conversion_id']] = (ts, times, touchpoints)
+            
+            # Attribute this conversion to campaigns
+            attribution = self.attribute_conversion(
+                user_id=data['user_id'],
+                conversion=conversion,
+                model=data.get('attribution_model', 'last_click')
+            )
+            
+            results.append({
+                'status': 'tracked',
+                'conversion_id': conversion['conversion_id'],
+                'attribution': attribution
+            })
+        
+        self.evict_conversions()
+        return results
+    
+    def evict_conversions(self) -> int:
+        """
+        Drop the oldest conversions and their captured journeys once there are
+        more than max_conversions. They are attributed first, so ROAS totals
+        still include them. Trims to 3/4 of the cap so eviction is amortized.
+        """
+        if len(self.conversions) <= self.max_conversions:
+            return 0
+        self.refresh_attribution()
+        excess = len(self.conversions) - self.max_conversions * 3 // 4
+        for conversion in self.conversions[:excess]:
+            self.conversion_journeys.pop(conversion['conversion_id'], None)
+        del self.conversions[:excess]
+        self.attributed_conversions -= excess
+        return excess
+    
+    def lookback_touchpoints(self, user_id: str, conversion: Dict, lookback_days: int) -> List[Dict]:
+        """User's touchpoints in [conversion - lookback, conversion]"""
+        return self._lookback(user_id, conversion, lookback_days)[2]
+    
+    def _lookback(self, user_id: str, conversion: Dict,
+                  lookback_days: int) -> Tuple[datetime, List[float], List[Dict]]:
+        """Conversion time and the epoch times and touchpoints in its lookback window"""
+        captured = self.conversion_journeys.get(conversion.get('conversion_id'))
+        if captured is not None:
+            ts, times, touchpoints = captured
+        else:
+            ts = datetime.fromisoformat(conversion['timestamp']).timestamp()
+            journey = self.journeys.get(user_id)
+            if journey is None:
+                return datetime.fromtimestamp(ts), [], []
+            times, touchpoints = journey.times, journey.touchpoints
+        
+        lo = bisect_left(times, ts - lookback_days * DAY_SECONDS)
+        hi = bisect_right(times, ts)
+        return datetime.fromtimestamp(ts), times[lo:hi], touchpoints[lo:hi]
     
     def attribute_conversion(
         self, 
         user_id: str, 
         conversion: Dict,
         model: str = 'last_click',
-        lookback_days: int = 30
+        lookback_days: int = DEFAULT_LOOKBACK_DAYS
     ) -> Dict:
         """
         Attribute a conversion to campaigns using specified model
         """
         # Get user's touchpoints within lookback window
-        conversion_time = datetime.fromisoformat(conversion['timestamp'])
-        lookback_start = conversion_time - timedelta(days=lookback_days)
-        
-        user_touchpoints = [
-            tp for tp in self.touchpoints.get(user_id, [])
-            if lookback_start <= datetime.fromisoformat(tp['timestamp']) <= conversion_time
-        ]
+        conversion_time, times, user_touchpoints = self._lookback(user_id, conversion, lookback_days)
         
         if not user_touchpoints:
             return {
@@ -109,7 +257,7 @@ class AttributionEngine:
         
         # Apply attribution model
         attribution_func = self.models.get(model, self.last_click_attribution)
-        attributed_revenue = attribution_func(user_touchpoints, conversion['revenue'])
+        attributed_revenue = attribution_func(user_touchpoints, conversion['revenue'], conversion_time, times)
         
         return {
             'model': model,
@@ -118,7 +266,13 @@ class AttributionEngine:
             'revenue': conversion['revenue']
         }
     
-    def last_click_attribution(self, touchpoints: List[Dict], revenue: float) -> List[Dict]:
+    def last_click_attribution(
+        self,
+        touchpoints: List[Dict],
+        revenue: float,
+        conversion_time: Optional[datetime] = None,
+        times: Optional[List[float]] = None
+    ) -> List[Dict]:
         """
         Last Click: 100% credit to last touchpoint before conversion
         """
@@ -133,7 +287,13 @@ class AttributionEngine:
             'revenue': revenue
         }]
     
-    def first_click_attribution(self, touchpoints: List[Dict], revenue: float) -> List[Dict]:
+    def first_click_attribution(
+        self,
+        touchpoints: List[Dict],
+        revenue: float,
+        conversion_time: Optional[datetime] = None,
+        times: Optional[List[float]] = None
+    ) -> List[Dict]:
         """
         First Click: 100% credit to first touchpoint
         """
@@ -148,7 +308,13 @@ class AttributionEngine:
             'revenue': revenue
         }]
     
-    def linear_attribution(self, touchpoints: List[Dict], revenue: float) -> List[Dict]:
+    def linear_attribution(
+        self,
+        touchpoints: List[Dict],
+        revenue: float,
+        conversion_time: Optional[datetime] = None,
+        times: Optional[List[float]] = None
+    ) -> List[Dict]:
         """
         Linear: Equal credit to all touchpoints
         """
@@ -174,21 +340,30 @@ class AttributionEngine:
             for cid, data in campaign_credits.items()
         ]
     
-    def time_decay_attribution(self, touchpoints: List[Dict], revenue: float) -> List[Dict]:
+    def time_decay_attribution(
+        self,
+        touchpoints: List[Dict],
+        revenue: float,
+        conversion_time: Optional[datetime] = None,
+        times: Optional[List[float]] = None
+    ) -> List[Dict]:
         """
         Time Decay: More credit to recent touchpoints
-        Decay factor: 2^(-days_ago/7)
+        Decay factor: 2^(-days_ago/7), days counted back from the conversion.
+        `times` are the touchpoints' epoch seconds as stored in the journey;
+        timestamps are only parsed when they aren't given.
         """
         if not touchpoints:
             return []
         
-        conversion_time = datetime.now()
+        conversion_ts = (conversion_time or datetime.now()).timestamp()
+        if times is None:
+            times = [datetime.fromisoformat(tp['timestamp']).timestamp() for tp in touchpoints]
         
         # Calculate weights
         weights = []
-        for tp in touchpoints:
-            tp_time = datetime.fromisoformat(tp['timestamp'])
-            days_ago = (conversion_time - tp_time).days
+        for tp_time in times:
+            days_ago = (conversion_ts - tp_time) // DAY_SECONDS
             weight = 2 ** (-days_ago / 7)  # Half-life of 7 days
             weights.append(weight)
         
@@ -211,7 +386,13 @@ class AttributionEngine:
             for cid, data in campaign_credits.items()
         ]
     
-    def position_based_attribution(self, touchpoints: List[Dict], revenue: float) -> List[Dict]:
+    def position_based_attribution(
+        self,
+        touchpoints: List[Dict],
+        revenue: float,
+        conversion_time: Optional[datetime] = None,
+        times: Optional[List[float]] = None
+    ) -> List[Dict]:
         """
         Position-Based (U-shaped): 40% first, 40% last, 20% middle
         """
@@ -219,7 +400,7 @@ class AttributionEngine:
             return []
         
         if len(touchpoints) == 1:
-            return self.first_click_attribution(touchpoints, revenue)
+            return self.first_click_attribution(touchpoints, revenue, conversion_time, times)
         
         campaign_credits = defaultdict(lambda: {'credit': 0, 'revenue': 0})
         
@@ -258,20 +439,10 @@ class AttributionEngine:
         ROAS = Revenue / Ad Spend
         """
         # Get all attributed revenue for this campaign
-        attributed_revenue = 0
-        conversions_count = 0
-        
-        for conversion in self.conversions:
-            attribution = self.attribute_conversion(
-                user_id=conversion['user_id'],
-                conversion=conversion,
-                model=model
-            )
-            
-            for attr in attribution.get('attributed_campaigns', []):
-                if attr.get('campaign_id') == campaign_id:
-                    attributed_revenue += attr['revenue']
-                    conversions_count += 1
+        performance = self.refresh_attribution()
+        attributed_revenue, conversions_count = performance.get(model, performance['last_click']).get(
+            campaign_id, (0, 0)
+        )
         
         # Mock ad spend (in production, get from campaign data)
         ad_spend = self.get_campaign_spend(campaign_id)
@@ -289,6 +460,36 @@ class AttributionEngine:
             'cost_per_conversion': round(ad_spend / conversions_count, 2) if conversions_count > 0 else 0
         }
     
+    def calculate_all_roas(self, model: str = 'last_click') -> List[Dict]:
+        """
+        ROAS for every campaign that has attributed revenue under this model
+        """
+        performance = self.refresh_attribution()
+        campaign_ids = list(performance.get(model, performance['last_click']))
+        return [self.calculate_roas(campaign_id, model) for campaign_id in campaign_ids]
+    
+    def refresh_attribution(self) -> Dict[str, Dict[str, List]]:
+        """
+        Attribute conversions tracked since the last call under all models
+        in one pass: each conversion's lookback journey is sliced once and
+        every model credits the per-campaign accumulators. Journeys are
+        captured at tracking time, so earlier results never need redoing.
+        """
+        for conversion in self.conversions[self.attributed_conversions:]:
+            conversion_time, times, touchpoints = self._lookback(
+                conversion['user_id'], conversion, DEFAULT_LOOKBACK_DAYS
+            )
+            if touchpoints:
+                for model, attribution_func in self.models.items():
+                    accumulators = self.campaign_performance[model]
+                    for attr in attribution_func(touchpoints, conversion['revenue'], conversion_time, times):
+                        totals = accumulators[attr.get('campaign_id')]
+                        totals[0] += attr['revenue']
+                        totals[1] += 1
+        
+        self.attributed_conversions = len(self.conversions)
+        return self.campaign_performance
+    
     def get_campaign_spend(self, campaign_id: str) -> float:
         """
         Get total ad spend for campaign
@@ -338,7 +539,8 @@ class AttributionEngine:
         """
         Get complete user journey with all touchpoints and conversions
         """
-        user_touchpoints = self.touchpoints.get(user_id, [])
+        journey = self.journeys.get(user_id)
+        user_touchpoints = journey.touchpoints if journey else []
         user_conversions = [c for c in self.conversions if c['user_id'] == user_id]
         
         return {
@@ -351,9 +553,8 @@ class AttributionEngine:
         }
     
     def generate_id(self) -> str:
-        """Generate unique ID"""
-        timestamp = datetime.now().isoformat()
-        return hashlib.md5(timestamp.encode()).hexdigest()[:12]
+        """Generate unique, time-sortable ID"""
+        return new_id()
 
 # Global instance
 attribution_engine = AttributionEngine()
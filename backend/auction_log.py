@@ -0,0 +1,109 @@
+"""
+PatternOS RTB Auction Logs
+Fixed-size columnar ring buffers with optional spill to .npz files
+"""
+
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+AUCTION_LOG_CAPACITY = int(os.getenv('RTB_LOG_CAPACITY', '100000'))
+AUCTION_LOG_DIR = os.getenv('RTB_LOG_DIR') or None
+
+AUCTION_LOG_COLUMNS = {
+    'auction_id': object,
+    'user_id': object,
+    'aggregator': object,
+    'eligible_campaigns': np.int32,
+    'winning_ads': np.int16,
+    'response_time_ms': np.float32,
+    'timestamp': np.float64,
+}
+
+BID_LOG_COLUMNS = {
+    'campaign_id': object,
+    'auction_id': object,
+    'bid_amount': np.float64,
+    'actual_price': np.float64,
+    'timestamp': np.float64,
+}
+
+
+class ColumnRing:
+    """
+    Append-only ring buffer stored as one NumPy array per column.
+
+    Memory is fixed at `capacity` rows. With a spill_dir, flush() writes
+    rows not yet on disk to a numbered .npz chunk (one array per column);
+    rows overwritten before a flush reached them are counted in `dropped`.
+    """
+
+    def __init__(self, name: str, columns: Dict[str, type], capacity: int = AUCTION_LOG_CAPACITY,
+                 spill_dir: Optional[str] = AUCTION_LOG_DIR):
+        self.name = name
+        self.capacity = capacity
+        self.spill_dir = spill_dir
+        self.columns = {col: np.empty(capacity, dtype=dtype) for col, dtype in columns.items()}
+        self.total = 0          # rows ever appended
+        self.flushed = 0        # rows handed to flush() (or given up on)
+        self.dropped = 0
+        self._lock = threading.Lock()
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def __len__(self) -> int:
+        return min(self.total, self.capacity)
+
+    def append(self, **values):
+        with self._lock:
+            if self.spill_dir and self.total - self.flushed >= self.capacity:
+                self.flushed += 1
+                self.dropped += 1
+            pos = self.total % self.capacity
+            for col, array in self.columns.items():
+                array[pos] = values[col]
+            self.total += 1
+
+    def _slice(self, start: int, end: int) -> Dict[str, np.ndarray]:
+        """Copy rows [start, end) by sequence number, oldest first"""
+        positions = np.arange(start, end) % self.capacity
+        return {col: array[positions] for col, array in self.columns.items()}
+
+    def tail(self, n: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Most recent n rows (all retained rows by default) as columns"""
+        with self._lock:
+            available = len(self)
+            n = available if n is None else min(n, available)
+            return self._slice(self.total - n, self.total)
+
+    def rows(self, n: Optional[int] = None) -> List[Dict]:
+        """Most recent n rows as dicts, timestamps in ISO format"""
+        columns = self.tail(n)
+        rows = []
+        for i in range(len(columns['timestamp'])):
+            row = {col: values[i].item() if hasattr(values[i], 'item') else values[i]
+                   for col, values in columns.items()}
+            row['timestamp'] = datetime.fromtimestamp(row['timestamp']).isoformat()
+            rows.append(row)
+        return rows
+
+    def flush(self) -> int:
+        """Write unflushed rows to spill_dir; returns rows written"""
+        if not self.spill_dir:
+            return 0
+        with self._lock:
+            start, end = self.flushed, self.total
+            if end == start:
+                return 0
+            chunk = self._slice(start, end)
+            self.flushed = end
+
+        # Object columns become fixed-width strings so chunks load without pickle
+        chunk = {col: values.astype(str) if values.dtype == object else values
+                 for col, values in chunk.items()}
+        path = os.path.join(self.spill_dir, f"{self.name}_{start:012d}_{end:012d}.npz")
+        np.savez(path, **chunk)
+        return end - start
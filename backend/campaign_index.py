@@ -0,0 +1,172 @@
+"""
+PatternOS RTB Campaign Index
+Pre-built eligibility lookups so auctions never scan the full campaign list
+"""
+
+import json
+import os
+import sqlite3
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Targeting key for campaigns that don't restrict a dimension
+ANY = object()
+
+CAMPAIGN_DB_PATH = os.getenv('RTB_CAMPAIGN_DB', 'patternos_campaign_data.db')
+
+CAMPAIGN_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rtb_campaigns (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    brand TEXT,
+    aggregator TEXT,
+    max_cpm REAL,
+    budget REAL,
+    spent REAL DEFAULT 0,
+    status TEXT DEFAULT 'active',
+    targeting TEXT,
+    creative TEXT,
+    click_url TEXT,
+    start_date TEXT,
+    end_date TEXT,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+CAMPAIGN_SIGNATURE_SQL = "SELECT COUNT(*), MAX(updated_at) FROM rtb_campaigns"
+CAMPAIGN_SQL = """
+    SELECT id, name, brand, aggregator, max_cpm, budget, spent, status,
+           targeting, creative, click_url, start_date, end_date
+    FROM rtb_campaigns
+    WHERE status = 'active'
+    ORDER BY id
+"""
+
+
+def parse_schedule(value: Optional[str], default: float) -> float:
+    """ISO date/datetime -> epoch seconds (open-ended if missing)"""
+    if not value:
+        return default
+    return datetime.fromisoformat(value).timestamp()
+
+
+class CampaignIndex:
+    """
+    Immutable eligibility index over one aggregator's campaigns.
+
+    Every campaign is posted under each (category, page_type) pair it
+    targets, with ANY standing in for an untargeted dimension. Each
+    posting list is sorted by min_intent_score, so a lookup is four
+    dict hits plus a bisect per list: O(log n + matches).
+    """
+
+    def __init__(self, campaigns: Iterable[Dict]):
+        self.campaigns = list(campaigns)
+        self.starts = []
+        self.ends = []
+
+        built_at = datetime.now().timestamp()
+        postings = defaultdict(list)
+        for pos, campaign in enumerate(self.campaigns):
+            self.starts.append(parse_schedule(campaign.get('start_date'), float('-inf')))
+            self.ends.append(parse_schedule(campaign.get('end_date'), float('inf')))
+            if self.ends[pos] < built_at:
+                continue  # already finished, never eligible again
+
+            targeting = campaign.get('targeting') or {}
+            min_intent = targeting.get('min_intent_score', 0)
+            categories = set(targeting.get('categories') or [ANY])
+            page_types = set(targeting.get('page_types') or [ANY])
+            for category in categories:
+                for page_type in page_types:
+                    postings[(category, page_type)].append((min_intent, pos))
+
+        # Intent threshold buckets: parallel sorted thresholds / positions
+        self.thresholds = {}
+        self.positions = {}
+        for key, entries in postings.items():
+            entries.sort(key=lambda e: e[0])
+            self.thresholds[key] = [e[0] for e in entries]
+            self.positions[key] = [e[1] for e in entries]
+
+    def __len__(self) -> int:
+        return len(self.campaigns)
+
+    def eligible(
+        self,
+        intent_score: float,
+        category: Optional[str],
+        page_type: Optional[str],
+        now: Optional[float] = None
+    ) -> List[Dict]:
+        """Campaigns matching intent, category, page type, budget and schedule"""
+        if now is None:
+            now = datetime.now().timestamp()
+
+        hits = []
+        for key in ((category, page_type), (category, ANY), (ANY, page_type), (ANY, ANY)):
+            thresholds = self.thresholds.get(key)
+            if thresholds:
+                hits.extend(self.positions[key][:bisect_right(thresholds, intent_score)])
+
+        # Keep catalog order so auction tie-breaks match the linear scan
+        hits.sort()
+        eligible = []
+        for pos in hits:
+            campaign = self.campaigns[pos]
+            if campaign['spent'] >= campaign['budget']:
+                continue
+            if not self.starts[pos] <= now <= self.ends[pos]:
+                continue
+            eligible.append(campaign)
+        return eligible
+
+
+def build_indexes(campaigns: Iterable[Dict]) -> Dict[str, CampaignIndex]:
+    """Group campaigns by aggregator and index each group"""
+    by_aggregator = defaultdict(list)
+    for campaign in campaigns:
+        by_aggregator[campaign.get('aggregator')].append(campaign)
+    return {aggregator: CampaignIndex(group) for aggregator, group in by_aggregator.items()}
+
+
+def connect_readonly(db_path: str) -> Optional[sqlite3.Connection]:
+    """Open the campaign DB read-only; None if it doesn't exist"""
+    try:
+        return sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    except sqlite3.OperationalError:
+        return None
+
+
+def campaign_signature(conn: sqlite3.Connection) -> Optional[Tuple]:
+    """Cheap change marker for the rtb_campaigns table (None if missing)"""
+    try:
+        return tuple(conn.execute(CAMPAIGN_SIGNATURE_SQL).fetchone())
+    except sqlite3.OperationalError:
+        return None
+
+
+def load_campaigns(conn: sqlite3.Connection) -> List[Dict]:
+    """Active campaigns from rtb_campaigns, shaped like the RTB campaign dicts"""
+    campaigns = []
+    for row in conn.execute(CAMPAIGN_SQL):
+        (campaign_id, name, brand, aggregator, max_cpm, budget, spent, status,
+         targeting, creative, click_url, start_date, end_date) = row
+        campaigns.append({
+            'id': campaign_id,
+            'name': name,
+            'brand': brand,
+            'aggregator': aggregator,
+            'max_cpm': max_cpm,
+            'budget': budget,
+            'spent': spent or 0,
+            'status': status,
+            'targeting': json.loads(targeting) if targeting else {},
+            'creative': json.loads(creative) if creative else {},
+            'click_url': click_url,
+            'start_date': start_date,
+            'end_date': end_date
+        })
+    return campaigns
@@ -0,0 +1,83 @@
+"""
+PatternOS ID Generator
+Monotonic, time-sortable IDs shared by the RTB and attribution engines
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+# Crockford base32, as used by ULID
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+# Two characters per 10 bits, so a counter encodes in four lookups
+PAIRS = [a + b for a in ALPHABET for b in ALPHABET]
+
+_trace_id: ContextVar[Optional[str]] = ContextVar('trace_id', default=None)
+
+
+def encode_base32(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        chars.append(ALPHABET[value & 31])
+        value >>= 5
+    return ''.join(reversed(chars))
+
+
+class MonotonicIdGenerator:
+    """
+    ULID-style 26 character IDs: 10 chars of millisecond timestamp,
+    8 chars of per-process random prefix, 8 chars of counter.
+
+    IDs from one process are strictly increasing (the timestamp never goes
+    backwards and the counter breaks ties), IDs from different processes
+    differ in the prefix, and string order is time order.
+    """
+
+    def __init__(self):
+        self.prefix = encode_base32(int.from_bytes(os.urandom(5), 'big'), 8)
+        self._lock = threading.Lock()
+        self._counter = 0
+        self._last_ms = -1
+        self._time_part = ''
+
+    def new_id(self) -> str:
+        with self._lock:
+            now_ms = time.time_ns() // 1_000_000
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._time_part = encode_base32(now_ms, 10)
+            self._counter = (self._counter + 1) & 0xFF_FFFF_FFFF
+            counter = self._counter
+            time_part = self._time_part
+        return (time_part + self.prefix + PAIRS[counter >> 30] + PAIRS[(counter >> 20) & 1023]
+                + PAIRS[(counter >> 10) & 1023] + PAIRS[counter & 1023])
+
+
+id_generator = MonotonicIdGenerator()
+
+
+def new_id() -> str:
+    """Next ID from the process-wide generator"""
+    return id_generator.new_id()
+
+
+def current_trace_id() -> Optional[str]:
+    """Trace ID of the enclosing trace_context(), if any"""
+    return _trace_id.get()
+
+
+@contextmanager
+def trace_context(trace_id: Optional[str] = None) -> Iterator[str]:
+    """
+    Tag everything logged inside the block with one trace ID
+    (a new one unless given), e.g. all wins of one ad request
+    """
+    trace_id = trace_id or new_id()
+    token = _trace_id.set(trace_id)
+    try:
+        yield trace_id
+    finally:
+        _trace_id.reset(token)
@@ -0,0 +1,225 @@
+"""
+PatternOS RTB Intent Cache
+In-process LRU of per-user intent scores so auctions don't wait on SQLite
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from typing import Dict, List, Optional, Tuple
+
+from campaign_index import connect_readonly
+
+INTENT_DB_PATH = os.getenv('RTB_INTENT_DB', 'intent_intelligence.db')
+INTENT_CACHE_SIZE = int(os.getenv('RTB_INTENT_CACHE_SIZE', '200000'))
+INTENT_CACHE_TTL = float(os.getenv('RTB_INTENT_CACHE_TTL', '600'))
+INTENT_REFRESH_INTERVAL = 30.0
+
+HIGH_INTENT_THRESHOLD = 70
+
+# Compact cached record; loaded_at is time.monotonic()
+IntentRecord = namedtuple('IntentRecord', ['intent_score', 'intent_level', 'category', 'loaded_at'])
+
+# unified_intent_scores.suggested_category is often NULL (the scoring engine
+# doesn't set it); it then comes from the user's best intent_scores row
+TOP_CATEGORY = """(SELECT category FROM intent_scores WHERE user_id = u.customer_id
+                  ORDER BY intent_score DESC LIMIT 1)"""
+
+UNIFIED_SCORE_SQL = f"""
+    SELECT final_intent_score, intent_level, COALESCE(suggested_category, {TOP_CATEGORY})
+    FROM unified_intent_scores u WHERE customer_id = ?
+"""
+# Users not scored yet: best per-category behavioral score
+INTENT_SCORE_SQL = """
+    SELECT intent_score, intent_level, category
+    FROM intent_scores WHERE user_id = ?
+    ORDER BY intent_score DESC LIMIT 1
+"""
+CHANGED_SCORES_SQL = f"""
+    SELECT customer_id, final_intent_score, intent_level, COALESCE(suggested_category, {TOP_CATEGORY}),
+           last_updated
+    FROM unified_intent_scores u WHERE last_updated > ?
+    ORDER BY last_updated
+"""
+# First refresh covers up to max_size users: one grouped pass over intent_scores
+# (SQLite takes the bare category column from the MAX row) instead of one per user
+RECENT_SCORES_SQL = """
+    SELECT u.customer_id, u.final_intent_score, u.intent_level, COALESCE(u.suggested_category, top.category),
+           u.last_updated
+    FROM unified_intent_scores u
+    LEFT JOIN (SELECT user_id, category, MAX(intent_score) FROM intent_scores GROUP BY user_id) top
+           ON top.user_id = u.customer_id
+    ORDER BY u.last_updated DESC LIMIT ?
+"""
+# Without a usable intent_scores table, the stored category as-is
+PLAIN_SQL = {
+    UNIFIED_SCORE_SQL: """
+        SELECT final_intent_score, intent_level, suggested_category
+        FROM unified_intent_scores WHERE customer_id = ?
+    """,
+    CHANGED_SCORES_SQL: """
+        SELECT customer_id, final_intent_score, intent_level, suggested_category, last_updated
+        FROM unified_intent_scores WHERE last_updated > ?
+        ORDER BY last_updated
+    """,
+    RECENT_SCORES_SQL: """
+        SELECT customer_id, final_intent_score, intent_level, suggested_category, last_updated
+        FROM unified_intent_scores
+        ORDER BY last_updated DESC LIMIT ?
+    """,
+}
+
+
+def _execute(conn: sqlite3.Connection, sql: str, params: Tuple) -> Optional[sqlite3.Cursor]:
+    """Run sql, falling back to its PLAIN_SQL form; None if the tables don't exist yet"""
+    for query in filter(None, (sql, PLAIN_SQL.get(sql))):
+        try:
+            return conn.execute(query, params)
+        except sqlite3.OperationalError:
+            continue
+    return None
+
+
+def _fetchone(conn: sqlite3.Connection, sql: str, user_id: str) -> Optional[Tuple]:
+    cursor = _execute(conn, sql, (user_id,))
+    return cursor.fetchone() if cursor is not None else None
+
+
+class IntentCache:
+    """
+    Read-through, TTL- and size-bounded LRU of IntentRecords.
+
+    Misses load on a worker thread (concurrent misses for one user share
+    the load), so the event loop never blocks on SQLite. refresh() pulls
+    every unified_intent_scores row updated since the last refresh in one
+    query and updates cached users in place.
+    """
+
+    def __init__(self, db_path: str = INTENT_DB_PATH, max_size: int = INTENT_CACHE_SIZE,
+                 ttl: float = INTENT_CACHE_TTL):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.ttl = ttl
+        self.records = OrderedDict()
+        self.watermark = None
+        self._loading = {}
+        self._local = threading.local()
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.refreshed = 0
+        self.lookup_seconds = 0.0
+        self.load_seconds = 0.0
+
+    @property
+    def available(self) -> bool:
+        return os.path.exists(self.db_path)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = connect_readonly(self.db_path)
+        return conn
+
+    def _put(self, user_id: str, record: IntentRecord):
+        self.records[user_id] = record
+        self.records.move_to_end(user_id)
+        if len(self.records) > self.max_size:
+            self.records.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, user_id: str) -> IntentRecord:
+        start = time.perf_counter()
+        record = self.records.get(user_id)
+        if record is not None and time.monotonic() - record.loaded_at < self.ttl:
+            self.records.move_to_end(user_id)
+            self.hits += 1
+        else:
+            if record is not None:
+                self.expired += 1
+            self.misses += 1
+            record = await self._load(user_id)
+        self.lookup_seconds += time.perf_counter() - start
+        return record
+
+    async def _load(self, user_id: str) -> IntentRecord:
+        pending = self._loading.get(user_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[user_id] = future
+        start = time.perf_counter()
+        try:
+            record = await asyncio.to_thread(self.load_user, user_id)
+            self._put(user_id, record)
+            future.set_result(record)
+            return record
+        except Exception as exc:
+            future.set_exception(exc)
+            raise
+        finally:
+            self.load_seconds += time.perf_counter() - start
+            del self._loading[user_id]
+
+    def load_user(self, user_id: str) -> IntentRecord:
+        """Read one user's score from SQLite (worker thread)"""
+        row = None
+        conn = self._conn()
+        if conn is not None:
+            row = _fetchone(conn, UNIFIED_SCORE_SQL, user_id) or _fetchone(conn, INTENT_SCORE_SQL, user_id)
+        if row is None:
+            return IntentRecord(0.0, 'Low', None, time.monotonic())
+        return IntentRecord(float(row[0] or 0), row[1], row[2], time.monotonic())
+
+    def load_changed(self, watermark: Optional[str]) -> List[Tuple]:
+        """Rows updated after watermark; the most recent max_size on first run"""
+        conn = self._conn()
+        if conn is None:
+            return []
+        if watermark is None:
+            cursor = _execute(conn, RECENT_SCORES_SQL, (self.max_size,))
+            return cursor.fetchall()[::-1] if cursor is not None else []
+        cursor = _execute(conn, CHANGED_SCORES_SQL, (watermark,))
+        return cursor.fetchall() if cursor is not None else []
+
+    async def refresh(self) -> int:
+        """Bulk-apply changed scores; returns rows applied"""
+        rows = await asyncio.to_thread(self.load_changed, self.watermark)
+        now = time.monotonic()
+        applied = 0
+        for user_id, score, level, category, last_updated in rows:
+            # Update cached users; only fill new ones while there's room
+            if user_id in self.records or len(self.records) < self.max_size:
+                self._put(user_id, IntentRecord(float(score or 0), level, category, now))
+                applied += 1
+            self.watermark = last_updated
+        self.refreshed += applied
+        return applied
+
+    async def run_refresher(self, interval: float = INTENT_REFRESH_INTERVAL):
+        """Background task: refresh every `interval` seconds"""
+        while True:
+            await self.refresh()
+            await asyncio.sleep(interval)
+
+    def metrics(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.records),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'expired': self.expired,
+            'evictions': self.evictions,
+            'refreshed': self.refreshed,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'avg_lookup_ms': round(self.lookup_seconds / lookups * 1000, 4) if lookups else 0.0,
+            'avg_miss_load_ms': round(self.load_seconds / self.misses * 1000, 4) if self.misses else 0.0,
+            'watermark': self.watermark
+        }
@@ -0,0 +1,183 @@
+"""
+PatternOS Intent Event Store
+Per-client, per-category shards of user behavior for secure_intent scoring
+"""
+
+from array import array
+from bisect import bisect_right
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+SCORING_WINDOW_SECONDS = 30 * 24 * 3600
+HIGH_INTENT_SCORE = 0.7
+INTENT_LEVELS = ('high', 'medium', 'low', 'minimal')
+
+# Event kinds as the scorer groups them; anything else only counts toward activity
+SEARCH, CART, VIEW, OTHER = range(4)
+EVENT_KINDS = {'search': SEARCH, 'cart_add': CART, 'wishlist_add': CART, 'product_view': VIEW}
+
+
+def parse_timestamp(timestamp: str) -> float:
+    """Epoch seconds of an ISO timestamp; naive values are local time like datetime.now()"""
+    return datetime.fromisoformat(timestamp.replace('Z', '+00:00')).timestamp()
+
+
+class UserSignals:
+    """
+    One user's events in one shard. Only events inside the scoring window
+    are kept, as time-ordered array columns; counts[kind] is the number of
+    window events of each kind and is maintained as events arrive and expire.
+    """
+
+    __slots__ = ('times', 'kinds', 'head', 'counts', 'last_time', 'last_timestamp')
+
+    def __init__(self):
+        self.times = array('d')
+        self.kinds = array('b')
+        self.head = 0  # times[:head] have left the window
+        self.counts = [0, 0, 0, 0]
+        self.last_time = float('-inf')
+        self.last_timestamp = None
+
+    def add(self, kind: int, time: float, timestamp: str, cutoff: float):
+        if time > self.last_time:
+            self.last_time, self.last_timestamp = time, timestamp
+        if time < cutoff:
+            return
+        if self.times and time < self.times[-1]:  # late event: keep the columns ordered
+            position = max(bisect_right(self.times, time), self.head)
+            self.times.insert(position, time)
+            self.kinds.insert(position, kind)
+        else:
+            self.times.append(time)
+            self.kinds.append(kind)
+        self.counts[kind] += 1
+
+    def expire(self, cutoff: float):
+        times, kinds, head = self.times, self.kinds, self.head
+        while head < len(times) and times[head] < cutoff:
+            self.counts[kinds[head]] -= 1
+            head += 1
+        if head and head * 2 >= len(times):
+            del times[:head]
+            del kinds[:head]
+            head = 0
+        self.head = head
+
+    @property
+    def window_events(self) -> int:
+        return len(self.times) - self.head
+
+    @property
+    def window_last(self) -> Optional[Tuple[float, str]]:
+        """Latest event time and its original timestamp, if it is inside the window"""
+        return (self.last_time, self.last_timestamp) if self.window_events else None
+
+
+class CategoryShard:
+    """
+    Users of one (client, category) with their signals, their latest
+    scores and running aggregates over those scores.
+    """
+
+    def __init__(self, client_id: str, category: str):
+        self.client_id = client_id
+        self.category = category
+        self.users: Dict[str, UserSignals] = {}
+        self.scores: Dict[str, Dict] = {}
+        self.changed = set()  # users with events since their last score
+        self.level_counts = dict.fromkeys(INTENT_LEVELS, 0)
+        self.high_count = 0
+        self.high_score_sum = 0.0
+
+    def append(self, user_id: str, kind: int, time: float, timestamp: str, cutoff: float):
+        signals = self.users.get(user_id)
+        if signals is None:
+            signals = self.users[user_id] = UserSignals()
+        signals.add(kind, time, timestamp, cutoff)
+        self.changed.add(user_id)
+
+    def window(self, user_id: str, cutoff: float) -> Optional[UserSignals]:
+        signals = self.users.get(user_id)
+        if signals is not None:
+            signals.expire(cutoff)
+        return signals
+
+    def set_score(self, user_id: str, score: Dict):
+        previous = self.scores.get(user_id)
+        if previous is not None:
+            self._count(previous, -1)
+        self.scores[user_id] = score
+        self._count(score, 1)
+        self.changed.discard(user_id)
+
+    def _count(self, score: Dict, sign: int):
+        self.level_counts[score['intentLevel']] += sign
+        if score['intentScore'] >= HIGH_INTENT_SCORE:
+            self.high_count += sign
+            self.high_score_sum += sign * score['intentScore']
+
+
+class UserProfile:
+    """Per-client totals across categories, for profile and stats responses"""
+
+    __slots__ = ('total', 'categories', 'last_timestamp')
+
+    def __init__(self):
+        self.total = 0
+        self.categories = []
+        self.last_timestamp = None
+
+
+class IntentEventStore:
+    """Shards keyed by (client, category) plus a per-client user index"""
+
+    def __init__(self, window_seconds: float = SCORING_WINDOW_SECONDS):
+        self.window_seconds = window_seconds
+        self.shards: Dict[Tuple[str, str], CategoryShard] = {}
+        self.profiles: Dict[str, Dict[str, UserProfile]] = {}
+        self.event_counts: Dict[str, int] = {}
+
+    def cutoff(self, now: float) -> float:
+        return now - self.window_seconds
+
+    def shard(self, client_id: str, category: str) -> Optional[CategoryShard]:
+        return self.shards.get((client_id, category))
+
+    def append(self, client_id: str, user_id: str, event_type: str, category: str,
+               time: float, timestamp: str, now: float):
+        """Record one event at epoch `time`; `timestamp` is its original string"""
+        shard = self.shards.get((client_id, category))
+        if shard is None:
+            shard = self.shards[(client_id, category)] = CategoryShard(client_id, category)
+        shard.append(user_id, EVENT_KINDS.get(event_type, OTHER), time, timestamp, self.cutoff(now))
+
+        profiles = self.profiles.setdefault(client_id, {})
+        profile = profiles.get(user_id)
+        if profile is None:
+            profile = profiles[user_id] = UserProfile()
+        profile.total += 1
+        profile.last_timestamp = timestamp
+        if category not in profile.categories:
+            profile.categories.append(category)
+        self.event_counts[client_id] = self.event_counts.get(client_id, 0) + 1
+
+    def profile(self, client_id: str, user_id: str) -> Optional[UserProfile]:
+        return self.profiles.get(client_id, {}).get(user_id)
+
+    def client_shards(self, client_id: str) -> List[CategoryShard]:
+        return [shard for (client, _), shard in self.shards.items() if client == client_id]
+
+    def category_shards(self, category: str) -> List[CategoryShard]:
+        return [shard for (_, shard_category), shard in self.shards.items() if shard_category == category]
+
+    def changed(self) -> Iterator[Tuple[CategoryShard, str]]:
+        """(shard, user) for every user with events since they were last scored"""
+        for shard in list(self.shards.values()):
+            for user_id in list(shard.changed):
+                yield shard, user_id
+
+    def clear(self):
+        self.shards.clear()
+        self.profiles.clear()
+        self.event_counts.clear()
@@ -1,4 +1,6 @@
+import asyncio
 import os
+from typing import List
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -16,6 +18,21 @@ app.add_middleware(
 from rtb_engine import rtb_engine
 from attribution_engine import attribution_engine
 
+background_tasks = []
+
+@app.on_event("startup")
+async def start_background_tasks():
+    if rtb_engine.auction_logs.spill_dir:
+        background_tasks.append(asyncio.create_task(rtb_engine.run_log_flusher()))
+    if rtb_engine.intent_cache.available:
+        background_tasks.append(asyncio.create_task(rtb_engine.intent_cache.run_refresher()))
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    for task in background_tasks:
+        task.cancel()
+    rtb_engine.flush_logs()
+
 @app.get("/")
 async def root():
     return {"service": "PatternOS API", "version": "2.0", "status": "running"}
@@ -29,6 +46,10 @@ async def request_ads(request: dict):
     result = await rtb_engine.handle_ad_request(request)
     return result
 
+@app.get("/api/v1/rtb/intent-cache/metrics")
+async def intent_cache_metrics():
+    return rtb_engine.intent_cache.metrics()
+
 @app.get("/api/v1/campaigns/list")
 async def list_campaigns(aggregator: str = None):
     campaigns = rtb_engine.get_mock_campaigns(aggregator or 'zepto')
@@ -44,6 +65,21 @@ async def track_conversion(data: dict):
     result = attribution_engine.track_conversion(data)
     return result
 
+@app.post("/api/v1/attribution/touchpoints/batch")
+async def track_touchpoints(events: List[dict]):
+    results = attribution_engine.track_touchpoints(events)
+    return {'tracked': len(results), 'results': results}
+
+@app.post("/api/v1/attribution/conversions/batch")
+async def track_conversions(events: List[dict]):
+    results = attribution_engine.track_conversions(events)
+    return {'tracked': len(results), 'results': results}
+
+@app.get("/api/v1/attribution/roas")
+async def get_all_roas(model: str = "last_click"):
+    campaigns = attribution_engine.calculate_all_roas(model)
+    return {'model': model, 'total': len(campaigns), 'campaigns': campaigns}
+
 @app.get("/api/v1/attribution/roas/{campaign_id}")
 async def get_roas(campaign_id: str, model: str = "last_click"):
     return attribution_engine.calculate_roas(campaign_id, model)
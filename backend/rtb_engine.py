@@ -7,14 +7,62 @@ import asyncio
 from datetime import datetime
 from typing import List, Dict, Optional
 import random
-import hashlib
+import heapq
+import threading
+import time
 from collections import defaultdict
 
+import numpy as np
+
+from auction_log import (
+    AUCTION_LOG_CAPACITY, AUCTION_LOG_COLUMNS, AUCTION_LOG_DIR, BID_LOG_COLUMNS, ColumnRing
+)
+from intent_cache import HIGH_INTENT_THRESHOLD, IntentCache
+from id_generator import current_trace_id, new_id, trace_context
+from campaign_index import (
+    CAMPAIGN_DB_PATH, CampaignIndex, build_indexes, campaign_signature, connect_readonly, load_campaigns
+)
+
+# Seconds between checks of rtb_campaigns for changes
+CAMPAIGN_REFRESH_INTERVAL = 30.0
+
+# Seconds between auction/bid log spills to RTB_LOG_DIR
+LOG_FLUSH_INTERVAL = 5.0
+
+# Slot position bid modifiers
+POSITION_MULTIPLIERS = {
+    'hero_banner': 1.5,  # Premium position
+    'sidebar': 1.0,
+    'footer': 0.7
+}
+
 class RTBEngine:
-    def __init__(self):
+    def __init__(self, campaign_db_path: str = CAMPAIGN_DB_PATH,
+                 refresh_interval: float = CAMPAIGN_REFRESH_INTERVAL,
+                 unique_campaigns_across_slots: bool = False,
+                 log_capacity: int = AUCTION_LOG_CAPACITY,
+                 log_dir: Optional[str] = AUCTION_LOG_DIR,
+                 intent_cache: Optional[IntentCache] = None):
         self.active_campaigns = {}
-        self.bid_history = defaultdict(list)
-        self.auction_logs = []
+        self.intent_cache = intent_cache or IntentCache()
+        
+        # Bounded logs; per-campaign [wins, sum bid, sum price] kept for stats
+        self.bid_history = ColumnRing('bids', BID_LOG_COLUMNS, log_capacity, log_dir)
+        self.auction_logs = ColumnRing('auctions', AUCTION_LOG_COLUMNS, log_capacity, log_dir)
+        self.campaign_totals = defaultdict(lambda: [0, 0.0, 0.0])
+        
+        # When True a campaign can win at most one slot per ad request
+        self.unique_campaigns_across_slots = unique_campaigns_across_slots
+
+        # Campaign indexes per aggregator; replaced wholesale on refresh
+        self.campaign_db_path = campaign_db_path
+        self.refresh_interval = refresh_interval
+        self.campaign_indexes = None
+        self.mock_indexes = {}
+        self._campaign_signature = None
+        self._last_refresh_check = 0.0
+        self._refresh_lock = threading.Lock()
+        self._refresh_task = None
         
     async def handle_ad_request(self, request: Dict) -> Dict:
         """
@@ -28,44 +76,42 @@ class RTBEngine:
         ad_slots = request.get('ad_slots', [])
         aggregator = request.get('aggregator', 'unknown')
         
-        # Step 1: Get user intent score (from intelligence engine)
-        user_intent = await self.get_user_intent(user_id)
-        
-        # Step 2: Find eligible campaigns
-        eligible_campaigns = await self.find_eligible_campaigns(
-            user_intent=user_intent,
-            page_context=page_context,
-            aggregator=aggregator
-        )
-        
-        # Step 3: Run auction for each ad slot
-        winning_ads = []
-        for slot in ad_slots:
-            winner = await self.run_slot_auction(
-                slot=slot,
+        # One auction ID per request; slot wins are logged under it
+        with trace_context(self.generate_auction_id()) as auction_id:
+            # Step 1: Get user intent score (from intelligence engine)
+            user_intent = await self.get_user_intent(user_id)
+            
+            # Step 2: Find eligible campaigns
+            eligible_campaigns = await self.find_eligible_campaigns(
+                user_intent=user_intent,
+                page_context=page_context,
+                aggregator=aggregator
+            )
+            
+            # Step 3: Run auction for all ad slots at once
+            winners = await self.run_multi_slot_auction(
+                slots=ad_slots,
                 campaigns=eligible_campaigns,
                 user_intent=user_intent
             )
-            if winner:
-                winning_ads.append(winner)
+            winning_ads = [winner for winner in winners if winner]
         
         # Calculate response time
         response_time = (datetime.now() - start_time).total_seconds() * 1000
         
         # Log auction
-        auction_data = {
-            'auction_id': self.generate_auction_id(),
-            'user_id': user_id,
-            'aggregator': aggregator,
-            'eligible_campaigns': len(eligible_campaigns),
-            'winning_ads': len(winning_ads),
-            'response_time_ms': response_time,
-            'timestamp': datetime.now().isoformat()
-        }
-        self.auction_logs.append(auction_data)
+        self.auction_logs.append(
+            auction_id=auction_id,
+            user_id=user_id,
+            aggregator=aggregator,
+            eligible_campaigns=len(eligible_campaigns),
+            winning_ads=len(winning_ads),
+            response_time_ms=response_time,
+            timestamp=time.time()
+        )
         
         return {
-            'auction_id': auction_data['auction_id'],
+            'auction_id': auction_id,
             'ads': winning_ads,
             'response_time_ms': round(response_time, 2),
             'debug': {
@@ -76,9 +122,19 @@ class RTBEngine:
     
     async def get_user_intent(self, user_id: str) -> Dict:
         """
-        Get user's purchase intent from intelligence engine
+        Get user's purchase intent from the cached unified intent scores
         """
-        # Mock for now - in production, call actual ML model
+        if self.intent_cache.available:
+            record = await self.intent_cache.get(user_id)
+            return {
+                'user_id': user_id,
+                'intent_score': record.intent_score,
+                'intent_level': record.intent_level,
+                'predicted_category': record.category,
+                'ready_to_buy': record.intent_score >= HIGH_INTENT_THRESHOLD
+            }
+        
+        # No intent DB (local dev): mock
         return {
             'user_id': user_id,
             'intent_score': random.randint(60, 95),  # 0-100
@@ -97,16 +153,79 @@ class RTBEngine:
         """
         Find campaigns that match this user and context
         """
-        eligible = []
-        
-        # Mock campaigns (in production, query from database)
-        all_campaigns = self.get_mock_campaigns(aggregator)
-        
-        for campaign in all_campaigns:
-            if self.is_eligible(campaign, user_intent, page_context):
-                eligible.append(campaign)
-        
-        return eligible
+        if self._refresh_due():
+            refresh = self._start_refresh()
+            # Only the very first load is waited for; later rebuilds run while
+            # auctions keep using the current indexes
+            if self._campaign_signature is None:
+                await asyncio.shield(refresh)
+        index = self._index_for(aggregator)
+        return index.eligible(
+            intent_score=user_intent['intent_score'],
+            category=user_intent.get('predicted_category'),
+            page_type=page_context.get('page_type')
+        )
+    
+    def get_campaign_index(self, aggregator: str) -> CampaignIndex:
+        """
+        Campaign index for this aggregator: rtb_campaigns if the table
+        exists, otherwise the mock campaigns
+        """
+        if self._refresh_due():
+            self.refresh_campaigns()
+        return self._index_for(aggregator)
+    
+    def _index_for(self, aggregator: str) -> CampaignIndex:
+        indexes = self.campaign_indexes
+        if indexes is not None:
+            return indexes.get(aggregator) or CampaignIndex([])
+        
+        index = self.mock_indexes.get(aggregator)
+        if index is None:
+            index = self.mock_indexes[aggregator] = CampaignIndex(self.get_mock_campaigns(aggregator))
+        return index
+    
+    def _refresh_due(self) -> bool:
+        return time.monotonic() - self._last_refresh_check >= self.refresh_interval
+    
+    def _start_refresh(self) -> asyncio.Future:
+        """refresh_campaigns() on a worker thread, at most one at a time"""
+        task = self._refresh_task
+        if task is None or task.done():
+            task = self._refresh_task = asyncio.ensure_future(asyncio.to_thread(self.refresh_campaigns))
+            # A failed rebuild keeps the current indexes and is retried at the next interval
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return task
+    
+    def refresh_campaigns(self, force: bool = False) -> bool:
+        """
+        Rebuild the campaign indexes if rtb_campaigns changed.
+        Auctions keep using the old indexes until the new ones are swapped in
+        (one attribute assignment). Runs on a worker thread when triggered
+        from an auction.
+        """
+        if not self._refresh_lock.acquire(blocking=force):
+            return False
+        try:
+            self._last_refresh_check = time.monotonic()
+            conn = connect_readonly(self.campaign_db_path)
+            if conn is None:
+                return False
+            try:
+                signature = campaign_signature(conn)
+                if signature is None:
+                    return False
+                if signature == self._campaign_signature and not force:
+                    return False
+                campaigns = load_campaigns(conn)
+            finally:
+                conn.close()
+            
+            self.campaign_indexes = build_indexes(campaigns)
+            self._campaign_signature = signature
+            return True
+        finally:
+            self._refresh_lock.release()
     
     def is_eligible(
         self, 
@@ -160,35 +279,87 @@ class RTBEngine:
         """
         Run second-price auction for this ad slot
         """
-        if not campaigns:
-            return None
-        
-        # Collect bids from all campaigns
-        bids = []
-        for campaign in campaigns:
-            bid = self.calculate_bid(
-                campaign=campaign,
-                slot=slot,
-                user_intent=user_intent
-            )
-            if bid:
-                bids.append(bid)
-        
-        if not bids:
-            return None
-        
-        # Run second-price auction
-        winning_bid = self.second_price_auction(bids)
-        
-        # Track bid
-        self.bid_history[winning_bid['campaign_id']].append({
-            'auction_id': self.generate_auction_id(),
-            'bid_amount': winning_bid['bid_amount'],
-            'actual_price': winning_bid['actual_price'],
-            'timestamp': datetime.now().isoformat()
-        })
+        winners = await self.run_multi_slot_auction([slot], campaigns, user_intent)
+        return winners[0] if winners else None
+    
+    async def run_multi_slot_auction(
+        self,
+        slots: List[Dict],
+        campaigns: List[Dict],
+        user_intent: Dict,
+        unique_campaigns: Optional[bool] = None
+    ) -> List[Optional[Dict]]:
+        """
+        Run second-price auctions for every slot of one ad request.
+        Base bids are computed once; each slot applies its position
+        multiplier to the whole bid vector and only the top two bids
+        are selected. Returns one winner (or None) per slot.
+        """
+        if unique_campaigns is None:
+            unique_campaigns = self.unique_campaigns_across_slots
+        if not slots or not campaigns:
+            return [None] * len(slots)
+        
+        n = len(campaigns)
+        base_bids = np.fromiter((c.get('max_cpm', 100) for c in campaigns), dtype=np.float64, count=n)
+        base_bids *= self.intent_multiplier(user_intent)
+        remaining = np.fromiter((c['budget'] - c['spent'] for c in campaigns), dtype=np.float64, count=n)
+        multipliers = np.array([POSITION_MULTIPLIERS.get(slot.get('type'), 1.0) for slot in slots])
+        
+        # slots x campaigns; bids over the remaining budget don't enter
+        raw_bids = multipliers[:, None] * base_bids
+        ranked = np.round(raw_bids, 2)
+        ranked[raw_bids > remaining] = -np.inf
+        
+        auction_id = current_trace_id() or self.generate_auction_id()
+        winners = []
+        for i, slot in enumerate(slots):
+            row = ranked[i]
+            # argmax takes the first of equal bids, same as the stable sort did
+            first = int(np.argmax(row))
+            if row[first] == -np.inf:
+                winners.append(None)
+                continue
+            row[first] = -np.inf
+            second = int(np.argmax(row))
+            
+            bid = self._bid_entry(campaigns[first], slot, round(float(raw_bids[i, first]), 2))
+            if row[second] == -np.inf:
+                bid['actual_price'] = bid['bid_amount']
+            else:
+                bid['actual_price'] = round(round(float(raw_bids[i, second]), 2) + 0.01, 2)
+            bid['auction_type'] = 'second_price'
+            bid['won_at'] = datetime.now().isoformat()
+            winners.append(bid)
+            
+            if unique_campaigns:
+                ranked[i + 1:, first] = -np.inf
+            
+            self.record_win(bid, auction_id)
         
-        return winning_bid
+        return winners
+    
+    def record_win(self, bid: Dict, auction_id: str):
+        """Log a winning bid and update its campaign's running totals"""
+        self.bid_history.append(
+            campaign_id=bid['campaign_id'],
+            auction_id=auction_id,
+            bid_amount=bid['bid_amount'],
+            actual_price=bid['actual_price'],
+            timestamp=time.time()
+        )
+        totals = self.campaign_totals[bid['campaign_id']]
+        totals[0] += 1
+        totals[1] += bid['bid_amount']
+        totals[2] += bid['actual_price']
+    
+    def intent_multiplier(self, user_intent: Dict) -> float:
+        """Bid modifier based on user intent"""
+        if user_intent['intent_score'] > 80:
+            return 1.5  # Willing to pay 50% more for high-intent users
+        if user_intent['intent_score'] > 60:
+            return 1.2
+        return 1.0
     
     def calculate_bid(
         self,
@@ -202,19 +373,9 @@ class RTBEngine:
         # Base bid (CPM - Cost Per Mille/1000 impressions)
         base_cpm = campaign.get('max_cpm', 100)  # ₹100 per 1000 impressions
         
-        # Bid modifiers based on user intent
-        intent_multiplier = 1.0
-        if user_intent['intent_score'] > 80:
-            intent_multiplier = 1.5  # Willing to pay 50% more for high-intent users
-        elif user_intent['intent_score'] > 60:
-            intent_multiplier = 1.2
-        
-        # Slot position modifier
-        position_multiplier = {
-            'hero_banner': 1.5,  # Premium position
-            'sidebar': 1.0,
-            'footer': 0.7
-        }.get(slot.get('type'), 1.0)
+        # Bid modifiers based on user intent and slot position
+        intent_multiplier = self.intent_multiplier(user_intent)
+        position_multiplier = POSITION_MULTIPLIERS.get(slot.get('type'), 1.0)
         
         # Calculate final bid
         final_bid = base_cpm * intent_multiplier * position_multiplier
@@ -224,11 +385,14 @@ class RTBEngine:
         if final_bid > remaining_budget:
             return None
         
+        return self._bid_entry(campaign, slot, round(final_bid, 2))
+    
+    def _bid_entry(self, campaign: Dict, slot: Dict, bid_amount: float) -> Dict:
         return {
             'campaign_id': campaign['id'],
             'campaign_name': campaign['name'],
             'brand': campaign['brand'],
-            'bid_amount': round(final_bid, 2),
+            'bid_amount': bid_amount,
             'creative': campaign['creative'],
             'slot': slot,
             'click_url': campaign['click_url']
@@ -242,15 +406,15 @@ class RTBEngine:
         if not bids:
             return None
         
-        # Sort bids by amount (highest first)
-        sorted_bids = sorted(bids, key=lambda x: x['bid_amount'], reverse=True)
+        # Top two bids (highest first); ties keep input order like sorted()
+        top_bids = heapq.nlargest(2, bids, key=lambda x: x['bid_amount'])
         
         # Winner
-        winner = sorted_bids[0].copy()
+        winner = top_bids[0].copy()
         
         # Winner pays second price (if exists)
-        if len(sorted_bids) > 1:
-            second_price = sorted_bids[1]['bid_amount']
+        if len(top_bids) > 1:
+            second_price = top_bids[1]['bid_amount']
             winner['actual_price'] = round(second_price + 0.01, 2)
         else:
             winner['actual_price'] = winner['bid_amount']
@@ -393,35 +557,40 @@ class RTBEngine:
         ]
     
     def generate_auction_id(self) -> str:
-        """Generate unique auction ID"""
-        timestamp = datetime.now().isoformat()
-        return hashlib.md5(timestamp.encode()).hexdigest()[:12]
+        """Generate unique, time-sortable auction ID"""
+        return new_id()
     
     async def get_auction_stats(self, campaign_id: Optional[str] = None) -> Dict:
         """Get auction statistics"""
         if campaign_id:
-            bids = self.bid_history.get(campaign_id, [])
-            if not bids:
+            if campaign_id not in self.campaign_totals:
                 return {'error': 'No bids found for campaign'}
             
-            total_bids = len(bids)
-            avg_bid = sum(b['bid_amount'] for b in bids) / total_bids
-            avg_price = sum(b['actual_price'] for b in bids) / total_bids
-            total_spent = sum(b['actual_price'] for b in bids)
+            total_bids, sum_bid, total_spent = self.campaign_totals[campaign_id]
             
             return {
                 'campaign_id': campaign_id,
                 'total_auctions': total_bids,
-                'avg_bid_amount': round(avg_bid, 2),
-                'avg_actual_price': round(avg_price, 2),
+                'avg_bid_amount': round(sum_bid / total_bids, 2),
+                'avg_actual_price': round(total_spent / total_bids, 2),
                 'total_spent': round(total_spent, 2),
-                'savings': round(total_spent - sum(b['bid_amount'] for b in bids), 2)
+                'savings': round(total_spent - sum_bid, 2)
             }
         else:
             return {
-                'total_auctions': len(self.auction_logs),
-                'campaigns': list(self.bid_history.keys())
+                'total_auctions': self.auction_logs.total,
+                'campaigns': list(self.campaign_totals.keys())
             }
+    
+    def flush_logs(self) -> int:
+        """Spill unflushed auction and bid log rows to disk"""
+        return self.auction_logs.flush() + self.bid_history.flush()
+    
+    async def run_log_flusher(self, interval: float = LOG_FLUSH_INTERVAL):
+        """Background task: spill logs every `interval` seconds off the event loop"""
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(self.flush_logs)
 
 # Global instance
 rtb_engine = RTBEngine()
@@ -3,17 +3,19 @@ Intent Intelligence API Routes
 Captures user behavior and calculates purchase intent scores
 """
 
+import time
 from fastapi import APIRouter, HTTPException, Depends
 from typing import List, Optional
 from pydantic import BaseModel
-from datetime import datetime, timedelta
-from collections import defaultdict
+from datetime import datetime
+
+from intent_event_store import CART, SEARCH, VIEW, IntentEventStore, parse_timestamp
 
 router = APIRouter()
 
-# In-memory storage (replace with Redis/MongoDB in production)
-user_events = defaultdict(list)  # {client_id:user_id: [events]}
-intent_scores = {}  # {client_id:user_id:category: score}
+# In-memory storage (replace with Redis/MongoDB in production):
+# events and scores sharded by (client, category)
+event_store = IntentEventStore()
 
 # ============================================================================
 # DATA MODELS
@@ -51,65 +53,54 @@ SCORING_WEIGHTS = {
 def calculate_intent_score(client_id: str, user_id: str, category: str):
     """Calculate intent score based on user behavior"""
     
-    key = f"{client_id}:{user_id}"
-    events = user_events.get(key, [])
-    
-    if not events:
-        return None
-    
-    # Filter by category and last 30 days
-    cutoff = datetime.now() - timedelta(days=30)
-    relevant_events = [
-        e for e in events 
-        if e['category'] == category and 
-        datetime.fromisoformat(e['timestamp'].replace('Z', '+00:00')) >= cutoff
-    ]
+    # Signal counts over the last 30 days are kept up to date by the store
+    now = time.time()
+    shard = event_store.shard(client_id, category)
+    window = shard.window(user_id, event_store.cutoff(now)) if shard else None
     
-    if len(relevant_events) < 2:
+    if window is None or window.window_events < 2:
         return None
+    counts = window.counts
     
     # Calculate signals
     signals = []
     total_score = 0
     
     # Signal 1: Search Frequency
-    search_events = [e for e in relevant_events if e['eventType'] == 'search']
-    if search_events:
-        value = min(len(search_events) / 3.0, 1.0)
+    if counts[SEARCH]:
+        value = min(counts[SEARCH] / 3.0, 1.0)
         signals.append({
             'type': 'search_frequency',
             'value': value,
             'weight': SCORING_WEIGHTS['search_frequency'],
-            'count': len(search_events)
+            'count': counts[SEARCH]
         })
         total_score += value * SCORING_WEIGHTS['search_frequency']
     
     # Signal 2: Cart/Wishlist
-    cart_events = [e for e in relevant_events if e['eventType'] in ['cart_add', 'wishlist_add']]
-    if cart_events:
+    if counts[CART]:
         signals.append({
             'type': 'cart_wishlist',
             'value': 1.0,
             'weight': SCORING_WEIGHTS['cart_wishlist'],
-            'count': len(cart_events)
+            'count': counts[CART]
         })
         total_score += SCORING_WEIGHTS['cart_wishlist']
     
     # Signal 3: Product Views
-    view_events = [e for e in relevant_events if e['eventType'] == 'product_view']
-    if view_events:
-        value = min(len(view_events) / 2.0, 1.0)
+    if counts[VIEW]:
+        value = min(counts[VIEW] / 2.0, 1.0)
         signals.append({
             'type': 'product_views',
             'value': value,
             'weight': SCORING_WEIGHTS['product_views'],
-            'count': len(view_events)
+            'count': counts[VIEW]
         })
         total_score += value * SCORING_WEIGHTS['product_views']
     
     # Signal 4: Recency
-    last_event = max(relevant_events, key=lambda e: e['timestamp'])
-    hours_ago = (datetime.now() - datetime.fromisoformat(last_event['timestamp'].replace('Z', '+00:00'))).total_seconds() / 3600
+    last_time, last_timestamp = window.window_last
+    hours_ago = (now - last_time) / 3600
     
     if hours_ago < 24:
         recency_value = 1.0
@@ -150,17 +141,34 @@ def calculate_intent_score(client_id: str, user_id: str, category: str):
         'intentLevel': intent_level,
         'confidence': round(min(len(signals) / 4.0, 1.0), 4),
         'signals': signals,
-        'lastActivity': last_event['timestamp'],
+        'lastActivity': last_timestamp,
         'signalCount': len(signals),
         'scoredAt': datetime.now().isoformat()
     }
     
     # Store score
-    score_key = f"{client_id}:{user_id}:{category}"
-    intent_scores[score_key] = score_data
+    shard.set_score(user_id, score_data)
     
     return score_data
 
+def rescore_changed():
+    """Score only the users with events since their last score"""
+    
+    for shard, user_id in event_store.changed():
+        calculate_intent_score(shard.client_id, user_id, shard.category)
+        shard.changed.discard(user_id)
+
+def event_time(event: UserEvent):
+    """(epoch seconds, timestamp string) of an event; 422 if the timestamp is not ISO 8601"""
+    timestamp = event.timestamp or datetime.now().isoformat()
+    try:
+        return parse_timestamp(timestamp), timestamp
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"Invalid timestamp: {timestamp}")
+
+def store_event(client_id: str, event: UserEvent, event_at, now: float):
+    event_store.append(client_id, event.userId, event.eventType, event.category, *event_at, now)
+
 # ============================================================================
 # API ENDPOINTS
 # ============================================================================
@@ -169,49 +177,28 @@ def calculate_intent_score(client_id: str, user_id: str, category: str):
 async def ingest_event(event: UserEvent, clientId: str = "zepto"):
     """Ingest single user event"""
     
-    key = f"{clientId}:{event.userId}"
-    
-    event_data = {
-        'eventId': f"evt_{datetime.now().timestamp()}",
-        'userId': event.userId,
-        'eventType': event.eventType,
-        'category': event.category,
-        'productId': event.productId,
-        'searchQuery': event.searchQuery,
-        'location': event.location,
-        'timestamp': event.timestamp or datetime.now().isoformat()
-    }
-    
-    user_events[key].append(event_data)
+    event_id = f"evt_{datetime.now().timestamp()}"
+    store_event(clientId, event, event_time(event), time.time())
     
     # Trigger intent calculation asynchronously
     calculate_intent_score(clientId, event.userId, event.category)
     
     return {
         'message': 'Event ingested successfully',
-        'eventId': event_data['eventId']
+        'eventId': event_id
     }
 
 @router.post("/ingest/bulk")
 async def bulk_ingest(request: BulkEventsRequest):
     """Bulk ingest events"""
     
+    # Users are scored on the next rescore_changed(), not per event
+    # Check every timestamp before storing any of the batch
+    event_times = [event_time(event) for event in request.events]
+    now = time.time()
     processed = 0
-    for event in request.events:
-        key = f"{request.clientId}:{event.userId}"
-        
-        event_data = {
-            'eventId': f"evt_{datetime.now().timestamp()}_{processed}",
-            'userId': event.userId,
-            'eventType': event.eventType,
-            'category': event.category,
-            'productId': event.productId,
-            'searchQuery': event.searchQuery,
-            'location': event.location,
-            'timestamp': event.timestamp or datetime.now().isoformat()
-        }
-        
-        user_events[key].append(event_data)
+    for event, event_at in zip(request.events, event_times):
+        store_event(request.clientId, event, event_at, now)
         processed += 1
     
     return {
@@ -237,10 +224,9 @@ async def score_intent(request: IntentScoreRequest):
 async def get_user_profile(userId: str, clientId: str = "zepto"):
     """Get user intent profile across all categories"""
     
-    key = f"{clientId}:{userId}"
-    events = user_events.get(key, [])
+    profile = event_store.profile(clientId, userId)
     
-    if not events:
+    if profile is None:
         return {
             'userId': userId,
             'clientId': clientId,
@@ -248,11 +234,8 @@ async def get_user_profile(userId: str, clientId: str = "zepto"):
             'totalEvents': 0
         }
     
-    # Get unique categories
-    categories = list(set(e['category'] for e in events))
-    
     category_scores = {}
-    for category in categories:
+    for category in profile.categories:
         score = calculate_intent_score(clientId, userId, category)
         if score:
             category_scores[category] = score
@@ -261,8 +244,8 @@ async def get_user_profile(userId: str, clientId: str = "zepto"):
         'userId': userId,
         'clientId': clientId,
         'categories': category_scores,
-        'totalEvents': len(events),
-        'lastActivity': events[-1]['timestamp'] if events else None
+        'totalEvents': profile.total,
+        'lastActivity': profile.last_timestamp
     }
 
 @router.get("/high-intent/{category}")
@@ -274,18 +257,19 @@ async def get_high_intent_users(
 ):
     """Get users with high intent for a category"""
     
-    high_intent = []
+    rescore_changed()
+    shard = event_store.shard(clientId, category)
+    scores = shard.scores.values() if shard else []
     
-    for score_key, score in intent_scores.items():
-        parts = score_key.split(':')
-        if len(parts) == 3 and parts[0] == clientId and parts[2] == category:
-            if score['intentScore'] >= minScore:
-                high_intent.append({
-                    'userId': score['userId'],
-                    'intentScore': score['intentScore'],
-                    'intentLevel': score['intentLevel'],
-                    'lastActivity': score['lastActivity']
-                })
+    high_intent = [
+        {
+            'userId': score['userId'],
+            'intentScore': score['intentScore'],
+            'intentLevel': score['intentLevel'],
+            'lastActivity': score['lastActivity']
+        }
+        for score in scores if score['intentScore'] >= minScore
+    ]
     
     # Sort by score descending
     high_intent.sort(key=lambda x: x['intentScore'], reverse=True)
@@ -301,15 +285,17 @@ async def get_high_intent_users(
 async def get_stats(clientId: str = "zepto"):
     """Get intent intelligence statistics"""
     
-    total_users = len(set(key.split(':')[1] for key in user_events.keys() if key.startswith(clientId)))
-    total_events = sum(len(events) for key, events in user_events.items() if key.startswith(clientId))
-    total_scores = len([k for k in intent_scores.keys() if k.startswith(clientId)])
+    rescore_changed()
+    shards = event_store.client_shards(clientId)
+    total_users = len(event_store.profiles.get(clientId, {}))
+    total_events = event_store.event_counts.get(clientId, 0)
+    total_scores = sum(len(shard.scores) for shard in shards)
     
     # Count by intent level
     intent_distribution = {'high': 0, 'medium': 0, 'low': 0, 'minimal': 0}
-    for key, score in intent_scores.items():
-        if key.startswith(clientId):
-            intent_distribution[score['intentLevel']] += 1
+    for shard in shards:
+        for level, count in shard.level_counts.items():
+            intent_distribution[level] += count
     
     return {
         'clientId': clientId,
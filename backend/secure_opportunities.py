@@ -44,29 +44,24 @@ class OpportunityAction(BaseModel):
 
 def detect_opportunities():
     """Scan intent data and detect revenue opportunities"""
-    from secure_intent import intent_scores, user_events
+    from secure_intent import event_store, rescore_changed
     
     opportunities_found = []
+    rescore_changed()
     
     # Analyze each category
     categories = ['footwear', 'apparel', 'electronics', 'groceries', 'beauty', 'sports']
     
     for category in categories:
-        # Get high-intent users for this category
-        high_intent_users = []
+        # High-intent (score >= 0.7) users for this category, kept per shard
+        shards = event_store.category_shards(category)
+        user_count = sum(shard.high_count for shard in shards)
         
-        for key, score in intent_scores.items():
-            parts = key.split(':')
-            if len(parts) == 3 and parts[2] == category:
-                if score['intentScore'] >= 0.7:
-                    high_intent_users.append(score)
-        
-        if len(high_intent_users) < 1000:  # Minimum threshold
+        if user_count < 1000:  # Minimum threshold
             continue
         
         # Calculate metrics
-        user_count = len(high_intent_users)
-        avg_score = sum(u['intentScore'] for u in high_intent_users) / user_count
+        avg_score = sum(shard.high_score_sum for shard in shards) / user_count
         
         # Revenue estimates (conservative)
         # Assume: ₹2,000 average order value, 4.5% conversion
@@ -2,9 +2,17 @@
 """
 Load real Zepto campaign data into PatternOS database
 """
+import os
+import sys
+
 import pandas as pd
 import sqlite3
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+from app.analytics_rollup import build_analytics_rollups
+from app.attribution_batch import build_attribution_summaries
+from app.response_cache import bump_data_version
+
 print("🚀 Loading Real Campaign Data into PatternOS")
 print("=" * 70)
 
@@ -90,11 +98,19 @@ ad_spend_df.to_sql('ad_spend_daily', conn, if_exists='replace', index=False)
 campaigns_df.to_sql('campaigns_master', conn, if_exists='replace', index=False)
 attribution_df.to_sql('ad_attribution', conn, if_exists='replace', index=False)
 sku_targeting_df.to_sql('campaign_sku_targeting', conn, if_exists='replace', index=False)
+bump_data_version(conn)
 
 conn.commit()
+
+# The attribution endpoints read summaries of the tables just replaced
+touchpoints = build_attribution_summaries(conn)
+# to_sql(if_exists='replace') dropped the ad_spend_daily triggers; rebuild the cube and reinstall them
+rollup_rows = build_analytics_rollups(conn)
 conn.close()
 
 print("  ✅ All data loaded into database")
+print(f"  ✅ Attribution summaries rebuilt from {touchpoints:,} touchpoints")
+print(f"  ✅ Analytics rollups rebuilt ({rollup_rows:,} rows)")
 
 # Calculate ROAS by brand
 print("\n🎯 ROAS by Brand:")
@@ -0,0 +1,107 @@
+"""
+PatternOS Batch Scoring
+Streams a feature query through a fitted model in fixed-size chunks
+
+Feature rows are read with a cursor, `chunk_size` at a time. Each chunk
+is scored and bulk-inserted before the next one is read, so memory use
+does not grow with the customer base. With workers > 1 the chunks are
+scored in a process pool. At most two chunks per worker are in flight,
+and the write order follows the read order.
+
+Predictions go into a staging table. That table replaces the output
+table in the same transaction as the last insert, so readers see either
+the previous run or the complete new one.
+"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Callable, Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CHUNK_SIZE = 50_000
+KEY_COLUMNS = ['global_customer_id', 'platform_id']
+INTENT_LEVEL_BINS = [0, 0.4, 0.7, 1.0]
+INTENT_LEVELS = ['low', 'medium', 'high']
+
+PREDICTIONS_SCHEMA = """
+CREATE TABLE {table} (
+    global_customer_id TEXT, platform_id TEXT, intent_score REAL, intent_level TEXT,
+    scoring_timestamp TIMESTAMP, model_version TEXT
+)
+"""
+
+# Set in each pool worker by _init_worker, so the model is pickled once per worker, not per chunk
+_worker_score_chunk = None
+
+
+def _init_worker(score_chunk: Callable):
+    global _worker_score_chunk
+    _worker_score_chunk = score_chunk
+
+
+def _score_in_worker(chunk: pd.DataFrame) -> np.ndarray:
+    return _worker_score_chunk(chunk)
+
+
+def intent_levels(scores: np.ndarray) -> np.ndarray:
+    """Bucket scores as pd.cut over INTENT_LEVEL_BINS does; a score of exactly 0 has no level"""
+    # Right-closed bins: searchsorted(side='left') puts (0, 0.4] in bucket 1, and so on
+    labels = np.array([None, *INTENT_LEVELS, None], dtype=object)
+    return labels[np.searchsorted(INTENT_LEVEL_BINS, scores, side='left')]
+
+
+def scored_chunks(chunks: Iterator[pd.DataFrame], score_chunk: Callable,
+                  workers: int = 1) -> Iterator[Tuple[pd.DataFrame, np.ndarray]]:
+    """(key columns, scores) per chunk, in input order"""
+    if workers <= 1:
+        for chunk in chunks:
+            yield chunk[KEY_COLUMNS], score_chunk(chunk)
+        return
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(score_chunk,)) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append((chunk[KEY_COLUMNS], pool.submit(_score_in_worker, chunk)))
+            if len(pending) >= 2 * workers:
+                keys, future = pending.popleft()
+                yield keys, future.result()
+        while pending:
+            keys, future = pending.popleft()
+            yield keys, future.result()
+
+
+def score_query(conn, query: str, score_chunk: Callable, output_table: str = 'intent_score_predictions',
+                model_version: str = None, chunk_size: int = DEFAULT_CHUNK_SIZE, workers: int = 1) -> int:
+    """
+    Score every row of `query` into `output_table`.
+
+    `score_chunk(frame)` returns the positive-class probability of each row
+    and must leave the frame's key columns alone. It has to be picklable
+    when workers > 1. Returns the number of rows scored.
+    """
+    staging = f'{output_table}_staging'
+    conn.execute(f'DROP TABLE IF EXISTS {staging}')
+    conn.execute(PREDICTIONS_SCHEMA.format(table=staging))
+    insert = f'INSERT INTO {staging} VALUES (?, ?, ?, ?, ?, ?)'
+    scored_at = str(datetime.now())
+
+    scored = 0
+    try:
+        chunks = pd.read_sql_query(query, conn, chunksize=chunk_size)
+        for keys, scores in scored_chunks(chunks, score_chunk, workers):
+            scores = np.asarray(scores, dtype=float)
+            conn.executemany(insert, zip(keys['global_customer_id'], keys['platform_id'], scores.tolist(),
+                                         intent_levels(scores), [scored_at] * len(scores),
+                                         [model_version] * len(scores)))
+            scored += len(scores)
+
+        conn.execute(f'DROP TABLE IF EXISTS {output_table}')
+        conn.execute(f'ALTER TABLE {staging} RENAME TO {output_table}')
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return scored
@@ -0,0 +1,60 @@
+"""
+PatternOS Categorical Encoder
+Category -> integer code mapping with vectorized encoding of unseen values
+
+A drop-in replacement for sklearn's LabelEncoder in the model package.
+Codes are the positions in the sorted classes_, as LabelEncoder assigns
+them, so models trained with either encoder see the same integers.
+
+Values outside classes_ get the code of the UNKNOWN class when training
+produced one (nulls are filled with it before fitting). Otherwise they
+get UNKNOWN_CODE. Encoding is one hash lookup per value against an index
+of the classes, so classes_ is never scanned per value.
+"""
+
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+UNKNOWN = 'Unknown'
+UNKNOWN_CODE = -1
+
+
+class CategoricalEncoder:
+
+    def __init__(self, classes: Iterable = ()):
+        self._set_classes(classes)
+
+    def _set_classes(self, classes: Iterable):
+        self.classes_ = np.array(sorted(set(map(str, classes))), dtype=object)
+        # Hashed category -> code lookup; the code is the position in classes_
+        self._categories = pd.Index(self.classes_)
+
+    @classmethod
+    def from_label_encoder(cls, label_encoder) -> 'CategoricalEncoder':
+        """Convert a fitted sklearn LabelEncoder from an older model package"""
+        return cls(label_encoder.classes_)
+
+    @property
+    def unknown_code(self) -> int:
+        position = self._categories.get_indexer([UNKNOWN])[0]
+        return UNKNOWN_CODE if position < 0 else int(position)
+
+    def fit(self, values) -> 'CategoricalEncoder':
+        self._set_classes(pd.unique(pd.Series(values).astype(str)))
+        return self
+
+    def transform(self, values) -> np.ndarray:
+        codes = self._categories.get_indexer(pd.Series(values).astype(str)).astype(np.int64)
+        codes[codes < 0] = self.unknown_code
+        return codes
+
+    def fit_transform(self, values) -> np.ndarray:
+        return self.fit(values).transform(values)
+
+    def __getstate__(self):
+        return {'classes': list(self.classes_)}
+
+    def __setstate__(self, state):
+        self._set_classes(state['classes'])
@@ -0,0 +1,149 @@
+"""
+PatternOS Cross-Platform Engine
+Customer x platform activity matrix and the platform-mix features derived from it
+
+One pass over fact_transaction, grouped by customer, returns each
+customer's lifetime transaction count on every platform as its own column.
+There are only a handful of platforms, so these columns form a dense
+(customers x platforms) array. The same pass also returns the 30-day count
+and value. Every feature is then a row-wise reduction over the array.
+
+Switching frequency needs transaction order, so it comes from a second,
+index-ranged scan over the last 30 days only.
+"""
+
+import numpy as np
+import pandas as pd
+
+PLATFORMS_SQL = "SELECT DISTINCT platform_id FROM fact_transaction WHERE platform_id IS NOT NULL ORDER BY platform_id"
+
+# One row per customer; {platform_counts} expands to a lifetime count column per platform
+PLATFORM_MATRIX_SQL = """
+SELECT global_customer_id,
+       SUM(CASE WHEN transaction_datetime >= DATE(:reference_date, '-30 days') THEN 1 ELSE 0 END) AS txn_count_30d,
+       SUM(CASE WHEN transaction_datetime >= DATE(:reference_date, '-30 days') THEN total_value ELSE 0 END) AS value_30d{platform_counts}
+FROM fact_transaction
+GROUP BY global_customer_id
+"""
+
+# Same index the RFM engine creates; keeps the 30-day scan off the full table
+TRANSACTION_TIME_INDEX_SQL = "CREATE INDEX IF NOT EXISTS idx_trans_datetime ON fact_transaction (transaction_datetime)"
+
+RECENT_SEQUENCE_SQL = """
+SELECT global_customer_id, platform_id
+FROM fact_transaction
+WHERE transaction_datetime >= DATE(:reference_date, '-30 days')
+ORDER BY transaction_datetime
+"""
+
+FEATURE_COLUMNS = [
+    'global_customer_id', 'platforms_used_count', 'platforms_list',
+    'cross_platform_purchase_count_30d', 'cross_platform_value_30d', 'dominant_platform',
+    'platform_switching_frequency', 'platform_diversity_score', 'dominant_platform_share',
+    'platform_loyalty_score',
+]
+
+
+class PlatformMatrix:
+    """
+    Lifetime transaction counts as a dense customers x platforms array, with
+    each customer's 30-day count and value across all platforms
+    """
+
+    def __init__(self, customers: pd.Index, platforms: pd.Index, counts: np.ndarray,
+                 counts_30d: np.ndarray, value_30d: np.ndarray):
+        self.customers = customers
+        self.platforms = platforms
+        self.counts = counts
+        self.counts_30d = counts_30d
+        self.value_30d = value_30d
+
+    @classmethod
+    def load(cls, conn, reference_date) -> 'PlatformMatrix':
+        platforms = [platform for (platform,) in conn.execute(PLATFORMS_SQL)]
+        columns = [f'platform_{i}' for i in range(len(platforms))]
+        query = PLATFORM_MATRIX_SQL.format(platform_counts=''.join(
+            f',\n       SUM(platform_id = :{column}) AS {column}' for column in columns))
+        params = {'reference_date': str(reference_date), **dict(zip(columns, platforms))}
+        frame = pd.read_sql_query(query, conn, params=params)
+
+        return cls(pd.Index(frame['global_customer_id']), pd.Index(platforms),
+                   frame[columns].fillna(0).to_numpy(np.int64).reshape(len(frame), len(columns)),
+                   frame['txn_count_30d'].fillna(0).to_numpy(np.int64),
+                   frame['value_30d'].fillna(0).to_numpy(np.float64))
+
+
+def platform_lists(used: np.ndarray, platforms: pd.Index) -> np.ndarray:
+    """Comma-joined platforms per row, formatted once per distinct usage pattern"""
+    if not used.shape[1]:
+        return np.full(len(used), '', dtype=object)
+    # Each row's usage bits packed into one fixed-width value, so patterns dedupe as scalars
+    packed = np.ascontiguousarray(np.packbits(used, axis=1))
+    keys = packed.view(np.dtype((np.void, packed.shape[1]))).ravel()
+    patterns, inverse = np.unique(keys, return_inverse=True)
+    patterns = np.unpackbits(patterns.view(np.uint8).reshape(len(patterns), -1), axis=1,
+                             count=used.shape[1]).astype(bool)
+    labels = np.array([','.join(platforms[pattern]) for pattern in patterns], dtype=object)
+    return labels[inverse.reshape(-1)]
+
+
+def platform_entropy(counts: np.ndarray) -> np.ndarray:
+    """
+    Shannon entropy of each row's platform shares, normalised by log(#platforms):
+    0 for a single platform, 1 for an even split across every platform
+    """
+    total = counts.sum(axis=1, keepdims=True)
+    shares = np.divide(counts, total, out=np.zeros(counts.shape), where=total > 0)
+    if counts.shape[1] < 2:
+        return np.zeros(len(counts))
+    log_shares = np.log(shares, out=np.zeros(counts.shape), where=shares > 0)
+    return np.clip(-(shares * log_shares).sum(axis=1) / np.log(counts.shape[1]), 0.0, 1.0)
+
+
+def switch_counts(sequence: pd.DataFrame, matrix: PlatformMatrix) -> np.ndarray:
+    """
+    Platform changes between each customer's consecutive transactions.
+    `sequence` must be in transaction time order. A stable sort by customer
+    keeps that order within each customer.
+    """
+    customer_codes = matrix.customers.get_indexer(sequence['global_customer_id'])
+    platform_codes = matrix.platforms.get_indexer(sequence['platform_id'])
+    order = np.argsort(customer_codes, kind='stable')
+    customers, platforms = customer_codes[order], platform_codes[order]
+    switched = (customers[1:] == customers[:-1]) & (platforms[1:] != platforms[:-1])
+    return np.bincount(customers[1:][switched], minlength=len(matrix.customers))
+
+
+def cross_platform_features(conn, reference_date) -> pd.DataFrame:
+    """One row per customer, in customer order, with the feat_cross_platform columns"""
+    matrix = PlatformMatrix.load(conn, reference_date)
+    if not len(matrix.customers):
+        return pd.DataFrame(columns=FEATURE_COLUMNS)
+    conn.execute(TRANSACTION_TIME_INDEX_SQL)
+    sequence = pd.read_sql_query(RECENT_SEQUENCE_SQL, conn, params={'reference_date': str(reference_date)})
+
+    counts = matrix.counts
+    used = counts > 0
+    total = counts.sum(axis=1)
+    diversity = platform_entropy(counts)
+
+    # Customers whose transactions all lack a platform_id have no dominant platform
+    has_platform = total > 0
+    dominant = np.full(len(total), None, dtype=object)
+    if counts.shape[1]:
+        dominant[has_platform] = np.asarray(matrix.platforms, dtype=object)[counts.argmax(axis=1)[has_platform]]
+
+    return pd.DataFrame({
+        'global_customer_id': matrix.customers,
+        'platforms_used_count': used.sum(axis=1),
+        'platforms_list': platform_lists(used, matrix.platforms),
+        'cross_platform_purchase_count_30d': matrix.counts_30d,
+        'cross_platform_value_30d': matrix.value_30d,
+        'dominant_platform': pd.Series(dominant, dtype=object),
+        # Platform switches between consecutive transactions in the last 30 days
+        'platform_switching_frequency': switch_counts(sequence, matrix),
+        'platform_diversity_score': diversity,
+        'dominant_platform_share': np.divide(counts.max(axis=1, initial=0), total, out=np.zeros(len(total)),
+                                             where=has_platform),
+        'platform_loyalty_score': 1 - diversity,
+    })
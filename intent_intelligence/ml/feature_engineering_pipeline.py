@@ -12,6 +12,10 @@ from sklearn.preprocessing import StandardScaler
 import joblib
 import json
 
+from cross_platform_engine import cross_platform_features
+from point_in_time import build_training_set
+from rfm_engine import rfm_features, update_rfm_state
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
@@ -28,7 +32,7 @@ MEDIUM_INTENT_THRESHOLD = 0.4
 # FEATURE ENGINEERING
 # ============================================================================
 
-def compute_rfm_features(conn, reference_date=None):
+def compute_rfm_features(conn, reference_date=None, rebuild=False):
     """Compute RFM (Recency, Frequency, Monetary) features"""
     
     if reference_date is None:
@@ -36,86 +40,9 @@ def compute_rfm_features(conn, reference_date=None):
     
     print(f"\nComputing RFM features as of {reference_date}...")
     
-    query = f"""
-    SELECT 
-        global_customer_id,
-        platform_id,
-        
-        -- Recency: days since last transaction
-        JULIANDAY('{reference_date}') - JULIANDAY(MAX(transaction_datetime)) as recency_days,
-        
-        -- Frequency: transaction counts by time window
-        SUM(CASE WHEN transaction_datetime >= DATE('{reference_date}', '-7 days') THEN 1 ELSE 0 END) as frequency_7d,
-        SUM(CASE WHEN transaction_datetime >= DATE('{reference_date}', '-30 days') THEN 1 ELSE 0 END) as frequency_30d,
-        SUM(CASE WHEN transaction_datetime >= DATE('{reference_date}', '-90 days') THEN 1 ELSE 0 END) as frequency_90d,
-        SUM(CASE WHEN transaction_datetime >= DATE('{reference_date}', '-365 days') THEN 1 ELSE 0 END) as frequency_365d,
-        COUNT(*) as frequency_lifetime,
-        
-        -- Monetary: transaction value by time window
-        SUM(CASE WHEN transaction_datetime >= DATE('{reference_date}', '-7 days') THEN total_value ELSE 0 END) as monetary_7d,
-        SUM(CASE WHEN transaction_datetime >= DATE('{reference_date}', '-30 days') THEN total_value ELSE 0 END) as monetary_30d,
-        SUM(CASE WHEN transaction_datetime >= DATE('{reference_date}', '-90 days') THEN total_value ELSE 0 END) as monetary_90d,
-        SUM(CASE WHEN transaction_datetime >= DATE('{reference_date}', '-365 days') THEN total_value ELSE 0 END) as monetary_365d,
-        SUM(total_value) as monetary_lifetime,
-        
-        -- Average Order Value
-        AVG(CASE WHEN transaction_datetime >= DATE('{reference_date}', '-30 days') THEN total_value END) as aov_30d,
-        AVG(CASE WHEN transaction_datetime >= DATE('{reference_date}', '-90 days') THEN total_value END) as aov_90d,
-        AVG(total_value) as aov_lifetime,
-        
-        -- Last transaction date
-        MAX(transaction_datetime) as last_transaction_dt
-        
-    FROM fact_transaction
-    GROUP BY global_customer_id, platform_id
-    """
-    
-    rfm_df = pd.read_sql_query(query, conn)
-    
-    # Compute RFM scores (1-5 scale)
-    def score_column(col, ascending=True):
-        return pd.qcut(col, q=5, labels=[1,2,3,4,5], duplicates='drop')
-    
-    # Recency: lower is better (inverse scoring)
-    rfm_df['recency_score'] = score_column(rfm_df['recency_days'], ascending=True).astype(float)
-    rfm_df['recency_score'] = 6 - rfm_df['recency_score']  # Invert so higher recency score = more recent
-    
-    # Frequency: higher is better
-    rfm_df['frequency_score'] = score_column(rfm_df['frequency_90d'], ascending=False).astype(float)
-    
-    # Monetary: higher is better
-    rfm_df['monetary_score'] = score_column(rfm_df['monetary_90d'], ascending=False).astype(float)
-    
-    # Combined RFM score
-    rfm_df['rfm_score'] = (
-        rfm_df['recency_score'].astype(str) +
-        rfm_df['frequency_score'].astype(str) +
-        rfm_df['monetary_score'].astype(str)
-    )
-    
-    # Customer segmentation based on RFM
-    def segment_customer(row):
-        r, f, m = int(row['recency_score']), int(row['frequency_score']), int(row['monetary_score'])
-        
-        if r >= 4 and f >= 4 and m >= 4:
-            return 'Champions'
-        elif r >= 3 and f >= 3:
-            return 'Loyal'
-        elif r >= 4:
-            return 'Potential'
-        elif f >= 4:
-            return 'Frequent'
-        elif r <= 2 and f <= 2:
-            return 'At Risk'
-        elif r <= 2:
-            return 'Hibernating'
-        else:
-            return 'Regular'
-    
-    rfm_df['customer_segment'] = rfm_df.apply(segment_customer, axis=1)
-    
-    # Add reference date
-    rfm_df['reference_date'] = reference_date
+    # Window sums are kept in daily buckets; only new transaction days are read
+    state = update_rfm_state(conn, reference_date, rebuild=rebuild)
+    rfm_df = rfm_features(state, reference_date)
     
     # Save to database
     rfm_df.to_sql('feat_customer_rfm', conn, if_exists='replace', index=False)
@@ -134,39 +61,8 @@ def compute_cross_platform_features(conn, reference_date=None):
     
     print(f"\nComputing cross-platform features...")
     
-    query = f"""
-    SELECT 
-        global_customer_id,
-        COUNT(DISTINCT platform_id) as platforms_used_count,
-        GROUP_CONCAT(DISTINCT platform_id) as platforms_list,
-        
-        SUM(CASE WHEN transaction_datetime >= DATE('{reference_date}', '-30 days') THEN 1 ELSE 0 END) as cross_platform_purchase_count_30d,
-        SUM(CASE WHEN transaction_datetime >= DATE('{reference_date}', '-30 days') THEN total_value ELSE 0 END) as cross_platform_value_30d,
-        
-        -- Platform with most transactions
-        (SELECT platform_id FROM fact_transaction t2 
-         WHERE t2.global_customer_id = t1.global_customer_id 
-         GROUP BY platform_id 
-         ORDER BY COUNT(*) DESC 
-         LIMIT 1) as dominant_platform
-        
-    FROM fact_transaction t1
-    GROUP BY global_customer_id
-    """
-    
-    cross_df = pd.read_sql_query(query, conn)
-    
-    # Calculate platform switching frequency (transactions per platform)
-    cross_df['platform_switching_frequency'] = cross_df['cross_platform_purchase_count_30d'] / cross_df['platforms_used_count']
-    
-    # Platform diversity score (0-1, higher = more diverse)
-    cross_df['platform_diversity_score'] = 1 - (1 / cross_df['platforms_used_count'])
-    
-    # Dominant platform share
-    cross_df['dominant_platform_share'] = 1 / cross_df['platforms_used_count']  # Simplified
-    
-    # Platform loyalty score (inverse of diversity)
-    cross_df['platform_loyalty_score'] = 1 - cross_df['platform_diversity_score']
+    # One grouped pass into a customer x platform matrix; features are row reductions
+    cross_df = cross_platform_features(conn, reference_date)
     
     cross_df['reference_date'] = reference_date
     
@@ -201,8 +97,8 @@ def compute_behavioral_features(conn, reference_date=None):
         SUM(CASE WHEN is_repeat = 1 THEN 1 ELSE 0 END) * 1.0 / COUNT(*) as repeat_rate,
         
         -- Time patterns
-        strftime('%H', transaction_datetime) as transaction_hour,
-        CASE WHEN CAST(strftime('%w', transaction_datetime) AS INTEGER) IN (0, 6) THEN 1 ELSE 0 END as is_weekend,
+        CAST(strftime('%H', transaction_datetime) AS INTEGER) as transaction_hour,
+        AVG(CASE WHEN CAST(strftime('%w', transaction_datetime) AS INTEGER) IN (0, 6) THEN 1.0 ELSE 0 END) as is_weekend,
         
         -- Payment preferences
         payment_mode as preferred_payment_mode,
@@ -251,65 +147,21 @@ def compute_behavioral_features(conn, reference_date=None):
 # INTENT SCORING
 # ============================================================================
 
-def prepare_training_data(conn, label_window_days=7, lookback_days=90):
+def prepare_training_data(conn, label_window_days=7, lookback_days=90, reference_dates=None,
+                          step_days=7, workers=1):
     """Prepare training dataset with labels"""
     
     print(f"\nPreparing training data...")
     print(f"  Label window: {label_window_days} days")
     print(f"  Lookback window: {lookback_days} days")
     
-    # Get historical transactions to create labels
-    query = """
-    SELECT 
-        t1.global_customer_id,
-        t1.platform_id,
-        t1.transaction_datetime as reference_datetime,
-        
-        -- Check if customer purchased within label window
-        EXISTS(
-            SELECT 1 FROM fact_transaction t2
-            WHERE t2.global_customer_id = t1.global_customer_id
-            AND t2.platform_id = t1.platform_id
-            AND t2.transaction_datetime > t1.transaction_datetime
-            AND t2.transaction_datetime <= DATE(t1.transaction_datetime, '+7 days')
-        ) as purchased_within_window
-        
-    FROM fact_transaction t1
-    WHERE DATE(t1.transaction_datetime) <= DATE('now', '-14 days')
-    ORDER BY RANDOM()
-    LIMIT 10000
-    """
-    
-    labels_df = pd.read_sql_query(query, conn)
-    labels_df['label'] = labels_df['purchased_within_window'].astype(int)
-    
-    # Join with features
-    features_query = """
-    SELECT 
-        rfm.*,
-        cp.platforms_used_count,
-        cp.platform_diversity_score,
-        cp.cross_platform_purchase_count_30d,
-        b.avg_items_per_transaction,
-        b.avg_discount_rate,
-        b.repeat_rate,
-        b.weekend_shopping_ratio
-    FROM feat_customer_rfm rfm
-    LEFT JOIN feat_cross_platform cp ON rfm.global_customer_id = cp.global_customer_id
-    LEFT JOIN feat_customer_behavior b ON rfm.global_customer_id = b.global_customer_id 
-        AND rfm.platform_id = b.platform_id
-    """
-    
-    features_df = pd.read_sql_query(features_query, conn)
-    
-    # Merge labels with features
-    training_df = labels_df.merge(
-        features_df,
-        on=['global_customer_id', 'platform_id'],
-        how='inner'
-    )
+    # Features as of each reference date, labelled by the purchase window that follows it
+    training_df = build_training_set(conn, reference_dates, lookback_days=lookback_days,
+                                     label_window_days=label_window_days, step_days=step_days,
+                                     workers=workers)
     
-    print(f"  Created training dataset with {len(training_df)} samples")
+    print(f"  Created training dataset with {len(training_df)} samples "
+          f"over {training_df['reference_date'].nunique()} reference dates")
     print(f"  Positive samples: {training_df['label'].sum()} ({training_df['label'].mean()*100:.1f}%)")
     
     return training_df
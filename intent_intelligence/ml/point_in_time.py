@@ -0,0 +1,211 @@
+"""
+PatternOS Point-in-Time Training Sets
+Features as of many reference dates from one sorted sweep over fact_transaction
+
+fact_transaction is read once and sorted by (customer-platform pair, time).
+Running totals are kept per feature column. For any pair and instant, the
+number of that pair's earlier transactions is then one searchsorted over
+the sorted keys. That makes every windowed feature a difference of two
+running totals: an as-of join for every (pair, reference date) at once.
+
+A snapshot taken at reference date R uses only transactions before R
+midnight. Its label is whether the pair bought again in the following
+label_window_days, i.e. in [R, R + label_window_days). Windows otherwise
+follow the feature tables: the N-day window starts at R - N days.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from typing import List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from cross_platform_engine import platform_entropy
+
+DAY = 86400
+KEYS = ['global_customer_id', 'platform_id']
+
+TRANSACTIONS_SQL = """
+SELECT global_customer_id, platform_id, transaction_datetime, total_value,
+       items_count, discount_value, is_repeat
+FROM fact_transaction
+WHERE transaction_datetime IS NOT NULL
+  AND global_customer_id IS NOT NULL AND platform_id IS NOT NULL
+"""
+
+FEATURE_COLUMNS = [
+    'recency_days', 'frequency_7d', 'frequency_30d', 'frequency_90d',
+    'monetary_30d', 'monetary_90d', 'aov_30d',
+    'platforms_used_count', 'platform_diversity_score', 'cross_platform_purchase_count_30d',
+    'avg_items_per_transaction', 'avg_discount_rate', 'repeat_rate', 'weekend_shopping_ratio',
+]
+
+
+class TransactionHistory:
+    """
+    Transactions sorted by (pair, time) with running totals. totals[column][i]
+    is the sum over the first i sorted transactions, so a pair's sum over a
+    time range is totals[end] - totals[start] at the positions of its bounds.
+    """
+
+    def __init__(self, transactions: pd.DataFrame):
+        when = pd.to_datetime(transactions['transaction_datetime'], format='ISO8601')
+        seconds = when.to_numpy('datetime64[s]').astype(np.int64)
+
+        # Pairs are numbered in (customer, platform) order; pair_table maps back from the two codes
+        customer_codes, self.customers = pd.factorize(transactions['global_customer_id'], sort=True)
+        platform_codes, self.platforms = pd.factorize(transactions['platform_id'], sort=True)
+        pair_ids, pair_codes = np.unique(customer_codes.astype(np.int64) * len(self.platforms) + platform_codes,
+                                         return_inverse=True)
+        self.customer_codes, self.platform_codes = np.divmod(pair_ids, len(self.platforms))
+        self.pair_table = np.full((len(self.customers), len(self.platforms)), -1, dtype=np.int64)
+        self.pair_table[self.customer_codes, self.platform_codes] = np.arange(len(pair_ids))
+        self.pairs = pd.DataFrame({'global_customer_id': np.asarray(self.customers)[self.customer_codes],
+                                   'platform_id': np.asarray(self.platforms)[self.platform_codes]})
+
+        order = np.lexsort((seconds, pair_codes))
+        self.origin = int(seconds.min()) if len(seconds) else 0
+        self.span = int(seconds.max()) - self.origin + 2 if len(seconds) else 2
+        self.times = seconds[order]
+        self.keys = pair_codes[order].astype(np.int64) * self.span + (self.times - self.origin)
+
+        value = transactions['total_value'].to_numpy(float)
+        discount = pd.to_numeric(transactions['discount_value'], errors='coerce').to_numpy(float)
+        items = pd.to_numeric(transactions['items_count'], errors='coerce').to_numpy(float)
+        has_rate = ~np.isnan(value) & ~np.isnan(discount) & (value != 0)
+        # NULL items_count is left out of the average, like SQL AVG(items_count)
+        columns = {
+            'count': np.ones(len(transactions)),
+            'value': np.nan_to_num(value),
+            'items': np.nan_to_num(items),
+            'has_items': (~np.isnan(items)).astype(float),
+            'discount_rate': np.divide(discount, value, out=np.zeros(len(value)), where=has_rate),
+            'has_rate': has_rate.astype(float),
+            'repeat': (pd.to_numeric(transactions['is_repeat'], errors='coerce') == 1).to_numpy(float),
+            'weekend': when.dt.dayofweek.isin([5, 6]).to_numpy(float),
+        }
+        self.totals = {name: np.concatenate([[0.0], np.cumsum(column[order])])
+                       for name, column in columns.items()}
+
+    @classmethod
+    def load(cls, conn) -> 'TransactionHistory':
+        return cls(pd.read_sql_query(TRANSACTIONS_SQL, conn))
+
+    @property
+    def first_day(self) -> date:
+        return pd.Timestamp(self.origin, unit='s').date()
+
+    @property
+    def last_day(self) -> date:
+        return pd.Timestamp(self.origin + self.span - 2, unit='s').date()
+
+    def position(self, pair_codes: np.ndarray, seconds) -> np.ndarray:
+        """Index into the sorted transactions of each pair's first transaction at or after `seconds`"""
+        offsets = np.clip(np.asarray(seconds, dtype=np.int64) - self.origin, 0, self.span - 1)
+        return np.searchsorted(self.keys, pair_codes * self.span + offsets, side='left')
+
+    def window(self, column: str, start: np.ndarray, end: np.ndarray) -> np.ndarray:
+        """Sum of `column` between two arrays of positions"""
+        return self.totals[column][end] - self.totals[column][start]
+
+
+def reference_dates(history: TransactionHistory, lookback_days: int = 90, label_window_days: int = 7,
+                    step_days: int = 7) -> List[date]:
+    """Every step_days from the first date with a full lookback to the last with a full label window"""
+    if not len(history.times):
+        return []
+    first = history.first_day + timedelta(days=lookback_days)
+    last = history.last_day + timedelta(days=1) - timedelta(days=label_window_days)
+    return [first + timedelta(days=n) for n in range(0, (last - first).days + 1, step_days)]
+
+
+def snapshot(history: TransactionHistory, reference_date: date, lookback_days: int = 90,
+             label_window_days: int = 7) -> pd.DataFrame:
+    """Features and label of every pair with a transaction in the lookback window before reference_date"""
+    midnight = int(pd.Timestamp(reference_date).timestamp())
+    all_pairs = np.arange(len(history.pairs), dtype=np.int64)
+
+    def starts(pairs, days):
+        return history.position(pairs, midnight - days * DAY)
+
+    now = history.position(all_pairs, midnight)
+    active = np.flatnonzero(now > starts(all_pairs, lookback_days))
+    now = now[active]
+    since_7, since_30, since_90 = (starts(active, days) for days in (7, 30, 90))
+    label_end = history.position(active, midnight + label_window_days * DAY)
+
+    frequency_30d = history.window('count', since_30, now)
+    frequency_90d = history.window('count', since_90, now)
+    monetary_30d = history.window('value', since_30, now)
+
+    def per_transaction(column, counts):
+        return np.divide(column, counts, out=np.full(len(counts), np.nan), where=counts > 0)
+
+    # Cross-platform: the customer's lifetime counts on every platform as of the reference date
+    customers = history.customer_codes[active]
+    platform_pairs = history.pair_table[customers]
+    known = platform_pairs >= 0
+    lifetime = np.zeros(platform_pairs.shape)
+    recent = np.zeros(platform_pairs.shape)
+    pair_now = history.position(platform_pairs[known], midnight)
+    lifetime[known] = pair_now - history.position(platform_pairs[known], history.origin)
+    recent[known] = pair_now - history.position(platform_pairs[known], midnight - 30 * DAY)
+
+    return pd.DataFrame({
+        'global_customer_id': history.pairs['global_customer_id'].to_numpy()[active],
+        'platform_id': history.pairs['platform_id'].to_numpy()[active],
+        'reference_date': reference_date,
+        'recency_days': (midnight - history.times[now - 1]) / DAY,
+        'frequency_7d': history.window('count', since_7, now).astype(np.int64),
+        'frequency_30d': frequency_30d.astype(np.int64),
+        'frequency_90d': frequency_90d.astype(np.int64),
+        'monetary_30d': monetary_30d,
+        'monetary_90d': history.window('value', since_90, now),
+        'aov_30d': per_transaction(monetary_30d, frequency_30d),
+        'platforms_used_count': (lifetime > 0).sum(axis=1),
+        'platform_diversity_score': platform_entropy(lifetime),
+        'cross_platform_purchase_count_30d': recent.sum(axis=1).astype(np.int64),
+        'avg_items_per_transaction': per_transaction(history.window('items', since_90, now),
+                                                     history.window('has_items', since_90, now)),
+        'avg_discount_rate': per_transaction(history.window('discount_rate', since_90, now),
+                                             history.window('has_rate', since_90, now)),
+        'repeat_rate': per_transaction(history.window('repeat', since_90, now), frequency_90d),
+        'weekend_shopping_ratio': per_transaction(history.window('weekend', since_90, now), frequency_90d),
+        'label': (label_end > now).astype(int),
+    })
+
+
+# Set in each pool worker by _init_worker, so the history is pickled once per worker, not per date
+_worker_history = None
+
+
+def _init_worker(history: TransactionHistory):
+    global _worker_history
+    _worker_history = history
+
+
+def _snapshot_in_worker(reference_date, lookback_days, label_window_days) -> pd.DataFrame:
+    return snapshot(_worker_history, reference_date, lookback_days, label_window_days)
+
+
+def build_training_set(conn, dates: Sequence[date] = None, lookback_days: int = 90,
+                       label_window_days: int = 7, step_days: int = 7, workers: int = 1) -> pd.DataFrame:
+    """
+    Point-in-time snapshots for every reference date, one row per active
+    (customer, platform, reference_date). Dates default to reference_dates();
+    with workers > 1 the dates are split across a process pool.
+    """
+    history = TransactionHistory.load(conn)
+    if dates is None:
+        dates = reference_dates(history, lookback_days, label_window_days, step_days)
+    if not dates:
+        return pd.DataFrame(columns=KEYS + ['reference_date'] + FEATURE_COLUMNS + ['label'])
+
+    if workers <= 1:
+        frames = [snapshot(history, day, lookback_days, label_window_days) for day in dates]
+    else:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(history,)) as pool:
+            frames = list(pool.map(_snapshot_in_worker, dates, [lookback_days] * len(dates),
+                                   [label_window_days] * len(dates)))
+    return pd.concat(frames, ignore_index=True)
@@ -12,7 +12,7 @@ import pickle
 
 # ML Libraries
 from sklearn.model_selection import train_test_split, cross_val_score, StratifiedKFold
-from sklearn.preprocessing import LabelEncoder, StandardScaler
+from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import (
     roc_auc_score, precision_recall_curve, average_precision_score,
     confusion_matrix, classification_report, roc_curve
@@ -22,12 +22,69 @@ import lightgbm as lgb
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+from batch_scoring import DEFAULT_CHUNK_SIZE, score_query
+from categorical_encoder import CategoricalEncoder
+
 # Configuration
 DB_PATH = 'patternos_dw.db'
 MODEL_PATH = 'intent_model_v1.pkl'
 FEATURE_IMPORTANCE_PATH = 'feature_importance.png'
 ROC_CURVE_PATH = 'roc_curve.png'
 
+# Feature query: Get all features for each customer-platform pair
+FEATURE_QUERY = """
+WITH customer_features AS (
+    SELECT 
+        c.global_customer_id,
+        'ZEPTO' as platform_id,  -- Will do for each platform
+        
+        -- Customer Demographics
+        c.primary_age_group,
+        c.primary_city,
+        c.primary_state,
+        c.total_platforms_used,
+        
+        -- RFM Features
+        rfm.recency_days,
+        rfm.frequency_7d,
+        rfm.frequency_30d,
+        rfm.frequency_90d,
+        rfm.monetary_30d,
+        rfm.monetary_90d,
+        rfm.aov_30d,
+        
+        -- Purchase Patterns
+        CASE WHEN rfm.frequency_30d > 0 THEN 1 ELSE 0 END as active_last_30d,
+        CASE WHEN rfm.frequency_7d > 0 THEN 1 ELSE 0 END as active_last_7d,
+        
+        -- Cross-Platform Features
+        cp.platforms_used_count,
+        cp.platform_diversity_score,
+        
+        -- Behavioral Features (if available)
+        b.cart_abandonment_rate,
+        b.search_to_purchase_ratio,
+        b.preferred_shopping_hour,
+        b.weekend_shopping_ratio,
+        
+        -- Time features
+        CAST(strftime('%w', 'now') AS INTEGER) as day_of_week,
+        CAST(strftime('%H', 'now') AS INTEGER) as hour_of_day,
+        CAST(strftime('%m', 'now') AS INTEGER) as month
+        
+    FROM dim_customer c
+    LEFT JOIN feat_customer_rfm rfm 
+        ON c.global_customer_id = rfm.global_customer_id
+        AND rfm.platform_id = 'ZEPTO'
+    LEFT JOIN feat_cross_platform cp 
+        ON c.global_customer_id = cp.global_customer_id
+    LEFT JOIN feat_customer_behavior b 
+        ON c.global_customer_id = b.global_customer_id
+        AND b.platform_id = 'ZEPTO'
+)
+SELECT * FROM customer_features;
+"""
+
 class IntentPredictionModel:
     """
     Intent prediction model that forecasts likelihood of purchase
@@ -56,61 +113,7 @@ class IntentPredictionModel:
         
         conn = sqlite3.connect(self.db_path)
         
-        # Feature query: Get all features for each customer-platform pair
-        feature_query = """
-        WITH customer_features AS (
-            SELECT 
-                c.global_customer_id,
-                'ZEPTO' as platform_id,  -- Will do for each platform
-                
-                -- Customer Demographics
-                c.primary_age_group,
-                c.primary_city,
-                c.primary_state,
-                c.total_platforms_used,
-                
-                -- RFM Features
-                rfm.recency_days,
-                rfm.frequency_7d,
-                rfm.frequency_30d,
-                rfm.frequency_90d,
-                rfm.monetary_30d,
-                rfm.monetary_90d,
-                rfm.aov_30d,
-                
-                -- Purchase Patterns
-                CASE WHEN rfm.frequency_30d > 0 THEN 1 ELSE 0 END as active_last_30d,
-                CASE WHEN rfm.frequency_7d > 0 THEN 1 ELSE 0 END as active_last_7d,
-                
-                -- Cross-Platform Features
-                cp.platforms_used_count,
-                cp.platform_diversity_score,
-                
-                -- Behavioral Features (if available)
-                b.cart_abandonment_rate,
-                b.search_to_purchase_ratio,
-                b.preferred_shopping_hour,
-                b.weekend_shopping_ratio,
-                
-                -- Time features
-                CAST(strftime('%w', 'now') AS INTEGER) as day_of_week,
-                CAST(strftime('%H', 'now') AS INTEGER) as hour_of_day,
-                CAST(strftime('%m', 'now') AS INTEGER) as month
-                
-            FROM dim_customer c
-            LEFT JOIN feat_customer_rfm rfm 
-                ON c.global_customer_id = rfm.global_customer_id
-                AND rfm.platform_id = 'ZEPTO'
-            LEFT JOIN feat_cross_platform cp 
-                ON c.global_customer_id = cp.global_customer_id
-            LEFT JOIN feat_customer_behavior b 
-                ON c.global_customer_id = b.global_customer_id
-                AND b.platform_id = 'ZEPTO'
-        )
-        SELECT * FROM customer_features;
-        """
-        
-        df_features = pd.read_sql_query(feature_query, conn)
+        df_features = pd.read_sql_query(FEATURE_QUERY, conn)
         print(f"   Loaded {len(df_features)} customer-platform records")
         
         # Label query: Did customer purchase within next 7 days?
@@ -150,11 +153,12 @@ class IntentPredictionModel:
         conn.close()
         return df_balanced
     
-    def preprocess_features(self, df):
+    def preprocess_features(self, df, verbose=True):
         """
         Preprocess features: encoding, scaling, handling nulls
         """
-        print("\n🔧 Preprocessing features...")
+        if verbose:
+            print("\n🔧 Preprocessing features...")
         
         df = df.copy()
         
@@ -166,15 +170,13 @@ class IntentPredictionModel:
         for col in categorical_cols:
             df[col] = df[col].fillna('Unknown')
         
-        # Encode categorical variables
+        # Encode categorical variables (unseen labels get the 'Unknown' code, or -1)
         for col in categorical_cols:
             if col not in self.label_encoders:
-                self.label_encoders[col] = LabelEncoder()
-                df[col] = self.label_encoders[col].fit_transform(df[col].astype(str))
+                self.label_encoders[col] = CategoricalEncoder()
+                df[col] = self.label_encoders[col].fit_transform(df[col])
             else:
-                # Handle unseen labels
-                df[col] = df[col].apply(lambda x: x if x in self.label_encoders[col].classes_ else 'Unknown')
-                df[col] = self.label_encoders[col].transform(df[col].astype(str))
+                df[col] = self.label_encoders[col].transform(df[col])
         
         # Feature engineering: Derived features
         df['recency_x_frequency'] = df['recency_days'] * df['frequency_90d']
@@ -182,7 +184,8 @@ class IntentPredictionModel:
         df['is_weekend'] = df['day_of_week'].isin([0, 6]).astype(int)
         df['is_evening'] = df['hour_of_day'].between(18, 22).astype(int)
         
-        print(f"   Preprocessed {len(df)} rows with {len(df.columns)} features")
+        if verbose:
+            print(f"   Preprocessed {len(df)} rows with {len(df.columns)} features")
         
         return df
     
@@ -356,12 +359,28 @@ class IntentPredictionModel:
         
         self.model = model_package['model']
         self.scaler = model_package['scaler']
-        self.label_encoders = model_package['label_encoders']
+        # Packages saved before CategoricalEncoder hold sklearn LabelEncoders
+        self.label_encoders = {
+            col: encoder if isinstance(encoder, CategoricalEncoder) else CategoricalEncoder.from_label_encoder(encoder)
+            for col, encoder in model_package['label_encoders'].items()
+        }
         self.feature_names = model_package['feature_names']
         self.model_version = model_package['model_version']
         
         print(f"   Model loaded (version {self.model_version})")
     
+    def score_features(self, customer_df):
+        """
+        Purchase probability for each row of raw feature columns, using the
+        fitted encoders (and the scaler, when it has been fitted)
+        """
+        df = self.preprocess_features(customer_df, verbose=False)
+        X = df[self.feature_names]
+        if hasattr(self.scaler, 'mean_'):
+            X = self.scaler.transform(X)
+        
+        return self.model.predict_proba(X)[:, 1]
+    
     def predict_intent_scores(self, customer_df):
         """
         Predict intent scores for new customers
@@ -372,46 +391,49 @@ class IntentPredictionModel:
         Returns:
         - DataFrame with intent scores
         """
-        df = self.preprocess_features(customer_df)
-        X = df[self.feature_names]
-        
-        intent_scores = self.model.predict_proba(X)[:, 1]
+        intent_scores = self.score_features(customer_df)
         
+        df = customer_df[['global_customer_id', 'platform_id']].copy()
         df['intent_score'] = intent_scores
         df['intent_level'] = pd.cut(intent_scores, 
                                      bins=[0, 0.4, 0.7, 1.0], 
                                      labels=['low', 'medium', 'high'])
         
-        return df[['global_customer_id', 'platform_id', 'intent_score', 'intent_level']]
+        return df
     
-    def batch_score_customers(self, output_table='intent_score_predictions'):
+    def batch_score_customers(self, output_table='intent_score_predictions',
+                              chunk_size=DEFAULT_CHUNK_SIZE, workers=1):
         """
         Score all customers in database and save to new table
+        
+        Parameters:
+        - chunk_size: Feature rows read, scored and inserted at a time
+        - workers: Processes scoring chunks in parallel (1 scores in this process)
         """
         print(f"\n🎯 Batch scoring all customers...")
         
         conn = sqlite3.connect(self.db_path)
         
-        # Load all customers
-        df_customers = self.create_training_dataset(lookback_days=90, label_window_days=0)
-        df_customers = df_customers.drop('purchased_within_window', axis=1)
-        
-        # Predict
-        predictions = self.predict_intent_scores(df_customers)
-        predictions['scoring_timestamp'] = datetime.now()
-        predictions['model_version'] = self.model_version
-        
-        # Save to database
-        predictions.to_sql(output_table, conn, if_exists='replace', index=False)
+        # Stream every customer's features through the model; nothing is sampled
+        scored = score_query(conn, FEATURE_QUERY, self.score_features, output_table,
+                             model_version=self.model_version, chunk_size=chunk_size, workers=workers)
         
-        print(f"   Scored {len(predictions)} customers")
+        print(f"   Scored {scored} customers")
         print(f"   Saved to table: {output_table}")
         
         # Summary
         print(f"\n📊 Score Distribution:")
-        print(predictions['intent_level'].value_counts())
-        print(f"\n   Average Score: {predictions['intent_score'].mean():.4f}")
-        print(f"   Median Score: {predictions['intent_score'].median():.4f}")
+        distribution = pd.read_sql_query(
+            f"SELECT intent_level, COUNT(*) AS count FROM {output_table} "
+            f"GROUP BY intent_level ORDER BY count DESC", conn)
+        print(distribution.to_string(index=False))
+        if scored:
+            average, = conn.execute(f"SELECT AVG(intent_score) FROM {output_table}").fetchone()
+            median, = conn.execute(
+                f"SELECT AVG(intent_score) FROM (SELECT intent_score FROM {output_table} "
+                f"ORDER BY intent_score LIMIT 2 - ? % 2 OFFSET (? - 1) / 2)", (scored, scored)).fetchone()
+            print(f"\n   Average Score: {average:.4f}")
+            print(f"   Median Score: {median:.4f}")
         
         conn.close()
 
@@ -0,0 +1,88 @@
+# scripts/benchmark_rtb_auction.py
+"""
+Benchmark per-slot vs multi-slot RTB auctions.
+
+For each size, builds that many eligible synthetic campaigns and times a
+4-slot ad request two ways: calculate_bid() + second_price_auction() per
+slot (the old path), and one run_multi_slot_auction() call. Winners and
+prices of the two paths are compared on every request.
+
+    python scripts/benchmark_rtb_auction.py --campaigns 1000 10000 100000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from rtb_engine import RTBEngine
+
+SLOTS = [{"type": "hero_banner"}, {"type": "sidebar"}, {"type": "sidebar"}, {"type": "footer"}]
+
+
+def make_campaigns(n: int, seed: int = 42):
+    rng = random.Random(seed)
+    return [{
+        "id": f"CAMP_{i:06d}",
+        "name": f"Campaign {i}",
+        "brand": "Brand",
+        "max_cpm": rng.randint(50, 300),
+        "budget": 1_000_000,
+        "spent": rng.randint(0, 999_900),
+        "creative": {},
+        "click_url": "https://zepto.com/p",
+    } for i in range(n)]
+
+
+def per_slot_auction(engine, campaigns, user_intent):
+    winners = []
+    for slot in SLOTS:
+        bids = [b for b in (engine.calculate_bid(c, slot, user_intent) for c in campaigns) if b]
+        winners.append(engine.second_price_auction(bids) if bids else None)
+    return winners
+
+
+def key(winners):
+    return [(w["campaign_id"], w["bid_amount"], w["actual_price"]) if w else None for w in winners]
+
+
+def timed(fn, min_seconds: float = 1.0):
+    runs, start = 0, time.perf_counter()
+    while True:
+        result = fn()
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return runs / elapsed, result
+
+
+def run(n: int):
+    engine = RTBEngine(campaign_db_path="")
+    campaigns = make_campaigns(n)
+    user_intent = {"intent_score": 85}
+
+    old_rate, old_winners = timed(lambda: per_slot_auction(engine, campaigns, user_intent))
+    new_rate, new_winners = timed(
+        lambda: asyncio.run(engine.run_multi_slot_auction(SLOTS, campaigns, user_intent))
+    )
+
+    print(f"\n{n:,} eligible campaigns, {len(SLOTS)} slots per request")
+    print(f"  per-slot:   {old_rate:>10,.1f} requests/s")
+    print(f"  multi-slot: {new_rate:>10,.1f} requests/s")
+    print(f"  speedup:    {new_rate / old_rate:>10,.1f}x")
+    print(f"  winners match: {key(old_winners) == key(new_winners)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--campaigns", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    args = parser.parse_args()
+    for n in args.campaigns:
+        run(n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# scripts/benchmark_scoring.py
+"""
+Benchmark per-customer vs batch scoring in IntentScoringEngine.
+
+Builds a synthetic intent_intelligence database per size, times
+calculate_unified_score() + save_score() over a sample of customers
+(extrapolated to the full base) and score_all() over everyone, and checks
+that score_batch() reproduces the per-customer scores for the sample.
+
+    python scripts/benchmark_scoring.py --customers 100000 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.scoring_engine import IntentScoringEngine
+
+SCHEMA = """
+CREATE TABLE intent_scores (
+    id INTEGER PRIMARY KEY, user_id TEXT, category TEXT, intent_score REAL, intent_level TEXT,
+    page_views INTEGER, cart_additions INTEGER, search_queries INTEGER, time_spent REAL
+);
+CREATE INDEX ix_intent_scores_user_id ON intent_scores (user_id);
+CREATE TABLE user_events (id INTEGER PRIMARY KEY, user_id TEXT, event_type TEXT, category TEXT);
+CREATE INDEX ix_user_events_user_id ON user_events (user_id);
+CREATE TABLE visual_intelligence (
+    id INTEGER PRIMARY KEY, customer_id TEXT, sku_id TEXT, brand_detected TEXT,
+    confidence_score REAL, scene_type TEXT
+);
+CREATE INDEX ix_visual_customer_id ON visual_intelligence (customer_id);
+CREATE TABLE voice_intelligence (
+    id INTEGER PRIMARY KEY, customer_id TEXT, language_code TEXT, intent_label TEXT, emotion_label TEXT
+);
+CREATE INDEX ix_voice_customer_id ON voice_intelligence (customer_id);
+CREATE TABLE unified_intent_scores (
+    customer_id TEXT PRIMARY KEY, behavioral_score REAL, visual_score REAL, voice_score REAL,
+    predictive_ai_score REAL, behavioral_weighted REAL, visual_weighted REAL, voice_weighted REAL,
+    predictive_weighted REAL, final_intent_score REAL, intent_level TEXT, confidence_level REAL,
+    last_updated TEXT, data_completeness REAL, recommended_action TEXT, suggested_category TEXT
+);
+"""
+
+BRANDS = ["Amul", "Nestle", "boAt", "Nike", "Dove", "Mamaearth"]
+SCENES = ["Customer Basket", "Shelf", "Home", "Outdoor"]
+LANGS = ["en-IN", "hi-IN", "ta-IN"]
+INTENTS = ["Order Groceries", "Buy Now", "Browse", "Compare Prices"]
+
+
+def build_db(path: str, customers: int, seed: int = 42):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+
+    def ids():
+        return (f"CUST_{i:07d}" for i in range(customers))
+
+    conn.executemany(
+        "INSERT INTO intent_scores (user_id, category, page_views, cart_additions, search_queries, time_spent) "
+        "VALUES (?, 'groceries', ?, ?, ?, ?)",
+        ((c, rng.randint(0, 30), rng.randint(0, 5), rng.randint(0, 10), rng.randint(0, 3000))
+         for c in ids() if rng.random() < 0.9),
+    )
+    conn.executemany(
+        "INSERT INTO user_events (user_id, event_type) VALUES (?, ?)",
+        ((c, rng.choice(["product_view", "search", "cart_add"]))
+         for c in ids() for _ in range(rng.randint(0, 3))),
+    )
+    conn.executemany(
+        "INSERT INTO visual_intelligence (customer_id, brand_detected, confidence_score, scene_type) VALUES (?, ?, ?, ?)",
+        ((c, rng.choice(BRANDS), rng.random(), rng.choice(SCENES))
+         for c in ids() if rng.random() < 0.4 for _ in range(rng.randint(1, 3))),
+    )
+    conn.executemany(
+        "INSERT INTO voice_intelligence (customer_id, language_code, intent_label) VALUES (?, ?, ?)",
+        ((c, rng.choice(LANGS), rng.choice(INTENTS))
+         for c in ids() if rng.random() < 0.2 for _ in range(rng.randint(1, 2))),
+    )
+    conn.commit()
+    conn.close()
+
+
+def strip_timestamp(score):
+    return {k: v for k, v in score.items() if k != "last_updated"}
+
+
+def run(customers: int, sample: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "intent_intelligence.db")
+        t0 = time.perf_counter()
+        build_db(db_path, customers)
+        print(f"\n{customers:,} customers (built in {time.perf_counter() - t0:.1f}s)")
+
+        engine = IntentScoringEngine(db_path)
+        sample_ids = [f"CUST_{i:07d}" for i in random.Random(7).sample(range(customers), min(sample, customers))]
+
+        t0 = time.perf_counter()
+        single = []
+        for customer_id in sample_ids:
+            score = engine.calculate_unified_score(customer_id)
+            engine.save_score(score)
+            single.append(score)
+        per_customer_rate = len(sample_ids) / (time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        batch = engine.score_all()
+        batch_elapsed = time.perf_counter() - t0
+        batch_rate = len(batch) / batch_elapsed
+
+        batch_sample = engine.score_batch(sample_ids, save=False)
+        mismatches = sum(repr(strip_timestamp(a)) != repr(strip_timestamp(b)) for a, b in zip(single, batch_sample))
+
+        print(f"  per-customer: {per_customer_rate:>12,.0f} customers/s "
+              f"(~{customers / per_customer_rate:,.0f}s for the full base)")
+        print(f"  score_all:    {batch_rate:>12,.0f} customers/s ({batch_elapsed:.1f}s for {len(batch):,})")
+        print(f"  speedup:      {batch_rate / per_customer_rate:>12,.1f}x")
+        print(f"  mismatches:   {mismatches} of {len(single)} sampled customers")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--sample", type=int, default=2000, help="customers scored one at a time")
+    args = parser.parse_args()
+    for customers in args.customers:
+        run(customers, args.sample)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+# scripts/build_analytics_rollups.py
+"""
+Rebuild the daily analytics rollup cube behind the last_N_days analytics
+endpoints and install the ad_spend_daily triggers that keep it current.
+Run once after each full reload of ad_spend_daily.
+
+    python scripts/build_analytics_rollups.py [--db patternos_campaign_data.db]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.analytics_rollup import build_analytics_rollups
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="patternos_campaign_data.db")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    start = time.perf_counter()
+    rows = build_analytics_rollups(conn)
+    conn.close()
+    print(f"Built {rows:,} rollup rows in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+# scripts/build_attribution_summaries.py
+"""
+Rebuild the attribution summary tables behind /api/v1/attribution/*
+(path-analysis, top-paths, model-comparison, channel-overlap,
+assisted-conversions) from ad_attribution.
+
+    python scripts/build_attribution_summaries.py [--db patternos_campaign_data.db]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.attribution_batch import build_attribution_summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="patternos_campaign_data.db")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    start = time.perf_counter()
+    touchpoints = build_attribution_summaries(conn)
+    conn.close()
+    print(f"Summarised {touchpoints:,} touchpoints in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+# scripts/rescore_intent.py
+"""
+Nightly unified intent rescoring.
+
+By default only customers with new intent_scores / user_events /
+visual_intelligence / voice_intelligence rows since the last run are
+rescored; --full rescores the whole customer base.
+
+    python scripts/rescore_intent.py [--db intent_intelligence.db] [--full]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.scoring_engine import IntentScoringEngine
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="intent_intelligence.db")
+    parser.add_argument("--full", action="store_true", help="rescore every customer")
+    args = parser.parse_args()
+
+    engine = IntentScoringEngine(args.db)
+    start = time.perf_counter()
+    scores = engine.score_all() if args.full else engine.rescore_changed()
+    print(f"Rescored {len(scores):,} customers in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,7 @@ setup(
         "PyJWT",
         "python-jose",
         "psycopg2-binary",
+        "numpy",
         "pandas",
         "pyarrow",
         "pytest",
@@ -0,0 +1,127 @@
+"""
+Analytics rollup cube: endpoints must return the same totals as the live ad_spend_daily queries
+"""
+import random
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+from app import main
+from app.analytics_rollup import build_analytics_rollups, rollups_ready
+from app.response_cache import bump_data_version
+
+BRANDS = ["Amul", "Nike", "Dove"]
+CHANNELS = ["zepto", "facebook", "google"]
+CATEGORIES = ["grocery", "beauty"]
+INTENTS = ["High", "Medium", "Low"]
+
+SCHEMA = """
+    CREATE TABLE ad_spend_daily (spend_id TEXT PRIMARY KEY, date TEXT, campaign_id TEXT, brand TEXT,
+                                 category TEXT, channel TEXT, sku_id TEXT, impressions INTEGER,
+                                 clicks INTEGER, conversions INTEGER, spend_value REAL, intent_level TEXT);
+    CREATE TABLE sku_library (sku_id TEXT PRIMARY KEY, sku_name TEXT, brand TEXT, category_level_1 TEXT,
+                              selling_price REAL);
+    CREATE TABLE campaigns_master (campaign_id TEXT PRIMARY KEY, brand TEXT, category TEXT,
+                                   intent_level TEXT, channel TEXT, start_date TEXT, end_date TEXT,
+                                   spend_value REAL);
+    CREATE TABLE ad_attribution (order_id TEXT, campaign_id TEXT, attributed_spend REAL,
+                                 attribution_method TEXT);
+"""
+
+
+def spend_row(rng, i):
+    day = date(2025, 1, 1) + timedelta(days=rng.randint(0, 200))
+    clicks = rng.randint(0, 50)
+    return (f"S{i}", day.isoformat(), f"C{rng.randint(0, 5)}", rng.choice(BRANDS), rng.choice(CATEGORIES),
+            rng.choice(CHANNELS), f"SKU{rng.randint(0, 9)}", rng.randint(clicks, 500), clicks,
+            rng.randint(0, clicks), round(rng.uniform(10, 900), 2), rng.choice(INTENTS))
+
+
+def make_db(path):
+    conn = sqlite3.connect(str(path))
+    conn.executescript(SCHEMA)
+    rng = random.Random(11)
+    conn.executemany("INSERT INTO ad_spend_daily VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                     [spend_row(rng, i) for i in range(600)])
+    # SKU9 has no library entry and falls back to the default price
+    conn.executemany("INSERT INTO sku_library VALUES (?, ?, ?, ?, ?)",
+                     [(f"SKU{i}", f"Item {i}", BRANDS[i % 3], "grocery", 100 + 25 * i) for i in range(9)])
+    conn.commit()
+    return conn
+
+
+@pytest.fixture
+def dbs(tmp_path):
+    live, cube = make_db(tmp_path / "live.db"), make_db(tmp_path / "cube.db")
+    build_analytics_rollups(cube)
+    yield live, cube
+    live.close()
+    cube.close()
+
+
+def responses(conn):
+    results = {
+        "revenue": main.platform_revenue("quarterly", conn),
+        "master_brands": main.brand_performance("monthly", conn),
+        "monthly": main.analytics_monthly_trends(conn),
+        "brand_monthly": main.brand_monthly_trends("Nike", conn),
+    }
+    for date_range in ("last_7_days", "last_90_days"):
+        results[date_range] = {
+            "summary": main.analytics_platform_summary(date_range, conn),
+            "channels": main.analytics_channel_performance(date_range, conn),
+            "brands": main.analytics_brand_comparison(date_range, conn),
+            "categories": main.analytics_category_comparison(date_range, conn),
+            "brand_summary": main.brand_analytics_summary("Dove", date_range, conn),
+            "brand_channels": main.brand_channel_performance("Dove", date_range, conn),
+        }
+    return results
+
+
+def assert_same(a, b):
+    if isinstance(a, dict):
+        assert sorted(a) == sorted(b)
+        for key in a:
+            assert_same(a[key], b[key])
+    elif isinstance(a, list):
+        assert len(a) == len(b)
+        key = lambda row: sorted(row.items()) if isinstance(row, dict) else row  # noqa: E731
+        for x, y in zip(sorted(a, key=lambda r: str(key(r))), sorted(b, key=lambda r: str(key(r)))):
+            assert_same(x, y)
+    elif isinstance(a, float) or isinstance(b, float):
+        assert a == pytest.approx(b, abs=0.011)
+    else:
+        assert a == b
+
+
+class TestAnalyticsRollups:
+
+    def test_cube_matches_live_queries(self, dbs):
+        live, cube = dbs
+        assert not rollups_ready(live) and rollups_ready(cube)
+        assert_same(responses(cube), responses(live))
+
+    def test_triggers_apply_new_rows(self, dbs):
+        live, cube = dbs
+        rng = random.Random(12)
+        new_rows = [spend_row(rng, i) for i in range(600, 700)]
+        for conn in (live, cube):
+            with conn:
+                conn.executemany("INSERT INTO ad_spend_daily VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", new_rows)
+                conn.execute("UPDATE ad_spend_daily SET spend_value = spend_value * 2, brand = 'Nike' "
+                             "WHERE spend_id IN ('S3', 'S640')")
+                conn.execute("DELETE FROM ad_spend_daily WHERE spend_id IN ('S5', 'S650')")
+                bump_data_version(conn)
+        assert rollups_ready(cube)
+        assert_same(responses(cube), responses(live))
+
+    def test_reloaded_table_falls_back_to_live(self, dbs):
+        _, cube = dbs
+        rows = cube.execute("SELECT * FROM ad_spend_daily").fetchall()
+        cube.execute("DROP TABLE ad_spend_daily")
+        cube.executescript(SCHEMA.split(";")[0] + ";")
+        with cube:
+            cube.executemany("INSERT INTO ad_spend_daily VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        assert not rollups_ready(cube)
+        build_analytics_rollups(cube)
+        assert rollups_ready(cube)
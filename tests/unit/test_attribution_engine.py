@@ -0,0 +1,103 @@
+"""
+Attribution engine: time-indexed journeys and bulk ingestion
+"""
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "backend"))
+
+from attribution_engine import DAY_SECONDS, AttributionEngine  # noqa: E402
+
+T0 = 1_760_000_000.0
+
+
+def touch(user_id, campaign_id, days):
+    return {"user_id": user_id, "campaign_id": campaign_id, "type": "click", "timestamp": T0 + days * DAY_SECONDS}
+
+
+class TestJourneys:
+
+    def test_bulk_ingest_and_lookback_window(self):
+        """Out-of-order backfills are sorted; lookback is a slice of the journey"""
+        engine = AttributionEngine()
+        engine.track_touchpoints([touch("u1", "C3", 20), touch("u1", "C1", 0), touch("u1", "C2", 10)])
+        [result] = engine.track_conversions([{"user_id": "u1", "revenue": 300, "timestamp": T0 + 25 * DAY_SECONDS,
+                                              "attribution_model": "linear"}])
+        assert [a["campaign_id"] for a in result["attribution"]["attributed_campaigns"]] == ["C1", "C2", "C3"]
+
+        conversion = engine.conversions[0]
+        assert [tp["campaign_id"] for tp in engine.lookback_touchpoints("u1", conversion, 7)] == ["C3"]
+        assert engine.attribute_conversion("u1", conversion, "first_click", lookback_days=16)[
+            "attributed_campaigns"][0]["campaign_id"] == "C2"
+
+    def test_expired_touchpoints_are_evicted(self):
+        """Touchpoints past the longest lookback are dropped; captured conversions keep theirs"""
+        engine = AttributionEngine(max_lookback_days=30)
+        engine.track_touchpoints([touch("old", "C1", 0), touch("u1", "C1", 0)])
+        engine.track_conversions([{"user_id": "u1", "revenue": 100, "timestamp": T0 + DAY_SECONDS}])
+
+        engine.track_touchpoints([touch("u1", "C2", 40), touch("new", "C2", 45)])
+        assert list(engine.journeys) == ["u1", "new"]
+        assert [tp["campaign_id"] for tp in engine.journeys["u1"].touchpoints] == ["C2"]
+
+        # The earlier conversion still attributes to the evicted C1 touchpoint
+        assert engine.calculate_roas("C1")["revenue"] == 100
+
+
+class TestRoasAccumulators:
+
+    def test_single_pass_matches_per_campaign_attribution(self):
+        """Accumulated ROAS equals re-attributing every conversion per campaign and model"""
+        engine = AttributionEngine()
+        campaigns = ["CAMP_001", "CAMP_002", "CAMP_003"]
+        for u in range(20):
+            engine.track_touchpoints([touch(f"u{u}", campaigns[(u + i) % 3], i * 3 + u % 5) for i in range(u % 6)])
+            engine.track_conversions([{"user_id": f"u{u}", "revenue": 100 + u, "timestamp": T0 + 20 * DAY_SECONDS}])
+
+        for model in engine.models:
+            for campaign_id in campaigns:
+                revenue = conversions = 0
+                for conversion in engine.conversions:
+                    for attr in engine.attribute_conversion(conversion["user_id"], conversion, model)[
+                            "attributed_campaigns"]:
+                        if attr["campaign_id"] == campaign_id:
+                            revenue += attr["revenue"]
+                            conversions += 1
+                roas = engine.calculate_roas(campaign_id, model)
+                assert (roas["revenue"], roas["conversions"]) == (round(revenue, 2), conversions)
+
+        # New conversions are folded in on the next call
+        engine.track_touchpoints([touch("u99", "CAMP_001", 21)])
+        engine.track_conversions([{"user_id": "u99", "revenue": 50, "timestamp": T0 + 22 * DAY_SECONDS}])
+        assert engine.calculate_roas("CAMP_001", "last_click")["conversions"] == conversions_for(engine, "CAMP_001")
+
+    def test_conversions_are_capped_without_losing_roas(self):
+        """Old conversions and captured journeys are dropped once folded into the totals"""
+        engine = AttributionEngine(max_conversions=40)
+        for u in range(100):
+            engine.track_touchpoints([touch(f"u{u}", "CAMP_001", u * 0.1)])
+            engine.track_conversions([{"user_id": f"u{u}", "revenue": 10, "timestamp": T0 + (u * 0.1 + 1) * DAY_SECONDS}])
+
+        assert len(engine.conversions) <= 40
+        assert set(engine.conversion_journeys) == {c["conversion_id"] for c in engine.conversions}
+        assert engine.calculate_roas("CAMP_001")["conversions"] == 100
+        assert engine.calculate_roas("CAMP_001")["revenue"] == 1000
+
+    def test_time_decay_uses_journey_times(self):
+        """Weights from the stored epoch times match parsing each touchpoint's timestamp"""
+        engine = AttributionEngine()
+        engine.track_touchpoints([touch("u1", "C1", 0), touch("u1", "C2", 9.5), touch("u1", "C1", 13)])
+        [result] = engine.track_conversions([{"user_id": "u1", "revenue": 100, "timestamp": T0 + 14 * DAY_SECONDS,
+                                              "attribution_model": "time_decay"}])
+        conversion_time, times, touchpoints = engine._lookback("u1", engine.conversions[0], 30)
+        assert times == [T0, T0 + 9.5 * DAY_SECONDS, T0 + 13 * DAY_SECONDS]
+        parsed = engine.time_decay_attribution(touchpoints, 100, conversion_time)
+        assert result["attribution"]["attributed_campaigns"] == parsed
+
+
+def conversions_for(engine, campaign_id):
+    return sum(
+        attr["campaign_id"] == campaign_id
+        for c in engine.conversions
+        for attr in engine.attribute_conversion(c["user_id"], c, "last_click")["attributed_campaigns"]
+    )
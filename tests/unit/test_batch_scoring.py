@@ -0,0 +1,92 @@
+"""
+Chunked, streaming batch scoring into intent_score_predictions
+"""
+import os
+import sqlite3
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "intent_intelligence", "ml"))
+
+import batch_scoring  # noqa: E402
+
+QUERY = "SELECT global_customer_id, 'ZEPTO' AS platform_id, frequency, monetary FROM features"
+
+
+class FrequencyModel:
+    """Picklable scorer over the raw feature columns"""
+
+    def __init__(self):
+        rng = np.random.default_rng(0)
+        X = rng.random((200, 2)) * [20, 1000]
+        self.model = LogisticRegression().fit(X, (X[:, 0] > 10).astype(int))
+        self.chunk_sizes = []
+
+    def __call__(self, chunk):
+        self.chunk_sizes.append(len(chunk))
+        return self.model.predict_proba(chunk[['frequency', 'monetary']].to_numpy())[:, 1]
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    rng = np.random.default_rng(1)
+    pd.DataFrame({
+        'global_customer_id': [f"c{i:05d}" for i in range(2500)],
+        'frequency': rng.integers(0, 20, 2500),
+        'monetary': rng.random(2500) * 1000,
+    }).to_sql('features', conn, index=False)
+    yield conn
+    conn.close()
+
+
+def predictions(conn):
+    return pd.read_sql_query("SELECT * FROM intent_score_predictions ORDER BY global_customer_id", conn)
+
+
+class TestBatchScoring:
+
+    def test_every_row_scored_in_chunks(self, conn):
+        model = FrequencyModel()
+        scored = batch_scoring.score_query(conn, QUERY, model, model_version="1.0", chunk_size=1000)
+
+        assert scored == 2500
+        assert model.chunk_sizes == [1000, 1000, 500]
+        result = predictions(conn)
+        features = pd.read_sql_query(QUERY, conn)
+        expected = model.model.predict_proba(features[['frequency', 'monetary']].to_numpy())[:, 1]
+        np.testing.assert_allclose(result['intent_score'], expected)
+        assert set(result['platform_id']) == {'ZEPTO'} and set(result['model_version']) == {'1.0'}
+        assert (result['intent_level'] == batch_scoring.intent_levels(expected)).all()
+
+    def test_process_pool_matches_in_process(self, conn):
+        batch_scoring.score_query(conn, QUERY, FrequencyModel(), chunk_size=300)
+        in_process = predictions(conn)
+        batch_scoring.score_query(conn, QUERY, FrequencyModel(), chunk_size=300, workers=2)
+        pooled = predictions(conn)
+        pd.testing.assert_frame_equal(pooled.drop(columns='scoring_timestamp'),
+                                      in_process.drop(columns='scoring_timestamp'))
+
+    def test_failed_run_keeps_previous_predictions(self, conn):
+        batch_scoring.score_query(conn, QUERY, FrequencyModel(), model_version="1.0", chunk_size=1000)
+
+        calls = []
+
+        def failing(chunk):
+            calls.append(len(chunk))
+            if len(calls) == 2:
+                raise RuntimeError("model crashed")
+            return np.zeros(len(chunk))
+
+        with pytest.raises(RuntimeError):
+            batch_scoring.score_query(conn, QUERY, failing, model_version="2.0", chunk_size=1000)
+        result = predictions(conn)
+        assert len(result) == 2500 and set(result['model_version']) == {'1.0'}
+
+    def test_intent_levels(self):
+        levels = batch_scoring.intent_levels(np.array([0.0, 0.2, 0.4, 0.5, 0.7, 0.95]))
+        assert list(levels) == [None, 'low', 'low', 'medium', 'medium', 'high']
@@ -0,0 +1,45 @@
+"""
+Vectorized categorical encoding with unseen-category handling
+"""
+import os
+import pickle
+import sys
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "intent_intelligence", "ml"))
+
+from categorical_encoder import UNKNOWN_CODE, CategoricalEncoder  # noqa: E402
+
+
+class TestCategoricalEncoder:
+
+    def test_codes_match_label_encoder(self):
+        values = pd.Series(["Pune", "Delhi", "Mumbai", "Delhi", "Unknown", "Bengaluru"])
+        encoder = CategoricalEncoder()
+        codes = encoder.fit_transform(values)
+
+        label_encoder = LabelEncoder().fit(values)
+        assert list(encoder.classes_) == list(label_encoder.classes_)
+        assert codes.tolist() == label_encoder.transform(values).tolist()
+
+    def test_unseen_values_take_the_unknown_class(self):
+        encoder = CategoricalEncoder().fit(["Delhi", "Unknown", "Pune"])
+        codes = encoder.transform(pd.Series(["Pune", "Jaipur", "Delhi", "Kochi"]))
+        unknown = list(encoder.classes_).index("Unknown")
+        assert codes.tolist() == [1, unknown, 0, unknown]
+
+    def test_unseen_values_without_unknown_class_get_reserved_code(self):
+        encoder = CategoricalEncoder().fit(["ZEPTO", "BLINKIT"])
+        assert encoder.transform(["ZEPTO", "NYKAA"]).tolist() == [1, UNKNOWN_CODE]
+
+    def test_round_trips_through_pickle_and_label_encoder(self):
+        values = np.random.default_rng(0).choice([f"city{i}" for i in range(50)], 1000)
+        encoder = CategoricalEncoder().fit(values)
+        restored = pickle.loads(pickle.dumps(encoder))
+        converted = CategoricalEncoder.from_label_encoder(LabelEncoder().fit(values))
+
+        assert (restored.transform(values) == encoder.transform(values)).all()
+        assert (converted.transform(values) == encoder.transform(values)).all()
@@ -0,0 +1,85 @@
+"""
+Cross-platform features from the customer x platform activity matrix
+"""
+import math
+import os
+import sqlite3
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "intent_intelligence", "ml"))
+
+import cross_platform_engine  # noqa: E402
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""CREATE TABLE fact_transaction (transaction_id TEXT, platform_id TEXT, global_customer_id TEXT,
+                                                   transaction_datetime TEXT, total_value REAL)""")
+    yield conn
+    conn.close()
+
+
+def add(conn, *rows):
+    conn.executemany("INSERT INTO fact_transaction VALUES (?, ?, ?, ?, ?)",
+                     [(f"t{i}_{row[0]}_{row[2]}", *row) for i, row in enumerate(rows)])
+
+
+class TestCrossPlatformEngine:
+
+    def test_features_from_platform_matrix(self, conn):
+        add(conn,
+            ("ZEPTO", "c1", "2024-12-01 10:00:00", 100.0),
+            ("ZEPTO", "c1", "2024-12-20 10:00:00", 100.0),
+            ("ZEPTO", "c1", "2024-12-25 10:00:00", 50.0),
+            ("BLINKIT", "c1", "2024-12-22 10:00:00", 30.0),
+            ("ZEPTO", "c2", "2024-06-01 10:00:00", 10.0),
+            ("AMAZON", "c3", "2024-12-10 10:00:00", 20.0),
+            ("NYKAA", "c3", "2024-12-11 10:00:00", 20.0))
+        features = cross_platform_engine.cross_platform_features(conn, "2025-01-01").set_index("global_customer_id")
+
+        assert list(features.reset_index().columns) == cross_platform_engine.FEATURE_COLUMNS
+        assert list(features.index) == ["c1", "c2", "c3"]
+        c1 = features.loc["c1"]
+        assert (c1["platforms_used_count"], c1["platforms_list"], c1["dominant_platform"]) == (2, "BLINKIT,ZEPTO", "ZEPTO")
+        assert (c1["cross_platform_purchase_count_30d"], c1["cross_platform_value_30d"]) == (3, 180.0)
+        assert c1["dominant_platform_share"] == pytest.approx(0.75)
+        # ZEPTO, BLINKIT, ZEPTO inside the window: two switches
+        assert c1["platform_switching_frequency"] == 2
+
+        expected = -(0.75 * math.log(0.75) + 0.25 * math.log(0.25)) / math.log(4)
+        assert c1["platform_diversity_score"] == pytest.approx(expected)
+        assert c1["platform_loyalty_score"] == pytest.approx(1 - expected)
+
+        c2 = features.loc["c2"]
+        assert (c2["platforms_used_count"], c2["cross_platform_purchase_count_30d"], c2["dominant_platform_share"],
+                c2["platform_diversity_score"], c2["platform_switching_frequency"]) == (1, 0, 1.0, 0.0, 0)
+        assert features.loc["c3", "platform_diversity_score"] == pytest.approx(0.5)
+
+    def test_platform_lists_per_usage_pattern(self):
+        used = np.random.default_rng(0).random((500, 11)) < 0.3
+        platforms = pd.Index([f"P{i:02d}" for i in range(11)])
+        lists = cross_platform_engine.platform_lists(used, platforms)
+        assert list(lists) == [",".join(platforms[row]) for row in used]
+
+    def test_empty_table(self, conn):
+        features = cross_platform_engine.cross_platform_features(conn, "2025-01-01")
+        assert features.empty and list(features.columns) == cross_platform_engine.FEATURE_COLUMNS
+
+    @pytest.mark.parametrize("with_platforms", [True, False])
+    def test_customers_without_platform(self, conn, with_platforms):
+        add(conn, (None, "c1", "2024-12-20 10:00:00", 10.0), (None, "c1", "2024-12-21 10:00:00", 10.0))
+        if with_platforms:
+            add(conn, ("ZEPTO", "c2", "2024-12-20 10:00:00", 10.0))
+        with np.errstate(all="raise"):
+            features = cross_platform_engine.cross_platform_features(conn, "2025-01-01").set_index("global_customer_id")
+
+        c1 = features.loc["c1"]
+        assert c1["dominant_platform"] is None
+        assert (c1["dominant_platform_share"], c1["platforms_used_count"], c1["platform_diversity_score"]) == (0, 0, 0)
+        if with_platforms:
+            assert (features.loc["c2", "dominant_platform"], features.loc["c2", "dominant_platform_share"]) == ("ZEPTO", 1.0)
@@ -0,0 +1,96 @@
+"""
+Batching event producer against a local stand-in broker
+"""
+import json
+
+import pytest
+from app.producer import EventProducer
+
+
+class StandInBroker:
+    """Records published batches; raises while 'down'"""
+
+    def __init__(self):
+        self.up = True
+        self.batches = []
+
+    def publish(self, records):
+        if not self.up:
+            raise ConnectionError("broker down")
+        self.batches.append([json.loads(record) for record in records])
+
+    @property
+    def events(self):
+        return [event for batch in self.batches for event in batch]
+
+
+@pytest.fixture
+def broker():
+    return StandInBroker()
+
+
+def make_producer(broker, tmp_path, **kwargs):
+    options = dict(fallback_path=str(tmp_path / "events_fallback.log"), batch_size=50, linger=0.02,
+                   retry_interval=0.0, fsync_interval=0.0)
+    options.update(kwargs)
+    return EventProducer(lambda: broker if broker.up else None, **options)
+
+
+class TestEventProducer:
+
+    def test_events_are_published_in_micro_batches(self, broker, tmp_path):
+        producer = make_producer(broker, tmp_path)
+        assert producer.send_many({"seq": i} for i in range(500)) == 500
+        assert producer.flush()
+        assert [e["seq"] for e in broker.events] == list(range(500))
+        assert len(broker.batches) < 500 and max(len(b) for b in broker.batches) <= 50
+        producer.close()
+
+    def test_fallback_then_replay_in_order(self, broker, tmp_path):
+        producer = make_producer(broker, tmp_path)
+        broker.up = False
+        producer.send_many({"seq": i} for i in range(120))
+        assert producer.flush()
+        assert broker.events == [] and producer.metrics()["fallback_written"] == 120
+        with open(tmp_path / "events_fallback.log") as fh:
+            assert [json.loads(line)["seq"] for line in fh] == list(range(120))
+
+        broker.up = True
+        producer.send_many({"seq": i} for i in range(120, 150))
+        assert producer.flush()
+        assert [e["seq"] for e in broker.events] == list(range(150))
+        assert producer.metrics()["replayed"] == 120
+        assert not producer.fallback.pending()
+        producer.close()
+
+    def test_backlog_survives_restart(self, broker, tmp_path):
+        broker.up = False
+        first = make_producer(broker, tmp_path)
+        first.send_many({"seq": i} for i in range(10))
+        first.close()
+
+        broker.up = True
+        second = make_producer(broker, tmp_path)
+        second.send({"seq": 10})
+        assert second.flush()
+        assert [e["seq"] for e in broker.events] == list(range(11))
+        second.close()
+
+    def test_full_queue_applies_backpressure(self, broker, tmp_path):
+        producer = make_producer(broker, tmp_path, max_queue=5, linger=1.0)
+        producer.start = lambda: None  # no drain thread: the queue just fills
+        assert producer.send_many({"seq": i} for i in range(10)) == 5
+        assert producer.metrics()["rejected"] == 5
+
+    def test_shutdown_hook_flushes_queued_events(self, broker, tmp_path, monkeypatch):
+        from app import main
+
+        producer = make_producer(broker, tmp_path, linger=1.0)
+        monkeypatch.setattr(main, "producer", producer)
+        monkeypatch.setattr(main, "close_pools", lambda: None)
+        monkeypatch.setattr(main.ingest_buffer, "close", lambda: None)
+        producer.send_many({"seq": i} for i in range(20))
+
+        main.shutdown_db_pools()
+        assert [e["seq"] for e in broker.events] == list(range(20))
+        assert producer._thread is None
@@ -0,0 +1,137 @@
+"""
+Bulk event ingest: JSON array and NDJSON bodies, all-or-nothing validation, one insert per batch
+"""
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, select
+
+from app import ingest_routes
+from app.ingest_buffer import IngestBuffer
+from app.models_db import Base, EventDB
+
+
+class RecordingProducer:
+
+    def __init__(self):
+        self.events = []
+
+    def send_many(self, payloads):
+        self.events.extend(payloads)
+        return len(payloads)
+
+    def metrics(self):
+        return {"sent": len(self.events)}
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'events.db'}")
+    Base.metadata.create_all(bind=engine, tables=[EventDB.__table__])
+    monkeypatch.setattr(ingest_routes, "engine", engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def producer(monkeypatch):
+    producer = RecordingProducer()
+    monkeypatch.setattr(ingest_routes, "producer", producer)
+    return producer
+
+
+@pytest.fixture
+def buffer(engine, tmp_path, monkeypatch):
+    buffer = IngestBuffer(ingest_routes.write_events, log_dir=str(tmp_path / "ingest_log"), linger=0.01)
+    monkeypatch.setattr(ingest_routes, "ingest_buffer", buffer)
+    yield buffer
+    buffer.close()
+
+
+@pytest.fixture
+def client(buffer, producer):
+    app = FastAPI()
+    app.include_router(ingest_routes.router)
+    return TestClient(app)
+
+
+def make_events(n):
+    return [{"tenant_id": "t1", "user_id": f"u{i}", "event_type": "view", "product_id": f"p{i}",
+             "timestamp": 1700000000.0 + i} for i in range(n)]
+
+
+def stored(engine):
+    assert ingest_routes.ingest_buffer.flush()
+    with engine.connect() as conn:
+        return conn.execute(select(EventDB.user_id, EventDB.event_type, EventDB.timestamp)
+                            .order_by(EventDB.id)).all()
+
+
+class TestIngestBatch:
+
+    def test_json_array_is_written_in_one_statement(self, client, engine, producer):
+        statements = []
+        event.listen(engine, "before_cursor_execute",
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+
+        response = client.post("/ingest/batch", json=make_events(250))
+        assert response.json() == {"status": "accepted", "accepted": 250}
+        rows = stored(engine)
+        assert len(rows) == 250
+        assert len([s for s in statements if s.startswith("INSERT INTO events")]) == 1
+        assert rows[7] == ("u7", "view", 1700000007.0)
+        assert [e["product_id"] for e in producer.events] == [f"p{i}" for i in range(250)]
+
+    def test_ndjson(self, client, engine):
+        body = "\n".join(json.dumps(e) for e in make_events(3)) + "\n\n"
+        response = client.post("/ingest/batch", content=body,
+                               headers={"Content-Type": "application/x-ndjson"})
+        assert response.json()["accepted"] == 3
+        assert [row.user_id for row in stored(engine)] == ["u0", "u1", "u2"]
+
+    def test_ndjson_errors_are_reported_by_line(self, client, engine):
+        lines = [json.dumps(e) for e in make_events(4)]
+        lines[1] = lines[1] + "," + lines[2]  # two events on one line is not one event
+        lines[3] = json.dumps({**make_events(1)[0], "timestamp": "yesterday"})
+        body = "\n".join(lines[:1] + [""] + lines[1:])
+        response = client.post("/ingest/batch", content=body,
+                               headers={"Content-Type": "application/x-ndjson"})
+        assert response.status_code == 422
+        detail = response.json()["detail"]
+        assert detail["invalid_events"] == 2
+        assert [(e["line"], e["field"]) for e in detail["errors"]] == [(3, ""), (5, "timestamp")]
+        assert stored(engine) == []
+
+    def test_invalid_event_rejects_whole_batch(self, client, engine, producer):
+        events = make_events(5)
+        del events[3]["user_id"]
+        events[4]["timestamp"] = "yesterday"
+
+        response = client.post("/ingest/batch", json=events)
+        assert response.status_code == 422
+        detail = response.json()["detail"]
+        assert detail["invalid_events"] == 2
+        assert [(e["index"], e["field"]) for e in detail["errors"]] == [(3, "user_id"), (4, "timestamp")]
+        assert stored(engine) == []
+        assert producer.events == []
+
+    def test_batch_size_limit(self, client, engine, monkeypatch):
+        monkeypatch.setattr(ingest_routes, "INGEST_MAX_BATCH", 10)
+        assert client.post("/ingest/batch", json=make_events(11)).status_code == 413
+        assert stored(engine) == []
+
+    def test_single_event(self, client, engine, producer):
+        response = client.post("/ingest", json=make_events(1)[0])
+        assert response.json() == {"status": "accepted"}
+        assert stored(engine) == [("u0", "view", 1700000000.0)]
+        assert len(producer.events) == 1
+
+    def test_full_buffer_returns_503(self, client, buffer, engine):
+        buffer.capacity = 10
+        response = client.post("/ingest/batch", json=make_events(11))
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        assert stored(engine) == []
+        assert client.get("/ingest/metrics").json()["buffer"]["rejected"] == 11
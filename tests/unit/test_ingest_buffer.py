@@ -0,0 +1,126 @@
+"""
+Write-behind ingest buffer: batched draining, backpressure and crash replay from the log
+"""
+import json
+import os
+import threading
+
+import pytest
+from app.ingest_buffer import IngestBuffer
+
+
+class RecordingSink:
+    """Stands in for the events table; blocks while `held` is clear"""
+
+    def __init__(self):
+        self.batches = []
+        self.held = threading.Event()
+        self.held.set()
+        self.fail = False
+
+    def __call__(self, payloads):
+        self.held.wait(5)
+        if self.fail:
+            raise RuntimeError("database is locked")
+        self.batches.append(list(payloads))
+
+    @property
+    def events(self):
+        return [event["n"] for batch in self.batches for event in batch]
+
+
+@pytest.fixture
+def sink():
+    return RecordingSink()
+
+
+def make_buffer(sink, tmp_path, **kwargs):
+    options = dict(log_dir=str(tmp_path / "ingest_log"), batch_size=100, linger=0.01,
+                   segment_events=50, retry_interval=0.01)
+    options.update(kwargs)
+    return IngestBuffer(sink, **options)
+
+
+def events(start, stop):
+    return [{"n": n} for n in range(start, stop)]
+
+
+class TestIngestBuffer:
+
+    def test_drains_in_order_in_large_batches(self, sink, tmp_path):
+        buffer = make_buffer(sink, tmp_path)
+        sink.held.clear()
+        for start in range(0, 300, 10):
+            assert buffer.append(events(start, start + 10))
+        sink.held.set()
+        assert buffer.flush()
+
+        assert sink.events == list(range(300))
+        assert len(sink.batches) <= 4
+        assert buffer.metrics()["committed"] == 300
+        buffer.close()
+        assert buffer.metrics()["log_segments"] == 0
+
+    def test_backpressure_rejects_whole_batches(self, sink, tmp_path):
+        buffer = make_buffer(sink, tmp_path, capacity=25)
+        sink.held.clear()
+        assert buffer.append(events(0, 20))
+        assert not buffer.append(events(20, 30))
+        metrics = buffer.metrics()
+        assert (metrics["buffered"], metrics["rejected"], metrics["utilization"]) == (20, 10, 0.8)
+
+        sink.held.set()
+        assert buffer.flush()
+        assert buffer.append(events(20, 30))
+        assert buffer.flush()
+        assert sink.events == list(range(30))
+        buffer.close()
+
+    def test_failed_write_is_retried(self, sink, tmp_path):
+        buffer = make_buffer(sink, tmp_path)
+        sink.fail = True
+        buffer.append(events(0, 5))
+        while not buffer.write_errors:
+            pass
+        sink.fail = False
+        assert buffer.flush()
+        assert sink.events == list(range(5))
+        buffer.close()
+
+    def test_crash_replays_uncommitted_events(self, sink, tmp_path):
+        # First process: 120 events committed, then the writer wedges and the process dies
+        crashed = make_buffer(sink, tmp_path, batch_size=60)
+        crashed.append(events(0, 120))
+        assert crashed.flush()
+        sink.held.clear()
+        crashed.append(events(120, 200))
+
+        log_dir = str(tmp_path / "ingest_log")
+        with open(os.path.join(log_dir, "checkpoint.json")) as fh:
+            assert json.load(fh) == {"segment": 0, "line": 119}
+
+        recovered = RecordingSink()
+        buffer = make_buffer(recovered, tmp_path)
+        buffer.start()
+        assert recovered.events == list(range(120, 200))
+        assert buffer.metrics()["replayed"] == 80
+        assert buffer.metrics()["log_segments"] == 0
+
+        buffer.append(events(200, 210))
+        assert buffer.flush()
+        assert recovered.events == list(range(120, 210))
+        buffer.close()
+        sink.held.set()
+
+    def test_torn_tail_line_is_skipped(self, sink, tmp_path):
+        log_dir = tmp_path / "ingest_log"
+        log_dir.mkdir()
+        (log_dir / "000000000007.log").write_text('{"n": 1}\n{"n": 2}\n{"n": 3')
+        buffer = make_buffer(sink, tmp_path)
+        assert buffer.recover() == 2
+        assert sink.events == [1, 2]
+
+        buffer.append(events(3, 4))
+        assert buffer.flush()
+        assert sorted(os.listdir(log_dir)) == ["000000000008.log", "checkpoint.json"]
+        buffer.close()
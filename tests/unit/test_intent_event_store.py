@@ -0,0 +1,99 @@
+"""
+Sharded intent event store behind secure_intent scoring and opportunity detection
+"""
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "backend"))
+
+import secure_intent  # noqa: E402
+from intent_event_store import CART, SEARCH, VIEW, UserSignals  # noqa: E402
+from secure_intent import BulkEventsRequest, UserEvent  # noqa: E402
+from secure_opportunities import detect_opportunities  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def store():
+    secure_intent.event_store.clear()
+    yield secure_intent.event_store
+    secure_intent.event_store.clear()
+
+
+def ago(**delta):
+    return (datetime.now() - timedelta(**delta)).isoformat()
+
+
+def ingest(events, client_id="zepto"):
+    request = BulkEventsRequest(clientId=client_id, events=[UserEvent(**event) for event in events])
+    return asyncio.run(secure_intent.bulk_ingest(request))
+
+
+def shopper(user_id, category="footwear"):
+    """Two searches, a cart add and three views in the last day: score 0.8833"""
+    kinds = ["search", "search", "cart_add", "product_view", "product_view", "product_view"]
+    return [{"userId": user_id, "eventType": kind, "category": category, "timestamp": ago(hours=i + 1)}
+            for i, kind in enumerate(kinds)]
+
+
+class TestIntentEventStore:
+
+    def test_score_from_rolling_counters(self):
+        events = shopper("u1")
+        ingest(events + [{"userId": "u1", "eventType": "search", "category": "footwear",
+                          "timestamp": ago(days=40)}])
+        score = secure_intent.calculate_intent_score("zepto", "u1", "footwear")
+
+        assert score["intentScore"] == 0.8833
+        assert score["intentLevel"] == "high"
+        assert [(s["type"], s.get("count")) for s in score["signals"]] == [
+            ("search_frequency", 2), ("cart_wishlist", 1), ("product_views", 3), ("recency", None)]
+        assert score["lastActivity"] == events[0]["timestamp"]
+
+        profile = asyncio.run(secure_intent.get_user_profile("u1"))
+        assert profile["totalEvents"] == 7
+        assert secure_intent.calculate_intent_score("zepto", "u1", "beauty") is None
+
+    def test_signals_expire_and_stay_time_ordered(self):
+        signals = UserSignals()
+        now = 1_000_000.0
+        for time, kind in [(now - 50, SEARCH), (now - 10, VIEW), (now - 30, CART), (now - 200, SEARCH)]:
+            signals.add(kind, time, str(time), cutoff=now - 100)
+        assert list(signals.times) == [now - 50, now - 30, now - 10]
+        assert signals.counts[:3] == [1, 1, 1]
+
+        signals.expire(now - 40)
+        assert signals.window_events == 2
+        assert signals.counts[:3] == [0, 1, 1]
+        assert signals.window_last == (now - 10, str(now - 10))
+        signals.expire(now)
+        assert signals.window_events == 0 and signals.window_last is None
+
+    def test_bulk_ingested_users_are_scored_on_read(self):
+        ingest(shopper("u1") + shopper("u2") + shopper("u3", "beauty")[:1])
+        high = asyncio.run(secure_intent.get_high_intent_users("footwear"))
+        assert sorted(user["userId"] for user in high["users"]) == ["u1", "u2"]
+
+        stats = asyncio.run(secure_intent.get_stats())
+        assert (stats["totalUsers"], stats["totalEvents"], stats["totalScores"]) == (3, 13, 2)
+        assert stats["intentDistribution"]["high"] == 2
+
+    def test_bad_timestamp_rejects_whole_bulk_request(self, store):
+        events = shopper("u1") + [{"userId": "u2", "eventType": "search", "category": "footwear",
+                                   "timestamp": "yesterday"}]
+        with pytest.raises(HTTPException) as error:
+            ingest(events)
+        assert error.value.status_code == 422
+        assert store.event_counts == {}
+
+    def test_detect_opportunities_from_shard_aggregates(self):
+        ingest([event for user in range(1000) for event in shopper(f"u{user}", "sports")])
+        ingest(shopper("other-client-user", "sports"), client_id="blinkit")
+        opportunities = detect_opportunities()
+
+        assert [(o["category"], o["userCount"], o["avgIntentScore"]) for o in opportunities] == [
+            ("sports", 1001, 0.8833)]
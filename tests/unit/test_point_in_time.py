@@ -0,0 +1,156 @@
+"""
+Point-in-time training snapshots: as-of features and forward label windows
+"""
+import os
+import random
+import sqlite3
+import sys
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "intent_intelligence", "ml"))
+
+import feature_engineering_pipeline  # noqa: E402
+import point_in_time  # noqa: E402
+
+START = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""CREATE TABLE fact_transaction (global_customer_id TEXT, platform_id TEXT,
+                    transaction_datetime TEXT, total_value REAL, items_count INTEGER,
+                    discount_value REAL, is_repeat INTEGER)""")
+    yield conn
+    conn.close()
+
+
+def add_transactions(conn, count=3000, seed=5):
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        when = START + timedelta(seconds=rng.randrange(200 * 86400))
+        rows.append((f"c{rng.randrange(30)}", rng.choice(["ZEPTO", "BLINKIT", "NYKAA"]),
+                     when.strftime("%Y-%m-%d %H:%M:%S"), rng.choice([0.0, round(rng.uniform(50, 500), 2)]),
+                     rng.randrange(1, 6), round(rng.uniform(0, 40), 2), rng.randrange(2)))
+    conn.executemany("INSERT INTO fact_transaction VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+
+def expected_row(transactions, customer, platform, reference_date):
+    """Brute-force features for one snapshot from the raw transactions"""
+    midnight = pd.Timestamp(reference_date)
+    before = transactions[transactions["when"] < midnight]
+    pair = before[(before["global_customer_id"] == customer) & (before["platform_id"] == platform)]
+
+    def since(frame, days):
+        return frame[frame["when"] >= midnight - pd.Timedelta(days=days)]
+
+    last_30, last_90 = since(pair, 30), since(pair, 90)
+    rated = last_90[last_90["total_value"] != 0]
+    customer_counts = before[before["global_customer_id"] == customer].groupby("platform_id").size()
+    shares = customer_counts / customer_counts.sum()
+    following = transactions[(transactions["global_customer_id"] == customer)
+                             & (transactions["platform_id"] == platform)
+                             & (transactions["when"] >= midnight)
+                             & (transactions["when"] < midnight + pd.Timedelta(days=7))]
+    return {
+        "recency_days": (midnight - pair["when"].max()).total_seconds() / 86400,
+        "frequency_7d": len(since(pair, 7)),
+        "frequency_30d": len(last_30),
+        "frequency_90d": len(last_90),
+        "monetary_30d": last_30["total_value"].sum(),
+        "monetary_90d": last_90["total_value"].sum(),
+        "aov_30d": last_30["total_value"].mean() if len(last_30) else np.nan,
+        "platforms_used_count": len(customer_counts),
+        "platform_diversity_score": float(-(shares * np.log(shares)).sum() / np.log(3)),
+        "cross_platform_purchase_count_30d": len(since(before[before["global_customer_id"] == customer], 30)),
+        "avg_items_per_transaction": last_90["items_count"].mean(),
+        "avg_discount_rate": (rated["discount_value"] / rated["total_value"]).mean() if len(rated) else np.nan,
+        "repeat_rate": last_90["is_repeat"].mean(),
+        "weekend_shopping_ratio": last_90["when"].dt.dayofweek.isin([5, 6]).mean(),
+        "label": int(len(following) > 0),
+    }
+
+
+class TestPointInTime:
+
+    def test_snapshots_match_brute_force(self, conn):
+        add_transactions(conn)
+        transactions = pd.read_sql_query("SELECT * FROM fact_transaction", conn)
+        transactions["when"] = pd.to_datetime(transactions["transaction_datetime"])
+
+        dates = [date(2024, 4, 1), date(2024, 5, 13)]
+        training = point_in_time.build_training_set(conn, dates)
+        assert set(training["reference_date"]) == set(dates)
+
+        for _, row in training.sample(40, random_state=0).iterrows():
+            expected = expected_row(transactions, row["global_customer_id"], row["platform_id"],
+                                    row["reference_date"])
+            for column, value in expected.items():
+                assert row[column] == pytest.approx(value, nan_ok=True), column
+
+        # Exactly the pairs with a transaction in the 90 days before each date
+        for reference_date in dates:
+            midnight = pd.Timestamp(reference_date)
+            recent = transactions[(transactions["when"] < midnight)
+                                  & (transactions["when"] >= midnight - pd.Timedelta(days=90))]
+            active = set(map(tuple, recent[["global_customer_id", "platform_id"]].drop_duplicates().values))
+            snapshot = training[training["reference_date"] == reference_date]
+            assert set(map(tuple, snapshot[["global_customer_id", "platform_id"]].values)) == active
+
+    def test_features_ignore_transactions_from_the_reference_date_on(self, conn):
+        conn.executemany("INSERT INTO fact_transaction VALUES (?, ?, ?, ?, ?, ?, ?)", [
+            ("c1", "ZEPTO", "2024-03-01 10:00:00", 100.0, 1, 0.0, 0),
+            ("c1", "ZEPTO", "2024-03-10 00:00:00", 999.0, 9, 0.0, 1),   # on the reference date: label only
+            ("c1", "BLINKIT", "2024-03-12 09:00:00", 50.0, 1, 0.0, 0),  # future platform
+            ("c2", "ZEPTO", "2024-03-05 10:00:00", 20.0, 1, 0.0, 0),
+            ("c2", "ZEPTO", "2024-03-17 00:00:00", 20.0, 1, 0.0, 0),    # after the label window
+        ])
+        training = point_in_time.build_training_set(conn, [date(2024, 3, 10)]).set_index("global_customer_id")
+
+        c1 = training.loc["c1"]
+        assert (c1["frequency_30d"], c1["monetary_30d"], c1["platforms_used_count"]) == (1, 100.0, 1)
+        assert c1["repeat_rate"] == 0 and c1["label"] == 1
+        assert training.loc["c2", "label"] == 0
+        assert len(training) == 2
+
+    def test_default_dates_leave_room_for_lookback_and_label(self, conn):
+        add_transactions(conn, count=500)
+        history = point_in_time.TransactionHistory.load(conn)
+        dates = point_in_time.reference_dates(history, lookback_days=90, label_window_days=7, step_days=7)
+
+        assert dates[0] == history.first_day + timedelta(days=90)
+        assert dates[-1] + timedelta(days=7) <= history.last_day + timedelta(days=1)
+        assert all((b - a).days == 7 for a, b in zip(dates, dates[1:]))
+
+    def test_process_pool_matches_in_process(self, conn):
+        add_transactions(conn, count=1000)
+        in_process = point_in_time.build_training_set(conn)
+        pooled = point_in_time.build_training_set(conn, workers=2)
+        pd.testing.assert_frame_equal(pooled, in_process)
+
+    def test_matches_behavioral_feature_table(self, conn):
+        """Weekend ratio and items average (NULL items skipped) agree with compute_behavioral_features"""
+        conn.execute("ALTER TABLE fact_transaction ADD COLUMN payment_mode TEXT")
+        conn.executemany("INSERT INTO fact_transaction VALUES (?, ?, ?, ?, ?, ?, ?, 'UPI')", [
+            ("c1", "ZEPTO", "2024-03-02 10:00:00", 100.0, 4, 0.0, 0),     # Saturday
+            ("c1", "ZEPTO", "2024-03-04 10:00:00", 100.0, None, 0.0, 0),  # Monday, items unknown
+            ("c1", "ZEPTO", "2024-03-05 10:00:00", 100.0, 2, 0.0, 0),     # Tuesday
+            ("c2", "BLINKIT", "2024-03-03 10:00:00", 50.0, None, 0.0, 0),  # Sunday
+        ])
+        reference_date = date(2024, 3, 10)
+        training = point_in_time.build_training_set(conn, [reference_date]).set_index("global_customer_id")
+        behavior = feature_engineering_pipeline.compute_behavioral_features(conn, reference_date)
+        behavior = behavior.set_index("global_customer_id")
+
+        for column in ("weekend_shopping_ratio", "avg_items_per_transaction"):
+            for customer in ("c1", "c2"):
+                assert training.loc[customer, column] == pytest.approx(behavior.loc[customer, column],
+                                                                       nan_ok=True), (column, customer)
+        assert training.loc["c1", "weekend_shopping_ratio"] == pytest.approx(1 / 3)
+        assert training.loc["c1", "avg_items_per_transaction"] == 3.0
+        assert np.isnan(training.loc["c2", "avg_items_per_transaction"])
@@ -0,0 +1,101 @@
+"""
+Columnar purchase store: rollups and date slices must match a row-by-row scan
+"""
+import importlib.util
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+# backend/app is shadowed by the top-level app package, so load the module by path
+spec = importlib.util.spec_from_file_location(
+    "purchase_store",
+    os.path.join(os.path.dirname(__file__), "..", "..", "backend", "app", "services", "purchase_store.py"))
+purchase_store = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(purchase_store)
+
+NOW = datetime(2025, 6, 1, 12, 0)
+
+
+def make_purchases(n, seed=5):
+    rng = random.Random(seed)
+    purchases = []
+    for i in range(n):
+        channel = rng.choice(["zepto", "facebook", "instagram", "organic"])
+        price = rng.randint(50, 500)
+        purchases.append({
+            "order_id": f"ORD_{i}",
+            "brand": rng.choice(["Amul", "Nike", "Dove"]),
+            "category": rng.choice(["grocery", "beauty"]),
+            "location": rng.choice(["mumbai", "delhi", "pune"]),
+            "ad_channel": channel,
+            "price": price,
+            "ad_spend": 0 if channel == "organic" else price // 7,
+            "purchase_datetime": (NOW - timedelta(minutes=rng.randint(0, 60 * 24 * 90))).isoformat(),
+        })
+    return purchases
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "purchase_database_100k.json"
+    path.write_text(json.dumps(make_purchases(2000)))
+    return str(path)
+
+
+class TestPurchaseStore:
+
+    def test_rollup_matches_scan(self, source):
+        purchases = json.load(open(source))
+        columns = purchase_store.PurchaseStore(source).get()
+        start, end = NOW - timedelta(days=30), NOW - timedelta(days=3)
+        rows = columns.date_slice(start, end)
+
+        in_range = [p for p in purchases if start <= datetime.fromisoformat(p["purchase_datetime"]) <= end]
+        assert rows.stop - rows.start == len(in_range)
+
+        ad = columns.ad_mask(rows)
+        totals = columns.rollup("brand", rows, mask=ad)
+        for code, brand in enumerate(columns.labels["brand"]):
+            expected = [p for p in in_range if p["brand"] == brand and p["ad_channel"] != "organic"]
+            assert totals["count"][code] == len(expected)
+            assert totals["price"][code] == sum(p["price"] for p in expected)
+            assert totals["ad_spend"][code] == sum(p["ad_spend"] for p in expected)
+
+    def test_cache_reused_and_reloaded_on_change(self, source):
+        store = purchase_store.PurchaseStore(source)
+        first = store.get()
+        assert store.get() is first and store.loads == 1
+
+        # A fresh store memory-maps the cached columns instead of parsing the JSON
+        cached = purchase_store.PurchaseStore(source).get()
+        assert cached.labels == first.labels
+        assert (cached.times == first.times).all()
+
+        with open(source, "w") as f:
+            json.dump(make_purchases(10, seed=9), f)
+        os.utime(source, ns=(0, 0))
+        assert len(store.get()) == 10 and store.loads == 2
+
+    def test_missing_file_is_empty(self, tmp_path):
+        columns = purchase_store.PurchaseStore(str(tmp_path / "missing.json")).get()
+        assert len(columns) == 0
+        assert columns.rollup("brand")["count"].tolist() == []
+
+    def test_rebuild_leaves_mapped_snapshot_intact(self, source):
+        old = purchase_store.PurchaseStore(source).get()
+        mapped = purchase_store.PurchaseStore(source).get()   # memory-maps the first build
+        expected_prices = old.numeric["price"].copy()
+
+        with open(source, "w") as f:
+            json.dump(make_purchases(10, seed=9), f)
+        os.utime(source, ns=(0, 0))
+        rebuilt = purchase_store.PurchaseStore(source).get()
+
+        assert len(rebuilt) == 10
+        assert (mapped.numeric["price"] == expected_prices).all()
+        assert len(mapped) == 2000
+        # Only the current version is kept; the old one was unlinked, not overwritten
+        assert os.listdir(source + ".columns") == ["v0-%d" % os.path.getsize(source)]
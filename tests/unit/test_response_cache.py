@@ -0,0 +1,136 @@
+"""
+Dashboard response cache: data-version invalidation and single-flight computation
+"""
+import sqlite3
+import threading
+import time
+
+import pytest
+from app import main
+from app.analytics_rollup import build_analytics_rollups
+from app.attribution_batch import build_attribution_summaries
+from app.response_cache import (
+    ResponseCache, bump_data_version, install_data_version_triggers, read_data_version, response_cache
+)
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "intent_intelligence.db"), check_same_thread=False)
+    conn.executescript("""
+        CREATE TABLE intent_scores (user_id TEXT, category TEXT, intent_score REAL, intent_level TEXT);
+        INSERT INTO intent_scores VALUES ('u1', 'grocery', 0.9, 'High'), ('u2', 'grocery', 0.4, 'Low');
+    """)
+    conn.commit()
+    response_cache.clear()
+    yield conn
+    conn.close()
+
+
+class TestResponseCache:
+
+    def test_served_until_data_version_bumps(self, conn):
+        first = main.intent_stats(conn)
+        assert first == {"totalUsers": 2, "intentDistribution": {"high": 1, "medium": 0, "low": 1}}
+
+        conn.execute("INSERT INTO intent_scores VALUES ('u3', 'beauty', 0.6, 'Medium')")
+        conn.commit()
+        assert main.intent_stats(conn) is first
+
+        with conn:
+            assert bump_data_version(conn) == 1
+        assert read_data_version(conn) == 1
+        assert main.intent_stats(conn)["intentDistribution"] == {"high": 1, "medium": 1, "low": 1}
+
+    def test_raw_table_writes_bump_version_through_triggers(self, conn):
+        assert install_data_version_triggers(conn) == ["intent_scores"]
+        conn.commit()
+        first = main.intent_stats(conn)
+
+        conn.execute("INSERT INTO intent_scores VALUES ('u3', 'beauty', 0.6, 'Medium')")
+        conn.commit()
+        assert read_data_version(conn) == 1
+        assert main.intent_stats(conn)["totalUsers"] == 3
+
+        conn.execute("DELETE FROM intent_scores WHERE user_id = 'u1'")
+        conn.commit()
+        assert read_data_version(conn) == 2
+        assert main.intent_stats(conn)["intentDistribution"] == {"high": 0, "medium": 1, "low": 1}
+        assert first["totalUsers"] == 2
+
+    def test_batch_rebuilds_bump_version(self, conn):
+        conn.executescript("""
+            CREATE TABLE ad_spend_daily (date TEXT, brand TEXT, channel TEXT, category TEXT, intent_level TEXT,
+                                         impressions INTEGER, clicks INTEGER, conversions INTEGER,
+                                         spend_value REAL, sku_id TEXT);
+            CREATE TABLE campaigns_master (campaign_id TEXT, brand TEXT, channel TEXT, category TEXT);
+            CREATE TABLE ad_attribution (order_id TEXT, campaign_id TEXT, attributed_spend REAL,
+                                         attribution_method TEXT);
+        """)
+        build_analytics_rollups(conn)
+        assert read_data_version(conn) == 1
+        build_attribution_summaries(conn)
+        assert read_data_version(conn) == 2
+
+    def test_entries_expire_after_ttl(self):
+        cache = ResponseCache(ttl=0.05)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return len(calls)
+
+        assert cache.get_or_compute("k", 0, compute) == 1
+        assert cache.get_or_compute("k", 0, compute) == 1
+        time.sleep(0.06)
+        assert cache.get_or_compute("k", 0, compute) == 2
+
+    def test_keys_include_params_and_database(self, conn, tmp_path):
+        other = sqlite3.connect(str(tmp_path / "other.db"))
+        other.executescript("""
+            CREATE TABLE intent_scores (user_id TEXT, category TEXT, intent_score REAL, intent_level TEXT);
+            INSERT INTO intent_scores VALUES ('u9', 'beauty', 0.95, 'High');
+        """)
+        assert main.revenue_opportunities(0.5, conn)["opportunities"][0]["users"] == 1
+        assert main.revenue_opportunities(0.1, conn)["opportunities"][0]["users"] == 2
+        assert main.revenue_opportunities(0.5, other)["opportunities"][0]["category"] == "beauty"
+        other.close()
+
+    def test_errors_are_not_cached(self, conn):
+        assert "error" in main.master_dashboard_v2("zepto", conn)
+        assert response_cache.entries == {}
+
+    def test_concurrent_misses_compute_once(self):
+        cache = ResponseCache()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.05)
+            return {"value": len(calls)}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", 0, compute)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(calls) == 1
+        assert results == [{"value": 1}] * 8
+        assert cache.metrics()["coalesced"] == 7
+
+        assert cache.get_or_compute("k", 1, compute) == {"value": 2}
+
+    def test_waiters_compute_directly_when_the_leader_is_stuck(self):
+        cache = ResponseCache(ttl=0.05)
+        release = threading.Event()
+        leader = threading.Thread(target=cache.get_or_compute, args=("k", 0, lambda: release.wait(5) and "late"))
+        leader.start()
+        while not cache._inflight:
+            time.sleep(0.001)
+
+        assert cache.get_or_compute("k", 0, lambda: "direct") == "direct"
+        release.set()
+        leader.join()
+        assert cache.metrics()["coalesced"] == 1
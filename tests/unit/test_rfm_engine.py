@@ -0,0 +1,129 @@
+"""
+Incremental RFM engine: daily buckets, sliding windows and vectorized segments
+"""
+import os
+import random
+import sqlite3
+import sys
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "intent_intelligence", "ml"))
+
+import rfm_engine  # noqa: E402
+
+START = date(2024, 1, 1)
+
+
+def day(n):
+    return START + timedelta(days=n)
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""CREATE TABLE fact_transaction (transaction_id TEXT, platform_id TEXT, global_customer_id TEXT,
+                                                   transaction_datetime TEXT, total_value REAL)""")
+    yield conn
+    conn.close()
+
+
+def add_transactions(conn, rng, first_day, last_day, per_day=20):
+    rows = []
+    for n in range(first_day, last_day + 1):
+        midnight = datetime.combine(day(n), datetime.min.time())
+        for i in range(per_day):
+            when = midnight + timedelta(seconds=rng.randrange(86400))
+            rows.append((f"t{n}_{i}_{rng.random()}", rng.choice(["zepto", "blinkit"]), f"c{rng.randrange(40)}",
+                         when.strftime("%Y-%m-%d %H:%M:%S"), round(rng.uniform(50, 500), 2)))
+    conn.executemany("INSERT INTO fact_transaction VALUES (?, ?, ?, ?, ?)", rows)
+
+
+def copy_of(conn):
+    other = sqlite3.connect(":memory:")
+    conn.backup(other)
+    return other
+
+
+def assert_same_state(incremental, rebuilt):
+    assert incremental.index.equals(rebuilt.index)
+    for column in rebuilt.columns:
+        if rebuilt[column].dtype.kind in "fi":
+            np.testing.assert_allclose(incremental[column], rebuilt[column], atol=1e-6)
+        else:
+            assert (incremental[column] == rebuilt[column]).all()
+
+
+class TestRfmEngine:
+
+    def test_windows_match_transaction_scan(self, conn):
+        conn.executemany("INSERT INTO fact_transaction VALUES (?, ?, ?, ?, ?)", [
+            ("t1", "zepto", "c1", "2024-12-31 10:00:00", 100.0),
+            ("t2", "zepto", "c1", "2024-12-25 09:00:00", 50.0),   # exactly 7 days before
+            ("t3", "zepto", "c1", "2024-12-24 23:59:59", 25.0),   # 8 days before
+            ("t4", "zepto", "c1", "2023-06-01 00:00:00", 10.0),   # lifetime only
+            ("t5", "blinkit", "c1", "2024-10-05 12:00:00", 40.0),
+        ])
+        state = rfm_engine.update_rfm_state(conn, date(2025, 1, 1)).sort_index()
+
+        zepto = state.loc[("c1", "zepto")]
+        assert [zepto[f"frequency_{n}d"] for n in rfm_engine.WINDOWS] == [2, 3, 3, 3]
+        assert [zepto[f"monetary_{n}d"] for n in rfm_engine.WINDOWS] == [150.0, 175.0, 175.0, 175.0]
+        assert (zepto["frequency_lifetime"], zepto["monetary_lifetime"]) == (4, 185.0)
+        assert zepto["last_transaction_dt"] == "2024-12-31 10:00:00"
+        assert state.loc[("c1", "blinkit"), "frequency_90d"] == 1
+
+        features = rfm_engine.rfm_features(state, date(2025, 1, 1)).set_index(rfm_engine.KEYS)
+        assert features.loc[("c1", "zepto"), "recency_days"] == pytest.approx(14 / 24)
+        assert features.loc[("c1", "zepto"), "aov_30d"] == pytest.approx(175.0 / 3)
+        assert np.isnan(features.loc[("c1", "blinkit"), "aov_30d"])
+
+    def test_incremental_refresh_matches_rebuild(self, conn):
+        rng = random.Random(7)
+        add_transactions(conn, rng, 0, 399)
+        rfm_engine.update_rfm_state(conn, day(400))
+
+        loaded = 399
+        for advance in (1, 3, 0, 45, 400):
+            reference = day(loaded + 1 + advance)
+            # The last loaded day receives late rows alongside the new days
+            add_transactions(conn, rng, loaded, loaded + advance + 1, per_day=5)
+            loaded = loaded + advance + 1
+            incremental = rfm_engine.update_rfm_state(conn, reference).sort_index()
+            rebuilt = rfm_engine.update_rfm_state(copy_of(conn), reference, rebuild=True).sort_index()
+            assert_same_state(incremental[rebuilt.columns], rebuilt)
+
+    def test_refresh_reads_only_new_days(self, conn):
+        rng = random.Random(3)
+        add_transactions(conn, rng, 0, 99)
+        rfm_engine.update_rfm_state(conn, day(100))
+
+        statements = []
+        conn.set_trace_callback(statements.append)
+        add_transactions(conn, rng, 100, 100)
+        rfm_engine.update_rfm_state(conn, day(101))
+        scans = [s for s in statements if "FROM fact_transaction" in s]
+        assert len(scans) == 1 and "transaction_datetime >= '2024-04-08'" in scans[0]
+
+    def test_moving_reference_backwards_rebuilds(self, conn):
+        rng = random.Random(1)
+        add_transactions(conn, rng, 0, 59)
+        rfm_engine.update_rfm_state(conn, day(60))
+        earlier = rfm_engine.update_rfm_state(conn, day(30)).sort_index()
+        rebuilt = rfm_engine.update_rfm_state(copy_of(conn), day(30), rebuild=True).sort_index()
+        assert_same_state(earlier[rebuilt.columns], rebuilt)
+
+    def test_segments(self):
+        scores = [(5, 5, 5), (3, 3, 1), (4, 2, 1), (2, 4, 1), (1, 2, 5), (2, 3, 3), (3, 2, 2)]
+        segments = rfm_engine.segment_customers(*np.array(scores).T)
+        assert segments.tolist() == ["Champions", "Loyal", "Potential", "Frequent", "At Risk",
+                                     "Hibernating", "Regular"]
+
+    def test_tied_scores_do_not_raise(self, conn):
+        conn.executemany("INSERT INTO fact_transaction VALUES (?, ?, ?, ?, ?)", [
+            (f"t{i}", "zepto", f"c{i}", "2024-12-30 10:00:00", 100.0) for i in range(10)])
+        features = rfm_engine.rfm_features(rfm_engine.update_rfm_state(conn, date(2025, 1, 1)), date(2025, 1, 1))
+        assert set(features["frequency_score"]) == {3.0}
+        assert len(features) == 10
@@ -0,0 +1,128 @@
+"""
+RTB multi-slot auctions must match per-slot second-price auctions
+"""
+import asyncio
+import os
+import random
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "backend"))
+
+from id_generator import MonotonicIdGenerator, encode_base32, trace_context  # noqa: E402
+from rtb_engine import RTBEngine  # noqa: E402
+
+SLOTS = [{"type": "hero_banner"}, {"type": "sidebar"}, {"type": "footer"}, {"type": "unknown"}]
+
+
+def make_campaigns(rng, n):
+    return [{
+        "id": f"CAMP_{i:04d}",
+        "name": f"Campaign {i}",
+        "brand": "Brand",
+        "max_cpm": rng.choice([100, 120, 150, 150, 200, 250]),
+        "budget": 1000,
+        "spent": rng.choice([0, 800, 850, 900]),
+        "creative": {},
+        "click_url": "u",
+    } for i in range(n)]
+
+
+def strip_time(bid):
+    return {k: v for k, v in bid.items() if k != "won_at"} if bid else None
+
+
+def reference_auction(engine, slot, campaigns, user_intent):
+    bids = [b for b in (engine.calculate_bid(c, slot, user_intent) for c in campaigns) if b]
+    return engine.second_price_auction(bids) if bids else None
+
+
+class TestMultiSlotAuction:
+
+    def test_matches_per_slot_auction(self):
+        """Vectorized winners and prices equal calculate_bid + second_price_auction"""
+        rng = random.Random(11)
+        engine = RTBEngine(campaign_db_path="/nonexistent/campaigns.db")
+        for n in (1, 2, 50, 300):
+            campaigns = make_campaigns(rng, n)
+            for score in (55, 70, 90):
+                user_intent = {"intent_score": score}
+                winners = asyncio.run(engine.run_multi_slot_auction(SLOTS, campaigns, user_intent))
+                expected = [reference_auction(engine, s, campaigns, user_intent) for s in SLOTS]
+                assert [strip_time(w) for w in winners] == [strip_time(e) for e in expected]
+
+    def test_unique_campaigns_across_slots(self):
+        """With the no-duplicate rule each campaign wins at most one slot"""
+        engine = RTBEngine(campaign_db_path="/nonexistent/campaigns.db")
+        campaigns = make_campaigns(random.Random(5), 3)
+        for campaign, cpm in zip(campaigns, (300, 200, 100)):
+            campaign.update(max_cpm=cpm, spent=0)
+        user_intent = {"intent_score": 90}
+
+        shared = asyncio.run(engine.run_multi_slot_auction(SLOTS, campaigns, user_intent))
+        assert [w["campaign_id"] for w in shared] == ["CAMP_0000"] * 4
+
+        unique = asyncio.run(engine.run_multi_slot_auction(SLOTS, campaigns, user_intent, unique_campaigns=True))
+        assert [w and w["campaign_id"] for w in unique] == ["CAMP_0000", "CAMP_0001", "CAMP_0002", None]
+        # Sidebar runner-up is CAMP_0002 (100 x 1.5), the footer winner has no competition left
+        assert unique[1]["actual_price"] == 150.01
+        assert unique[2]["actual_price"] == unique[2]["bid_amount"]
+
+
+class TestAuctionLogs:
+
+    def test_bid_log_is_bounded_and_stats_use_totals(self, tmp_path):
+        """Bid log keeps the last N wins, spills the rest, and stats cover every win"""
+        engine = RTBEngine(campaign_db_path="/nonexistent/campaigns.db", log_capacity=4,
+                           log_dir=str(tmp_path))
+        campaigns = make_campaigns(random.Random(2), 20)
+        user_intent = {"intent_score": 90}
+        winners = []
+        for i in range(3):
+            winners += asyncio.run(engine.run_multi_slot_auction(SLOTS[:2], campaigns, user_intent))
+            if i == 0:
+                assert engine.flush_logs() == 2
+
+        assert len(engine.bid_history) == 4 and engine.bid_history.total == 6
+        assert engine.flush_logs() == 4
+        assert len(list(tmp_path.glob("bids_*.npz"))) == 2
+
+        campaign_id = winners[0]["campaign_id"]
+        mine = [w for w in winners if w["campaign_id"] == campaign_id]
+        stats = asyncio.run(engine.get_auction_stats(campaign_id))
+        assert stats["total_auctions"] == len(mine)
+        assert stats["total_spent"] == round(sum(w["actual_price"] for w in mine), 2)
+
+    def test_unflushed_rows_overwritten_are_counted(self, tmp_path):
+        """A full ring drops its oldest unflushed rows rather than growing"""
+        engine = RTBEngine(campaign_db_path="/nonexistent/campaigns.db", log_capacity=3,
+                           log_dir=str(tmp_path))
+        request = {"user_id": "u1", "page_context": {}, "ad_slots": []}
+        for _ in range(5):
+            asyncio.run(engine.handle_ad_request(request))
+
+        assert engine.auction_logs.dropped == 2
+        assert engine.flush_logs() == 3
+        assert asyncio.run(engine.get_auction_stats())["total_auctions"] == 5
+        assert [r["user_id"] for r in engine.auction_logs.rows()] == ["u1"] * 3
+
+
+class TestAuctionIds:
+
+    def test_ids_are_unique_and_sorted(self):
+        """IDs generated back to back never collide and sort in creation order"""
+        generator = MonotonicIdGenerator()
+        ids = [generator.new_id() for _ in range(50000)]
+        assert len(set(ids)) == len(ids)
+        assert ids == sorted(ids)
+        assert all(len(i) == 26 for i in ids)
+        assert ids[-1].endswith(encode_base32(50000, 8))
+
+    def test_slot_wins_share_trace_id(self):
+        """Every slot won inside one trace context is logged under that ID"""
+        engine = RTBEngine(campaign_db_path="", log_capacity=10, log_dir=None)
+        campaigns = make_campaigns(random.Random(4), 10)
+        with trace_context() as auction_id:
+            winners = asyncio.run(engine.run_multi_slot_auction(SLOTS, campaigns, {"intent_score": 90}))
+        wins = engine.bid_history.rows()
+        assert len(wins) == len([w for w in winners if w]) > 0
+        assert {w["auction_id"] for w in wins} == {auction_id}
@@ -0,0 +1,126 @@
+"""
+RTB campaign index: indexed eligibility must match the linear scan
+"""
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "backend"))
+
+from campaign_index import CAMPAIGN_SCHEMA, CampaignIndex  # noqa: E402
+from rtb_engine import RTBEngine  # noqa: E402
+
+CATEGORIES = ["electronics", "fashion", "groceries", "beauty", "audio"]
+PAGE_TYPES = ["homepage", "category", "search", "product", "cart"]
+
+
+def random_campaign(rng, i):
+    return {
+        "id": f"CAMP_{i:05d}",
+        "name": f"Campaign {i}",
+        "brand": "Brand",
+        "aggregator": "zepto",
+        "max_cpm": rng.randint(50, 250),
+        "budget": 1000,
+        "spent": rng.choice([0, 500, 1000]),
+        "status": "active",
+        "targeting": {
+            "min_intent_score": rng.randint(0, 100),
+            "categories": rng.sample(CATEGORIES, rng.randint(0, 2)),
+            "page_types": rng.sample(PAGE_TYPES, rng.randint(0, 3)),
+        },
+        "creative": {"type": "image"},
+        "click_url": "https://zepto.com/p",
+        "start_date": rng.choice(["2020-01-01T00:00:00", "2099-01-01T00:00:00"]),
+        "end_date": rng.choice(["2098-12-31T23:59:59", "2021-01-01T00:00:00"]),
+    }
+
+
+class TestCampaignIndex:
+
+    def test_matches_linear_scan(self):
+        """Index lookups return exactly what is_eligible accepts, in catalog order"""
+        rng = random.Random(3)
+        campaigns = [random_campaign(rng, i) for i in range(500)]
+        engine = RTBEngine(campaign_db_path="/nonexistent/campaigns.db")
+        index = CampaignIndex(campaigns)
+
+        for _ in range(200):
+            user_intent = {"intent_score": rng.randint(0, 100),
+                           "predicted_category": rng.choice(CATEGORIES + [None])}
+            page_context = {"page_type": rng.choice(PAGE_TYPES + [None])}
+            expected = [c for c in campaigns if engine.is_eligible(c, user_intent, page_context)]
+            got = index.eligible(user_intent["intent_score"], user_intent["predicted_category"],
+                                 page_context["page_type"])
+            assert got == expected
+
+    def test_refresh_swaps_in_db_changes(self, tmp_path):
+        """Campaigns load from rtb_campaigns and reload when the table changes"""
+        db_path = str(tmp_path / "campaigns.db")
+        conn = sqlite3.connect(db_path)
+        conn.executescript(CAMPAIGN_SCHEMA)
+        insert = ("INSERT INTO rtb_campaigns (id, name, brand, aggregator, max_cpm, budget, spent, targeting, "
+                  "creative, click_url, start_date, end_date, updated_at) "
+                  "VALUES (?, 'n', 'b', 'zepto', 100, 1000, 0, ?, '{}', 'u', '2020-01-01', '2099-01-01', ?)")
+        conn.execute(insert, ("CAMP_A", json.dumps({"categories": ["fashion"]}), "1"))
+        conn.commit()
+
+        engine = RTBEngine(campaign_db_path=db_path, refresh_interval=0)
+        index = engine.get_campaign_index("zepto")
+        assert [c["id"] for c in index.eligible(90, "fashion", "product")] == ["CAMP_A"]
+
+        conn.execute(insert, ("CAMP_B", json.dumps({"min_intent_score": 80}), "2"))
+        conn.commit()
+        conn.close()
+
+        index = engine.get_campaign_index("zepto")
+        assert [c["id"] for c in index.eligible(90, "fashion", "product")] == ["CAMP_A", "CAMP_B"]
+        assert [c["id"] for c in index.eligible(50, "fashion", "product")] == ["CAMP_A"]
+        assert engine.get_campaign_index("blinkit").eligible(90, "fashion", "product") == []
+
+    def test_auctions_do_not_wait_for_a_rebuild(self, tmp_path):
+        """Auctions keep the current index while a changed table is rebuilt on a worker thread"""
+        db_path = str(tmp_path / "campaigns.db")
+        conn = sqlite3.connect(db_path)
+        conn.executescript(CAMPAIGN_SCHEMA)
+        insert = ("INSERT INTO rtb_campaigns (id, name, brand, aggregator, max_cpm, budget, spent, targeting, "
+                  "creative, click_url, start_date, end_date, updated_at) "
+                  "VALUES (?, 'n', 'b', 'zepto', 100, 1000, 0, '{}', '{}', 'u', '2020-01-01', '2099-01-01', ?)")
+        conn.execute(insert, ("CAMP_A", "1"))
+        conn.commit()
+
+        engine = RTBEngine(campaign_db_path=db_path, refresh_interval=0)
+        rebuild = threading.Event()
+        refresh_campaigns = engine.refresh_campaigns
+
+        def slow_refresh(force=False):
+            rebuild.wait(5)
+            return refresh_campaigns(force)
+
+        def eligible():
+            return [c["id"] for c in asyncio.run(engine.find_eligible_campaigns(
+                {"intent_score": 90}, {"page_type": "product"}, "zepto"))]
+
+        rebuild.set()
+        engine.refresh_campaigns = slow_refresh
+        assert eligible() == ["CAMP_A"]   # the first load is awaited
+
+        conn.execute(insert, ("CAMP_B", "2"))
+        conn.commit()
+        conn.close()
+        rebuild.clear()
+
+        async def during_rebuild():
+            found = await engine.find_eligible_campaigns({"intent_score": 90}, {"page_type": "product"}, "zepto")
+            pending = engine._refresh_task
+            assert not pending.done()
+            rebuild.set()
+            await pending
+            return [c["id"] for c in found]
+
+        assert asyncio.run(during_rebuild()) == ["CAMP_A"]
+        assert eligible() == ["CAMP_A", "CAMP_B"]
@@ -0,0 +1,94 @@
+"""
+RTB intent cache: read-through LRU over unified_intent_scores
+"""
+import asyncio
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "backend"))
+
+from campaign_index import CampaignIndex  # noqa: E402
+from intent_cache import IntentCache  # noqa: E402
+from rtb_engine import RTBEngine  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "intent_intelligence.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE unified_intent_scores (customer_id TEXT PRIMARY KEY, final_intent_score REAL,
+                                            intent_level TEXT, suggested_category TEXT, last_updated TEXT);
+        CREATE TABLE intent_scores (user_id TEXT, category TEXT, intent_score REAL, intent_level TEXT);
+        INSERT INTO unified_intent_scores VALUES ('u1', 82.5, 'High', 'electronics', '2025-10-01T00:00:00'),
+                                                 ('u2', 40.0, 'Low', 'fashion', '2025-10-01T00:00:00');
+        INSERT INTO intent_scores VALUES ('u3', 'groceries', 55, 'Medium'), ('u3', 'beauty', 65, 'Medium');
+    """)
+    conn.commit()
+    conn.close()
+    return path
+
+
+class TestIntentCache:
+
+    def test_read_through_then_hit(self, db_path):
+        """First lookup loads from SQLite, the second is served from memory"""
+        engine = RTBEngine(campaign_db_path="", intent_cache=IntentCache(db_path))
+        intent = asyncio.run(engine.get_user_intent("u1"))
+        assert (intent["intent_score"], intent["predicted_category"], intent["ready_to_buy"]) == \
+            (82.5, "electronics", True)
+        asyncio.run(engine.get_user_intent("u1"))
+
+        # Unscored users fall back to their best intent_scores row, unknown users to zero
+        assert asyncio.run(engine.get_user_intent("u3"))["predicted_category"] == "beauty"
+        assert asyncio.run(engine.get_user_intent("nobody"))["intent_score"] == 0.0
+
+        metrics = engine.intent_cache.metrics()
+        assert (metrics["hits"], metrics["misses"], metrics["size"]) == (1, 3, 3)
+
+    def test_refresh_applies_changed_users_and_lru_bound(self, db_path):
+        """refresh() pulls rows updated since the last run; size never exceeds max_size"""
+        cache = IntentCache(db_path, max_size=2)
+
+        async def scenario():
+            assert await cache.refresh() == 2
+            conn = sqlite3.connect(db_path)
+            conn.execute("UPDATE unified_intent_scores SET final_intent_score = 90, last_updated = "
+                         "'2025-10-02T00:00:00' WHERE customer_id = 'u2'")
+            conn.commit()
+            conn.close()
+            assert await cache.refresh() == 1
+            assert (await cache.get("u2")).intent_score == 90.0
+            await cache.get("u3")
+            return cache.metrics()
+
+        metrics = asyncio.run(scenario())
+        assert metrics["size"] == 2 and metrics["evictions"] == 1
+        assert list(cache.records) == ["u2", "u3"]
+
+    def test_null_suggested_category_derived_from_intent_scores(self, db_path):
+        """Scored users without a stored category still match category-targeted campaigns"""
+        conn = sqlite3.connect(db_path)
+        conn.executescript("""
+            INSERT INTO unified_intent_scores VALUES ('u4', 88.0, 'High', NULL, '2025-10-03T00:00:00');
+            INSERT INTO intent_scores VALUES ('u4', 'fashion', 30, 'Low'), ('u4', 'groceries', 80, 'High');
+        """)
+        conn.commit()
+        conn.close()
+        campaign = {"id": "CAMP_GROCERY", "status": "active", "budget": 1000, "spent": 0,
+                    "targeting": {"min_intent_score": 50, "categories": ["groceries"]}}
+        index = CampaignIndex([campaign])
+
+        engine = RTBEngine(campaign_db_path="", intent_cache=IntentCache(db_path))
+        intent = asyncio.run(engine.get_user_intent("u4"))
+        assert intent["predicted_category"] == "groceries"
+        assert index.eligible(intent["intent_score"], intent["predicted_category"], None) == [campaign]
+
+        # The bulk refresh paths derive it the same way
+        cache = IntentCache(db_path)
+        asyncio.run(cache.refresh())
+        assert cache.records["u4"].category == "groceries"
+        assert cache.load_changed("2025-10-02T00:00:00")[0][3] == "groceries"
@@ -0,0 +1,84 @@
+"""
+Unified intent scoring: batch mode must match the per-customer path
+"""
+import sqlite3
+
+import pytest
+from app.scoring_engine import IntentScoringEngine
+
+
+@pytest.fixture
+def engine(tmp_path):
+    db_path = str(tmp_path / "intent_intelligence.db")
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE intent_scores (user_id TEXT, page_views INTEGER, cart_additions INTEGER,
+                                    search_queries INTEGER, time_spent REAL);
+        CREATE TABLE user_events (user_id TEXT, event_type TEXT);
+        CREATE TABLE visual_intelligence (customer_id TEXT, brand_detected TEXT,
+                                          confidence_score REAL, scene_type TEXT);
+        CREATE TABLE voice_intelligence (customer_id TEXT, language_code TEXT, intent_label TEXT);
+        CREATE TABLE unified_intent_scores (
+            customer_id TEXT PRIMARY KEY, behavioral_score REAL, visual_score REAL, voice_score REAL,
+            predictive_ai_score REAL, behavioral_weighted REAL, visual_weighted REAL, voice_weighted REAL,
+            predictive_weighted REAL, final_intent_score REAL, intent_level TEXT, confidence_level REAL,
+            last_updated TEXT, data_completeness REAL, recommended_action TEXT, suggested_category TEXT
+        );
+        INSERT INTO intent_scores VALUES ('c1', 12, 3, 4, 1500), ('c1', 1, 0, 0, 0), ('c2', 2, 0, 1, 50);
+        INSERT INTO user_events VALUES ('c1', 'product_view'), ('c1', 'product_view'), ('c4', 'product_view');
+        INSERT INTO visual_intelligence VALUES ('c1', 'Amul', 0.9, 'Customer Basket'), ('c3', 'Nike', 0.5, 'Shelf');
+        INSERT INTO voice_intelligence VALUES ('c1', 'hi-IN', 'Order Milk'), ('c3', 'en-IN', 'Browse'),
+                                              ('c3', 'ta-IN', 'Buy Now');
+    """)
+    conn.commit()
+    conn.close()
+    return IntentScoringEngine(db_path)
+
+
+def _without_timestamp(score):
+    return {k: v for k, v in score.items() if k != "last_updated"}
+
+
+class TestBatchScoring:
+
+    def test_batch_matches_per_customer(self, engine):
+        """score_batch reproduces calculate_unified_score exactly"""
+        ids = ["c1", "c2", "c3", "c4", "missing"]
+        single = [engine.calculate_unified_score(c) for c in ids]
+        batch = engine.score_batch(ids, save=False)
+        assert [repr(_without_timestamp(s)) for s in batch] == [repr(_without_timestamp(s)) for s in single]
+
+    def test_score_customer_on_read_only_connection(self, engine):
+        """Single-customer API path uses the same kernel, on a query-only connection"""
+        conn = sqlite3.connect(engine.db_path)
+        conn.execute("PRAGMA query_only=ON")
+        single = engine.score_customer("c1", conn)
+        conn.close()
+        assert _without_timestamp(single) == _without_timestamp(engine.score_batch(["c1"], save=False)[0])
+
+    def test_score_all_saves_every_customer(self, engine):
+        """score_all covers every customer seen in a signal table and writes them"""
+        scores = engine.score_all()
+        assert [s["customer_id"] for s in scores] == ["c1", "c2", "c3", "c4"]
+
+        conn = sqlite3.connect(engine.db_path)
+        saved = conn.execute("SELECT customer_id, final_intent_score FROM unified_intent_scores ORDER BY customer_id").fetchall()
+        conn.close()
+        assert saved == [(s["customer_id"], s["final_intent_score"]) for s in scores]
+
+
+class TestIncrementalRescoring:
+
+    def test_rescore_only_changed_customers(self, engine):
+        """After the first full pass only customers with new signal rows are rescored"""
+        assert [s["customer_id"] for s in engine.rescore_changed()] == ["c1", "c2", "c3", "c4"]
+        assert engine.rescore_changed() == []
+
+        conn = sqlite3.connect(engine.db_path)
+        conn.execute("INSERT INTO voice_intelligence VALUES ('c2', 'hi-IN', 'Order Atta')")
+        conn.commit()
+        conn.close()
+
+        rescored = engine.rescore_changed()
+        assert [s["customer_id"] for s in rescored] == ["c2"]
+        assert rescored[0]["voice_score"] == engine.calculate_unified_score("c2")["voice_score"]
@@ -0,0 +1,137 @@
+"""
+SQLite connection pool tests
+"""
+import sqlite3
+import threading
+import time
+
+import anyio
+import httpx
+import pytest
+from fastapi import Depends, FastAPI
+
+from app.sqlite_pool import SQLitePool
+
+# AnyIO's default worker thread limit, which FastAPI runs sync handlers and dependencies on
+THREADPOOL_THREADS = 40
+
+
+@pytest.fixture
+def pool(tmp_path):
+    p = SQLitePool(str(tmp_path / "test.db"), size=2)
+    yield p
+    p.close()
+
+
+class TestSQLitePool:
+
+    def test_reader_connections_are_reused(self, pool):
+        """Readers go back to the pool instead of being closed"""
+        with pool.reader() as first:
+            pass
+        with pool.reader() as second:
+            pass
+        assert first is second
+
+    def test_readers_are_query_only(self, pool):
+        """Writes through a reader connection are rejected"""
+        with pool.reader() as conn:
+            with pytest.raises(sqlite3.OperationalError):
+                conn.execute("CREATE TABLE t (x INTEGER)")
+
+    def test_writer_commits_and_uses_wal(self, pool):
+        """Writer commits on exit and the database runs in WAL mode"""
+        with pool.writer() as conn:
+            conn.execute("CREATE TABLE t (x INTEGER)")
+            conn.execute("INSERT INTO t VALUES (1)")
+        with pool.reader() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 1
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    def test_row_factory_reset_on_release(self, pool):
+        """Per-request row_factory does not leak to the next borrower"""
+        with pool.reader() as conn:
+            conn.row_factory = sqlite3.Row
+        with pool.reader() as conn:
+            assert conn.row_factory is None
+
+
+def pool_app(pool):
+    """App whose sync handlers hold a pooled connection while they run, like app.main's"""
+    app = FastAPI()
+
+    async def get_reader():
+        async with pool.async_reader() as conn:
+            yield conn
+
+    async def get_writer():
+        async with pool.async_writer() as conn:
+            yield conn
+
+    @app.get("/read")
+    def read(conn=Depends(get_reader)):
+        time.sleep(0.005)
+        return {"rows": conn.execute("SELECT COUNT(*) FROM t").fetchone()[0]}
+
+    @app.post("/write")
+    def write(conn=Depends(get_writer)):
+        conn.execute("INSERT INTO t VALUES (1)")
+        time.sleep(0.002)
+        return {"ok": True}
+
+    return app
+
+
+class TestPoolUnderLoad:
+
+    def test_more_requests_than_threadpool_threads(self, pool):
+        """Requests waiting for a connection do not tie up the threads the holders need"""
+        with pool.writer() as conn:
+            conn.execute("CREATE TABLE t (x INTEGER)")
+        threads = THREADPOOL_THREADS
+        statuses = []
+
+        async def main():
+            transport = httpx.ASGITransport(app=pool_app(pool))
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+
+                async def call(method, path):
+                    statuses.append((await client.request(method, path)).status_code)
+
+                with anyio.fail_after(30):
+                    async with anyio.create_task_group() as tg:
+                        for _ in range(threads * 3):
+                            tg.start_soon(call, "GET", "/read")
+                        for _ in range(threads + 20):
+                            tg.start_soon(call, "POST", "/write")
+
+        anyio.run(main)
+
+        assert statuses == [200] * len(statuses) and len(statuses) == threads * 4 + 20
+        with pool.reader() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == threads + 20
+
+    def test_connect_and_commit_run_off_the_event_loop(self, pool):
+        """async_writer/async_reader never open a connection or commit on the loop thread"""
+        connect_threads, commit_threads = [], []
+        connect = pool._connect
+
+        def recording_connect(readonly):
+            connect_threads.append(threading.get_ident())
+            conn = connect(readonly)
+            conn.set_trace_callback(lambda sql: sql == "COMMIT" and commit_threads.append(threading.get_ident()))
+            return conn
+
+        pool._connect = recording_connect
+
+        async def main():
+            async with pool.async_writer() as conn:
+                conn.execute("CREATE TABLE t (x INTEGER)")
+                conn.execute("INSERT INTO t VALUES (1)")
+            async with pool.async_reader() as conn:
+                assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 1
+            return threading.get_ident()
+
+        loop_thread = anyio.run(main)
+        assert len(connect_threads) == 2 and loop_thread not in connect_threads
+        assert commit_threads and loop_thread not in commit_threads